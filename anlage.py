@@ -1,4 +1,5 @@
 import collections
+import functools
 import itertools
 import os
 import re
@@ -6,7 +7,7 @@ from collections.abc import Set
 import json
 import logging
 from pathlib import Path
-from typing import Any, Dict, Generator, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, Generator, Iterable, List, Mapping, Optional, Set, Tuple, Union
 
 import networkx as nx
 import numpy as np
@@ -67,6 +68,7 @@ NON_DIGIT_PREFIX_PATTERN = re.compile(r'\D*')
 EINZEL_ANSCHLUESSE = ['Anschluss', 'Feld', 'Gruppe', 'Gleis', 'Gr.', 'Anschl.', 'Gl.', 'Industrie', 'Depot', 'Abstellung']
 
 
+@functools.lru_cache(maxsize=None)
 def alpha_prefix(name: str) -> str:
     """
     alphabetischen anfang eines namens extrahieren.
@@ -75,6 +77,8 @@ def alpha_prefix(name: str) -> str:
     umlaute etc. werden als alphabetisch betrachtet.
     leerer string, wenn keine alphabetischen zeichen gefunden wurden.
 
+    die resultate werden zwischengespeichert, da die funktion für die gleichen namen oft aufgerufen wird.
+
     :param name: z.b. gleisname
     :return: resultat
 
@@ -82,6 +86,7 @@ def alpha_prefix(name: str) -> str:
     return re.match(ALPHA_PREFIX_PATTERN, name).group(0)
 
 
+@functools.lru_cache(maxsize=None)
 def default_bahnhofname(gleis: str) -> str:
     """
     bahnhofnamen aus gleisnamen ableiten.
@@ -116,6 +121,7 @@ def ist_einzel_anschluss(gleis: str) -> bool:
     return False
 
 
+@functools.lru_cache(maxsize=None)
 def default_anschlussname(gleis: str) -> str:
     """
     anschlussname aus gleisnamen ableiten.
@@ -125,6 +131,8 @@ def default_anschlussname(gleis: str) -> str:
 
     wenn eine zeichenfolge aus EINZEL_ANSCHLUESSE im gleisnamen vorkommt, wird der gleisname unverändert zurückgegeben.
 
+    die resultate werden zwischengespeichert.
+
     :param gleis: gleisname
     :return: anschlussname
     """
@@ -171,6 +179,23 @@ def find_set_item_in_dict(item: Any, mapping: Mapping[Any, Set[Any]]) -> Any:
         raise ValueError(f"item {item} not found in dictionary.")
 
 
+def zwischenspeichern(f: Callable[[str], str]) -> Callable[[str], str]:
+    """
+    namensfunktion mit functools.lru_cache zwischenspeichern.
+
+    bereits zwischengespeicherte funktionen werden unverändert zurückgegeben.
+    namensfunktionen_waehlen legt die zwischengespeicherte funktion in der regionstabelle ab,
+    damit der cache erhalten bleibt, wenn die region mehrmals gewählt wird.
+
+    :param f: namensfunktion
+    :return: zwischengespeicherte namensfunktion
+    """
+    if hasattr(f, 'cache_clear'):
+        return f
+    else:
+        return functools.lru_cache(maxsize=None)(f)
+
+
 anschluss_name_funktionen = {}
     # "Bern - Lötschberg": alpha_prefix,
     # "Ostschweiz": alpha_prefix,
@@ -465,26 +490,56 @@ class Sektoren:
 
         :param sektoren: die dictionary keys sind die hauptgleisnamen, die items sets von zugehörigen gleisnamen.
             jedes gleis darf nur einmal in einem set vorkommen.
-            duplikate werden gesucht und entfernt, es ist jedoch nicht vorhersagbar, welches entfernt wird.
+            bei duplikaten gilt die letzte zuordnung in der iterationsreihenfolge des dictionaries.
             es muss nicht jedes in der anlage vorhandene hauptgleis aufgeführt sein,
             wenn vorher die auto_config durchgeführt wird.
+            die sets werden kopiert.
         :return: None
         """
 
-        # neu zu konfigurierende gleise vorher entfernen, so dass wir dict.update verwenden können
         for hg, sk in sektoren.items():
+            # sektoren, die das hauptgleis gemäss neuer konfiguration nicht mehr hat, fallen weg
+            for gl in self._sektoren.get(hg, set()).difference(sk):
+                self._entfernen(gl)
             for gl in sk:
-                try:
-                    hg2 = self._hauptgleise[gl]
-                    self._sektoren[hg2].discard(gl)
-                    if len(self._sektoren[hg2]) == 0:
-                        del self._sektoren[hg2]
-                except KeyError:
-                    pass
+                self.zuordnen(gl, hg)
+
+    def zuordnen(self, sektor: str, hauptgleis: str):
+        """
+        einen sektor einem hauptgleis zuordnen.
+
+        eine allfällige frühere zuordnung des sektors wird aufgehoben.
+        hauptgleise ohne sektoren werden entfernt.
+
+        :param sektor: gleisname, wie er im sim verwendet wird.
+        :param hauptgleis: name des hauptgleises.
+        :return: None
+        """
+        self._entfernen(sektor)
+        self._hauptgleise[sektor] = hauptgleis
+        try:
+            self._sektoren[hauptgleis].add(sektor)
+        except KeyError:
+            self._sektoren[hauptgleis] = {sektor}
+
+    def _entfernen(self, sektor: str):
+        """
+        zuordnung eines sektors aufheben.
+
+        hauptgleise ohne sektoren werden entfernt.
+
+        :param sektor: gleisname, wie er im sim verwendet wird.
+        :return: None
+        """
+        try:
+            hg = self._hauptgleise.pop(sektor)
+        except KeyError:
+            return
 
-        self._sektoren.update(sektoren)
-        self._duplikate_entfernen(self._sektoren)
-        self._update_hauptgleise()
+        sk = self._sektoren[hg]
+        sk.discard(sektor)
+        if len(sk) == 0:
+            del self._sektoren[hg]
 
     def auto_config(self, gleise: Iterable[str]):
         """
@@ -507,47 +562,6 @@ class Sektoren:
                 self._hauptgleise[gleis] = mo[0]
         self._update_sektoren()
 
-    @staticmethod
-    def _duplikate_entfernen(sektoren: Dict[str, Set[str]]):
-        """
-        entfernt duplikate aus den sektormengen
-
-        die funktion dient zur herstellung der eindeutigkeit des sektormodells
-        und kann auf das _sektor-attribut oder einen unabhängigen sektor-dictionary angewendet werden.
-        welches von mehrfachen sektorgleisen entfernt wird, ist willkürlich.
-        wenn eine sektormenge leer wird, wird auch das hauptgleis entfernt.
-
-        :param sektoren: die dictionary keys sind die hauptgleisnamen, die items sets von zugehörigen gleisnamen.
-            die korrektur wird direkt in diesem dictionary durchgeführt.
-        :return: None
-        """
-        duplikate = {}
-        for hg1, sk1 in sektoren.items():
-            for gl1 in sk1:
-                for hg2, sk2 in sektoren.items():
-                    for gl2 in sk2:
-                        if gl2 == gl1 and hg2 != hg1:
-                            duplikate[hg1] = gl1
-
-        for hg, gl in duplikate.items():
-            try:
-                sektoren[hg].discard(gl)
-                if len(sektoren[hg]) == 0:
-                    del sektoren[hg]
-            except KeyError:
-                pass
-
-    def _update_hauptgleise(self):
-        """
-        _hauptgleise attribut nach änderung an _sektoren aktualisieren.
-
-        :return: None
-        """
-        self._hauptgleise = {}
-        for hauptgleis, sektoren in self._sektoren.items():
-            for sektor in sektoren:
-                self._hauptgleise[sektor] = hauptgleis
-
     def _update_sektoren(self):
         """
         _sektoren attribut nach änderung an _hauptgleise aktualisieren.
@@ -642,6 +656,18 @@ class Anlage:
         self.bahnhof_graph: nx.Graph = nx.Graph()
         self.gleis_graph_probleme: List[Any] = []
 
+        # versionszähler des gleis-graphen. wird bei jeder änderung am graphen erhöht.
+        self._gleis_graph_version: int = 0
+        # mehrdeutige strecken des gleis-graphen und version, für die sie berechnet wurden
+        self._mehrdeutige_strecken: List[Set[str]] = []
+        self._mehrdeutige_strecken_version: int = -1
+        # für den routenabgleich bereits ausgewertete züge (zid) und routen (gruppennamen)
+        self._gleis_graph_zuege: Set[int] = set()
+        self._gleis_graph_routen: Set[Tuple[str, ...]] = set()
+
+        # zid -> zuletzt im bahnhofgraph gezählte fahrplanzeile (plan, an)
+        self._bahnhof_graph_zaehlung: Dict[int, Tuple[str, Any]] = {}
+
         # strecken-name -> gruppen-namen
         self.strecken: Dict[str, Tuple[str]] = {}
 
@@ -650,15 +676,7 @@ class Anlage:
     def update(self, client: PluginClient, config_path: os.PathLike):
         if not self.anlage:
             self.anlage = client.anlageninfo
-
-            try:
-                self.f_anschlussname = anschluss_name_funktionen[self.anlage.region]
-            except KeyError:
-                pass
-            try:
-                self.f_bahnhofname = bahnhof_name_funktionen[self.anlage.region]
-            except KeyError:
-                pass
+            self.namensfunktionen_waehlen()
 
         if len(self.signal_graph) == 0:
             self.original_graphen_erstellen(client)
@@ -673,16 +691,42 @@ class Anlage:
                 logger.exception("fehlerhafte anlagenkonfiguration")
             self.config_loaded = True
 
-        if len(self.gleis_graph) == 0 or len(self.bahnhof_graph) == 0 or len(self.gleis_graph_probleme) > 0:
+        if len(self.gleis_graph) == 0 or len(self.bahnhof_graph) == 0:
             self.gleis_graph_erstellen(client.zugliste.values())
-            self.gleis_graph_probleme = graph_mehrdeutige_strecken(self.gleis_graph)
             self.bahnhof_graph_erstellen()
+        elif len(self.gleis_graph_probleme) > 0:
+            if self.gleis_graph_abgleichen(client.zugliste.values()):
+                self.bahnhof_graph_erstellen()
 
         if len(self.strecken) == 0:
             self.strecken_aus_bahnhofgraph()
 
         self.bahnhof_graph_zugupdate(client.zugliste.values())
 
+    def namensfunktionen_waehlen(self):
+        """
+        regionsabhängige namensfunktionen für bahnhöfe und anschlüsse wählen.
+
+        die funktionen werden aus anschluss_name_funktionen und bahnhof_name_funktionen nachgeschlagen.
+        für regionen, die dort nicht aufgeführt sind, bleiben die default-funktionen.
+        die gewählten funktionen werden wie die default-funktionen zwischengespeichert (siehe zwischenspeichern).
+
+        :return: None
+        """
+        region = self.anlage.region
+        try:
+            f = anschluss_name_funktionen[region] = zwischenspeichern(anschluss_name_funktionen[region])
+        except KeyError:
+            pass
+        else:
+            self.f_anschlussname = f
+        try:
+            f = bahnhof_name_funktionen[region] = zwischenspeichern(bahnhof_name_funktionen[region])
+        except KeyError:
+            pass
+        else:
+            self.f_bahnhofname = f
+
     def original_graphen_erstellen(self, client: PluginClient):
         """
         erstellt die signal- und bahnsteig-graphen nach anlageninformationen vom simulator.
@@ -721,6 +765,7 @@ class Anlage:
 
         self.signal_graph.clear()
         self.gleis_graph.clear()
+        self._gleis_graph_version += 1
         self._verbindungsstrecke_cache = {}
 
         for knoten1 in client.wege.values():
@@ -747,6 +792,8 @@ class Anlage:
         der gleisgraph dient als grundlage zur streckenberechnung zwischen start- und zielpunkten.
 
         für die erstellung des gleis-graphen sind der signal-graph, die gleiszuordnung sowie eine zugliste nötig.
+        mehrdeutige strecken werden mit den routen der zugliste abgeglichen (s. gleis_graph_abgleichen).
+        die verbleibenden mehrdeutigen strecken stehen danach in self.gleis_graph_probleme.
 
         :return: None. der graph wird im gleis_graph-attribut gespeichert.
         """
@@ -760,18 +807,72 @@ class Anlage:
         g = graph_schleifen_aufloesen(g)
         g = graph_zwischensignale_entfernen(g)
         g = graph_schleifen_aufloesen(g)
-        mehrdeutige_strecken = graph_mehrdeutige_strecken(g)
-        if mehrdeutige_strecken:
-            routen = set([])
-            for zug in zugliste:
-                try:
-                    routen.add(tuple([self.gleiszuordnung[n] for n in zug.route()]))
-                except KeyError:
-                    continue
-            for kante in mehrdeutige_strecken:
-                g = graph_mehrdeutige_strecke_abgleichen(g, kante, routen)
 
         self.gleis_graph = g
+        self._gleis_graph_version += 1
+        self._gleis_graph_zuege = set()
+        self._gleis_graph_routen = set()
+        self.gleis_graph_probleme = self.mehrdeutige_strecken()
+        self.gleis_graph_abgleichen(zugliste)
+
+    def mehrdeutige_strecken(self) -> List[Set[str]]:
+        """
+        mehrdeutige strecken des gleis-graphen
+
+        das resultat von graph_mehrdeutige_strecken wird pro version des gleis-graphen nur einmal berechnet.
+        änderungen am gleis-graphen müssen deshalb self._gleis_graph_version erhöhen.
+
+        :return: liste von mehrdeutigen strecken. die liste ist als read-only zu betrachten!
+        """
+        if self._mehrdeutige_strecken_version != self._gleis_graph_version:
+            self._mehrdeutige_strecken = graph_mehrdeutige_strecken(self.gleis_graph)
+            self._mehrdeutige_strecken_version = self._gleis_graph_version
+        return self._mehrdeutige_strecken
+
+    def gleis_graph_abgleichen(self, zugliste: Iterable[ZugDetails]) -> bool:
+        """
+        mehrdeutige strecken des gleis-graphen mit neuen zugrouten abgleichen
+
+        die methode kann bei jedem update mit der ganzen zugliste aufgerufen werden.
+        es werden nur die routen von zügen ausgewertet, die noch nicht abgeglichen wurden,
+        und nur gegen die strecken, die noch mehrdeutig sind.
+        ein zug gilt erst als abgeglichen, wenn er einen fahrplan hat und seine route vollständig zugeordnet werden kann.
+        wenn der graph dabei geändert wird, werden die verbleibenden strecken nochmals mit allen bekannten routen
+        abgeglichen, weil sich die nachbarschaften geändert haben.
+
+        self.gleis_graph_probleme wird aktualisiert.
+        wenn sich der gleis-graph ändert, muss der bahnhof-graph neu erstellt werden.
+
+        :param zugliste: züge mit fahrplan, z.b. PluginClient.zugliste.values()
+        :return: True, wenn der gleis-graph geändert wurde.
+        """
+        routen = set()
+        for zug in zugliste:
+            if zug.zid in self._gleis_graph_zuege or not zug.fahrplan:
+                continue
+            try:
+                route = tuple([self.gleiszuordnung[n] for n in zug.route()])
+            except KeyError:
+                continue
+            self._gleis_graph_zuege.add(zug.zid)
+            if route not in self._gleis_graph_routen:
+                routen.add(route)
+        self._gleis_graph_routen.update(routen)
+
+        geaendert = False
+        while routen and self.mehrdeutige_strecken():
+            kanten = self.gleis_graph.number_of_edges()
+            for strecke in self.mehrdeutige_strecken():
+                graph_mehrdeutige_strecke_abgleichen(self.gleis_graph, strecke, routen)
+            if self.gleis_graph.number_of_edges() == kanten:
+                break
+            self._gleis_graph_version += 1
+            self._verbindungsstrecke_cache = {}
+            routen = self._gleis_graph_routen
+            geaendert = True
+
+        self.gleis_graph_probleme = self.mehrdeutige_strecken()
+        return geaendert
 
     def gleise_gruppieren(self):
         """
@@ -820,12 +921,17 @@ class Anlage:
         self.bahnsteiggruppen = {nice_names[sn] if counts_safe[sn] == 1 else sn: g for sn, g in gruppen.items()}
 
         # ein- und ausfahrten, die auf den gleichen anschlussnamen abbilden, bilden einen anschluss
-        nodes = [n for n, t in self.signal_graph.nodes(data='typ') if t in anschlusstypen]
-        nice_names = {k: self.f_anschlussname(k) for k in nodes}
-        # anschlüsse, die den gleichen namen wie ein bahnhof haben, umbenennen
-        nice_names = {k: v if v not in self.bahnsteiggruppen else v + "+" for k, v in nice_names.items()}
-        unique_names = set(nice_names.values())
-        self.anschlussgruppen = {k: set([n for n in nodes if self.f_anschlussname(n) == k]) for k in unique_names}
+        self.anschlussgruppen = {}
+        for n, t in self.signal_graph.nodes(data='typ'):
+            if t in anschlusstypen:
+                name = self.f_anschlussname(n)
+                # anschlüsse, die den gleichen namen wie ein bahnhof haben, umbenennen
+                if name in self.bahnsteiggruppen:
+                    name = name + "+"
+                try:
+                    self.anschlussgruppen[name].add(n)
+                except KeyError:
+                    self.anschlussgruppen[name] = {n}
 
         self.auto = True
         self._update_gruppen_dict()
@@ -868,6 +974,8 @@ class Anlage:
         :return: kein
         """
         self.bahnhof_graph = self.gleis_graph.copy()
+        self._bahnhof_graph_zaehlung = {}
+        self._verbindungsstrecke_cache = {}
         for n in self.bahnhof_graph.nodes:
             self.bahnhof_graph.nodes[n].update(Anlage.BAHNHOF_GRAPH_INIT_NODE)
             self.bahnhof_graph.nodes[n]['typ'] = "bahnhof" if n in self.bahnsteiggruppen else "anschluss"
@@ -884,13 +992,46 @@ class Anlage:
         die fahrzeiten sind in sekunden.
         fahrzeit_count ist die anzahl betrachteter zugverbindungen.
 
+        die methode wird bei jedem update mit der ganzen zugliste aufgerufen.
+        jede fahrplanzeile wird pro zug nur einmal gezählt.
+        dazu steht in self._bahnhof_graph_zaehlung pro zid die zuletzt gezählte zeile (plan, an).
+        bei den folgenden aufrufen wird die zählung nach dieser zeile fortgesetzt.
+        züge, deren letzte zeile bereits gezählt ist, werden übersprungen,
+        so dass der aufwand pro aufruf nur von den neuen zügen und zeilen abhängt.
+        fahrplanzeilen, die noch unvollständig sind oder später hinzukommen, werden beim nächsten aufruf gezählt.
+        zids, die nicht mehr in der zugliste stehen, werden aus der zählung entfernt.
+        bahnhof_graph_erstellen setzt die zählung zusammen mit den statistiken zurück.
+
+        :param zugliste: vollständige zugliste
         :return: kein
         """
 
+        zaehlung = self._bahnhof_graph_zaehlung
+        zids = set()
+
         for zug in zugliste:
+            zids.add(zug.zid)
+            fahrplan = zug.fahrplan
+            if not fahrplan:
+                continue
+            gezaehlt = zaehlung.get(zug.zid)
+            if gezaehlt == (fahrplan[-1].plan, fahrplan[-1].an):
+                continue
+
             start = None
             startzeit = 0
-            for zeile in zug.fahrplan:
+            beginn = 0
+            if gezaehlt is not None:
+                index = next((i for i, zeile in enumerate(fahrplan) if (zeile.plan, zeile.an) == gezaehlt), -1)
+                if index >= 0:
+                    try:
+                        startzeit = time_to_seconds(fahrplan[index].ab)
+                    except AttributeError:
+                        continue
+                    start = self.gleiszuordnung.get(fahrplan[index].plan)
+                    beginn = index + 1
+
+            for zeile in fahrplan[beginn:]:
                 try:
                     ziel = self.gleiszuordnung[zeile.plan]
                     zielzeit = time_to_seconds(zeile.an)
@@ -907,6 +1048,7 @@ class Anlage:
                 if start and start != ziel:
                     zeit = zielzeit - startzeit
                     self.fahrzeit_update(start, ziel, zeit)
+                zaehlung[zug.zid] = (zeile.plan, zeile.an)
 
                 start = ziel
                 try:
@@ -914,6 +1056,9 @@ class Anlage:
                 except AttributeError:
                     break
 
+        for zid in zaehlung.keys() - zids:
+            del zaehlung[zid]
+
     def fahrzeit_update(self, start, ziel, zeit, recursive=True):
         try:
             d = self.bahnhof_graph[start][ziel]
@@ -1029,6 +1174,12 @@ class Anlage:
         with open(p) as fp:
             d = json.load(fp, object_hook=json_object_hook)
 
+        if load_graphs and not self.anlage.name:
+            # offline-auswertung ohne simulator: anlageninfo aus der datei übernehmen
+            self.anlage.name = d.get('_name', "")
+            self.anlage.region = d.get('_region', "")
+            self.anlage.build = d.get('_build', 0)
+
         if not ignore_version:
             assert d['_aid'] == self.anlage.aid
             if self.anlage.build != d['_build']:
@@ -1041,6 +1192,19 @@ class Anlage:
                 logger.error(f"inkompatible konfigurationsdatei - auto-konfiguration")
                 return
 
+        self.set_config(d, graphs=load_graphs)
+
+    def set_config(self, d: Dict, graphs=False):
+        """
+        konfiguration im dict-format übernehmen
+
+        dies ist das gegenstück zu get_config.
+        fehlende konfigurationsteile bleiben unverändert (bzw. auf der auto-konfiguration).
+
+        :param d: dictionary im format von get_config, z.b. aus einer konfigurationsdatei.
+        :param graphs: die graphen (networkx node-link format) ebenfalls übernehmen, falls vorhanden.
+        :return: None
+        """
         try:
             self.bahnsteiggruppen = d['bahnsteiggruppen']
             self.auto = False
@@ -1067,7 +1231,7 @@ class Anlage:
         self._update_gruppen_dict()
         self.config_loaded = True
 
-        if load_graphs:
+        if graphs:
             try:
                 self.signal_graph = nx.node_link_graph(d['signal_graph'])
             except KeyError:
@@ -0,0 +1,188 @@
+#!/env/python
+
+"""
+stapelverarbeitung von gespeicherten anlagen
+
+dieses programm lädt gespeicherte signal- und bahnsteig-graphen (`*diag.json`-dateien,
+wie sie von Anlage.save_config im DEBUG-modus geschrieben werden)
+und führt für jede anlage die auto-konfiguration und die graphen-erstellung durch:
+gruppieren, gleis-graph, bahnhof-graph und strecken.
+
+die anlagen werden parallel in einem prozess-pool bearbeitet.
+pro anlage wird die resultierende konfiguration als `{aid}.json` ins ausgabeverzeichnis geschrieben.
+die laufzeiten der einzelnen stufen und einige kennzahlen stehen in der zusammenfassung `anlagen.csv`.
+
+es wird keine verbindung zum simulator benötigt.
+
+aufruf (beispiel):
+
+~~~~~~{.sh}
+python anlagenanalyse.py ~/.stskit --ausgabe analyse
+~~~~~~
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any, Dict, Iterable, List
+
+from anlage import Anlage, JSONEncoder
+from stsobj import AnlagenInfo
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+STUFEN = ['laden', 'gruppieren', 'konfiguration', 'gleisgraph', 'bahnhofgraph', 'strecken']
+
+SPALTEN = ['aid', 'name', 'region', 'knoten', 'kanten', 'bahnhoefe', 'anschluesse', 'auto_gleich',
+           'probleme', 'strecken', *(f"zeit_{stufe}" for stufe in STUFEN), 'fehler']
+
+
+def diag_dateien(pfade: Iterable[str]) -> List[Path]:
+    """
+    diagnosedateien suchen.
+
+    :param pfade: dateien oder verzeichnisse. in verzeichnissen werden alle `*diag.json`-dateien ausgewählt.
+    :return: sortierte liste von dateipfaden ohne duplikate
+    """
+    dateien = set()
+    for pfad in map(Path, pfade):
+        if pfad.is_dir():
+            dateien.update(pfad.glob("*diag.json"))
+        else:
+            dateien.add(pfad)
+    return sorted(dateien)
+
+
+def anlage_analysieren(datei: Path, ausgabe: Path, auto: bool = False) -> Dict[str, Any]:
+    """
+    eine gespeicherte anlage laden, konfigurieren und auswerten.
+
+    die reihenfolge entspricht Anlage.update:
+    die graphen und die gespeicherte konfiguration werden geladen,
+    dann wird die auto-konfiguration durchgeführt und mit der gespeicherten verglichen.
+    ausser im auto-modus wird danach die gespeicherte konfiguration übernommen.
+    mangels zugdaten werden mehrdeutige strecken nicht abgeglichen.
+
+    die funktion läuft in einem separaten prozess und muss deshalb auf modulebene definiert sein.
+    fehler werden protokolliert und in der spalte 'fehler' gemeldet.
+
+    :param datei: pfad der diagnosedatei. der dateiname muss die form `{aid}diag.json` haben.
+    :param ausgabe: verzeichnis für die resultierende konfiguration.
+    :param auto: die gespeicherte konfiguration ignorieren und die auto-konfiguration verwenden.
+    :return: zeile für die zusammenfassung mit den schlüsseln aus SPALTEN.
+    """
+    zeile = {spalte: "" for spalte in SPALTEN}
+    zeiten = {}
+
+    try:
+        info = AnlagenInfo()
+        info.aid = int(datei.name[:-len("diag.json")])
+        zeile['aid'] = info.aid
+        anlage = Anlage(info)
+
+        t0 = time.perf_counter()
+        anlage.load_config(datei.parent, load_graphs=True)
+        zeiten['laden'] = time.perf_counter() - t0
+        if len(anlage.signal_graph) == 0 or len(anlage.bahnsteig_graph) == 0:
+            raise ValueError("datei enthält keine graphen")
+        anlage.namensfunktionen_waehlen()
+        gespeichert = anlage.get_config()
+        gespeichert_auto = anlage.auto
+
+        t0 = time.perf_counter()
+        anlage.gleise_gruppieren()
+        zeiten['gruppieren'] = time.perf_counter() - t0
+        zeile['auto_gleich'] = not gespeichert_auto and \
+            anlage.bahnsteiggruppen == gespeichert['bahnsteiggruppen'] and \
+            anlage.anschlussgruppen == gespeichert['anschlussgruppen']
+
+        t0 = time.perf_counter()
+        if not auto and not gespeichert_auto:
+            anlage.set_config(gespeichert)
+        zeiten['konfiguration'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        anlage.gleis_graph_erstellen([])
+        zeiten['gleisgraph'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        anlage.bahnhof_graph_erstellen()
+        zeiten['bahnhofgraph'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        anlage.strecken_aus_bahnhofgraph()
+        zeiten['strecken'] = time.perf_counter() - t0
+
+        zeile['name'] = info.name
+        zeile['region'] = info.region
+        zeile['knoten'] = anlage.signal_graph.number_of_nodes()
+        zeile['kanten'] = anlage.signal_graph.number_of_edges()
+        zeile['bahnhoefe'] = len(anlage.bahnsteiggruppen)
+        zeile['anschluesse'] = len(anlage.anschlussgruppen)
+        zeile['probleme'] = len(anlage.gleis_graph_probleme)
+        zeile['strecken'] = len(anlage.strecken)
+
+        with open(ausgabe / f"{info.aid}.json", "w") as fp:
+            json.dump(anlage.get_config(graphs=False), fp, sort_keys=True, indent=4, cls=JSONEncoder)
+
+    except Exception as e:
+        logger.exception(f"fehler bei der auswertung von {datei}")
+        zeile['fehler'] = f"{type(e).__name__}: {e}"
+
+    for stufe, zeit in zeiten.items():
+        zeile[f"zeit_{stufe}"] = round(zeit * 1000, 3)
+
+    return zeile
+
+
+def main(args: argparse.Namespace) -> None:
+    """
+    alle angegebenen anlagen im prozess-pool auswerten und die zusammenfassung schreiben.
+
+    :param args: parsed command line arguments
+    :return: None
+    """
+    ausgabe = Path(args.ausgabe)
+    ausgabe.mkdir(parents=True, exist_ok=True)
+    dateien = diag_dateien(args.pfade)
+
+    zeilen = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.prozesse) as executor:
+        futures = [executor.submit(anlage_analysieren, datei, ausgabe, args.auto) for datei in dateien]
+        for future in concurrent.futures.as_completed(futures):
+            zeile = future.result()
+            zeilen.append(zeile)
+            status = zeile['fehler'] or f"{zeile['knoten']} knoten, {zeile['probleme']} probleme"
+            print(f"{zeile['aid']} {zeile['name']}: {status}")
+
+    zeilen.sort(key=lambda z: z['aid'])
+    with open(ausgabe / "anlagen.csv", "w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=SPALTEN)
+        writer.writeheader()
+        writer.writerows(zeilen)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog="anlagenanalyse.py",
+        description="""
+        gespeicherte anlagen (*diag.json) stapelweise konfigurieren und auswerten.
+
+        pro anlage wird die konfiguration als {aid}.json ins ausgabeverzeichnis geschrieben,
+        die laufzeiten pro stufe (in ms) und kennzahlen aller anlagen in anlagen.csv.
+        """
+    )
+    parser.add_argument('pfade', nargs='+',
+                        help="diagnosedateien oder verzeichnisse mit diagnosedateien.")
+    parser.add_argument('--ausgabe', default=".",
+                        help="ausgabeverzeichnis.")
+    parser.add_argument('--prozesse', type=int, default=None,
+                        help="anzahl paralleler prozesse. default: anzahl prozessoren.")
+    parser.add_argument('--auto', action='store_true',
+                        help="gespeicherte gruppen-konfiguration ignorieren und auto-konfiguration verwenden.")
+    main(parser.parse_args())
@@ -1,8 +1,13 @@
+from dataclasses import dataclass, field
 import datetime
+import json
 import logging
+import math
+import os
+from pathlib import Path
 import numpy as np
 import pandas as pd
-from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
 
 from stsobj import ZugDetails, FahrplanZeile, Ereignis, time_to_minutes, time_to_seconds, minutes_to_time
 from anlage import Anlage
@@ -12,32 +17,346 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
+class ArchivZeile(NamedTuple):
+    """
+    kompakte fahrplanzeile eines archivierten zuges.
+
+    in der planung sind an und ab die planzeiten, die verspätungen die zuletzt berechneten.
+    in der zugauswertung sind an und ab die effektiven zeiten, die verspätungen sind 0.
+    """
+    plan: str
+    gleis: str
+    an: Optional[datetime.time]
+    ab: Optional[datetime.time]
+    verspaetung_an: int
+    verspaetung_ab: int
+    hinweistext: str
+
+
+@dataclass(frozen=True)
+class ArchivZug:
+    """
+    kompakter datensatz eines ausgefahrenen zuges.
+
+    züge, die länger als die aufbewahrungszeit ausgefahren sind,
+    werden aus den zuglisten von Planung und ZugAuswertung entfernt
+    und als ArchivZug-objekt im archiv der jeweiligen klasse abgelegt.
+    das objekt enthält nur die daten für nachträgliche auswertungen, aber keine verweise auf andere züge.
+
+    ausfahrt ist die sim-zeit in minuten, zu der der zug als ausgefahren erkannt wurde.
+    """
+    zid: int
+    name: str
+    von: str
+    nach: str
+    verspaetung: int
+    ausfahrt: int
+    fahrplan: Tuple[ArchivZeile, ...]
+
+
+def aufbewahrung_abgelaufen(ausfahrt: int, simzeit_minuten: int, aufbewahrungszeit: Optional[int]) -> bool:
+    """
+    prüfen, ob die aufbewahrungszeit eines ausgefahrenen zuges abgelaufen ist.
+
+    die zeitdifferenz wird über mitternacht hinweg gerechnet.
+
+    :param ausfahrt: sim-zeit der ausfahrt in minuten
+    :param simzeit_minuten: aktuelle sim-zeit in minuten
+    :param aufbewahrungszeit: aufbewahrungszeit in minuten. None bedeutet unbegrenzt.
+    :return: True, wenn der zug archiviert werden kann.
+    """
+    if aufbewahrungszeit is None:
+        return False
+    return (simzeit_minuten - ausfahrt) % (24 * 60) > aufbewahrungszeit
+
+
+# klassenbreite des fahrzeit-histogramms in sekunden
+HISTOGRAMM_KLASSE = 30
+# quantile, die FahrzeitStatistik laufend mit P2Quantil schätzt
+P2_QUANTILE = (0.1, 0.5, 0.9)
+
+
+class P2Quantil:
+    """
+    laufende schätzung eines quantils mit dem P²-algorithmus (jain und chlamtac, 1985).
+
+    der algorithmus führt fünf marker (minimum, p/2, p, (1+p)/2, maximum),
+    deren höhen bei jedem messpunkt mit einer parabolischen interpolation nachgeführt werden.
+    speicherbedarf und rechenzeit pro messpunkt und abfrage sind konstant.
+    bis zum fünften messpunkt werden die werte direkt gespeichert.
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.anzahl: int = 0
+        self.hoehen: List[float] = []
+        self.positionen: List[float] = [1., 2., 3., 4., 5.]
+        self.sollpositionen: List[float] = [1., 1. + 2. * p, 1. + 4. * p, 3. + 2. * p, 5.]
+        self._schritte = (0., p / 2., p, (1. + p) / 2., 1.)
+
+    def __eq__(self, other):
+        return isinstance(other, P2Quantil) and self.get_config() == other.get_config()
+
+    @property
+    def wert(self) -> float:
+        """
+        aktuelle schätzung des quantils.
+
+        :return: schätzwert oder nan, wenn noch keine messpunkte vorhanden sind.
+        """
+        if self.anzahl >= 5:
+            return self.hoehen[2]
+        elif self.anzahl:
+            position = self.p * (self.anzahl - 1)
+            i = int(position)
+            try:
+                return self.hoehen[i] + (position - i) * (self.hoehen[i + 1] - self.hoehen[i])
+            except IndexError:
+                return self.hoehen[i]
+        else:
+            return np.nan
+
+    def hinzufuegen(self, x: float) -> None:
+        self.anzahl += 1
+        q = self.hoehen
+        if self.anzahl <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        n = self.positionen
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.sollpositionen[i] += self._schritte[i]
+
+        for i in range(1, 4):
+            d = self.sollpositionen[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def vereinigen(self, andere: 'P2Quantil') -> None:
+        """
+        schätzung eines anderen P2Quantil-objekts übernehmen.
+
+        solange eines der objekte weniger als fünf messpunkte hat, werden diese in das andere eingerechnet.
+        andernfalls werden die inneren markerhöhen nach anzahl gewichtet gemittelt und die positionen neu verteilt.
+        die äusseren marker bleiben minimum und maximum aller messpunkte.
+        die neuen positionen sind ganzzahlig und streng steigend, wie es der algorithmus voraussetzt.
+        das resultat ist eine näherung.
+
+        :param andere: schätzer desselben quantils
+        :return: None
+        """
+        if andere.anzahl == 0:
+            return
+        if self.anzahl < 5:
+            eigene = self.hoehen
+            self.set_config(andere.get_config())
+            for x in eigene:
+                self.hinzufuegen(x)
+            return
+        if andere.anzahl < 5:
+            for x in andere.hoehen:
+                self.hinzufuegen(x)
+            return
+
+        gesamt = self.anzahl + andere.anzahl
+        hoehen = [(self.anzahl * a + andere.anzahl * b) / gesamt for a, b in zip(self.hoehen, andere.hoehen)]
+        hoehen[0] = min(self.hoehen[0], andere.hoehen[0])
+        hoehen[4] = max(self.hoehen[4], andere.hoehen[4])
+        self.hoehen = hoehen
+        self.anzahl = gesamt
+        p = self.p
+        self.sollpositionen = [1., 1. + (gesamt - 1) * p / 2., 1. + (gesamt - 1) * p,
+                               1. + (gesamt - 1) * (1. + p) / 2., float(gesamt)]
+        n = [1.]
+        for i in range(1, 4):
+            n.append(float(min(max(round(self.sollpositionen[i]), n[i - 1] + 1), gesamt - 4 + i)))
+        n.append(float(gesamt))
+        self.positionen = n
+
+    def get_config(self) -> List:
+        return [self.p, self.anzahl, list(self.hoehen), list(self.positionen), list(self.sollpositionen)]
+
+    def set_config(self, d: List) -> None:
+        _, self.anzahl, hoehen, positionen, sollpositionen = d
+        self.hoehen = list(hoehen)
+        self.positionen = list(positionen)
+        self.sollpositionen = list(sollpositionen)
+
+
+@dataclass
+class FahrzeitStatistik:
+    """
+    laufende statistik der fahrzeiten von einem start- zu einem zielgleis.
+
+    die zeiten sind in sekunden.
+    histogramm zählt die fahrzeiten pro klasse von HISTOGRAMM_KLASSE sekunden (schlüssel: zeit // klassenbreite).
+    es dient als kleine, vereinigbare skizze für beliebige quantile.
+    die quantile in P2_QUANTILE werden zusätzlich laufend mit P2Quantil geschätzt
+    und können in konstanter zeit abgefragt werden.
+    """
+    anzahl: int = 0
+    summe: float = 0.
+    minimum: float = math.inf
+    histogramm: Dict[int, int] = field(default_factory=dict)
+    p2: Dict[float, P2Quantil] = field(default_factory=lambda: {p: P2Quantil(p) for p in P2_QUANTILE})
+
+    def hinzufuegen(self, zeit: float) -> None:
+        self.anzahl += 1
+        self.summe += zeit
+        if zeit < self.minimum:
+            self.minimum = zeit
+        klasse = int(zeit // HISTOGRAMM_KLASSE)
+        self.histogramm[klasse] = self.histogramm.get(klasse, 0) + 1
+        for schaetzer in self.p2.values():
+            schaetzer.hinzufuegen(zeit)
+
+    def vereinigen(self, andere: 'FahrzeitStatistik') -> None:
+        """
+        andere statistik zu dieser addieren.
+
+        :param andere: statistik desselben oder eines untergeordneten paares
+        :return: None
+        """
+        self.anzahl += andere.anzahl
+        self.summe += andere.summe
+        self.minimum = min(self.minimum, andere.minimum)
+        for klasse, anzahl in andere.histogramm.items():
+            self.histogramm[klasse] = self.histogramm.get(klasse, 0) + anzahl
+        for p, schaetzer in andere.p2.items():
+            try:
+                self.p2[p].vereinigen(schaetzer)
+            except KeyError:
+                pass
+
+    @property
+    def median(self) -> float:
+        return self.quantil(0.5)
+
+    def quantil(self, q: float) -> float:
+        """
+        quantil schätzen.
+
+        die quantile aus P2_QUANTILE stammen vom laufenden P2Quantil-schätzer,
+        die übrigen aus dem histogramm.
+
+        :param q: quantil zwischen 0 und 1, z.b. 0.5 für den median.
+        :return: geschätzte fahrzeit in sekunden.
+            beim histogramm die mitte der klasse, in der das quantil liegt.
+            nan, wenn die statistik leer ist.
+        """
+        try:
+            schaetzer = self.p2[q]
+        except KeyError:
+            pass
+        else:
+            if schaetzer.anzahl:
+                return schaetzer.wert
+
+        rang = q * self.anzahl
+        kumuliert = 0
+        for klasse in sorted(self.histogramm):
+            kumuliert += self.histogramm[klasse]
+            if kumuliert >= rang:
+                return max((klasse + 0.5) * HISTOGRAMM_KLASSE, self.minimum)
+        return np.nan
+
+    @property
+    def mittel(self) -> float:
+        try:
+            return self.summe / self.anzahl
+        except ZeroDivisionError:
+            return np.nan
+
+
+@dataclass
+class FahrtVerlauf:
+    """
+    laufender auswertungszustand eines zuges für Auswertung.fahrzeit_auswerten und rotzeit_auswerten.
+
+    stationen enthält pro ausgewertete fahrplanzeile das gleis
+    und die kumulierte fahrzeit (ohne haltezeiten) seit der ersten zeile in sekunden.
+    die fahrzeit zwischen zwei zeilen ist die differenz ihrer kumulierten fahrzeiten.
+    rotzeit ist die summe der rothalte in den abgeschlossenen zeilen, d.h. allen ausser der letzten.
+    """
+    stationen: List[Tuple[str, int]] = field(default_factory=list)
+    fahrzeit: int = 0
+    rotzeit: int = 0
+
+
 class FahrzeitAuswertung:
     """
     auswertungsklasse für fahrzeiten zwischen gleisen.
 
-    die pandas-dataframes werden mit einem multiindex indiziert,
-    wo der erste level der gleisname und der zweite level der gruppenname ist.
-    messdaten werden per gleis hinzugefügt, können aber auch per gruppe ausgewertet werden.
-
-    spalten: zielgleise
-    zeilen: startgleise
-    df.loc[start, ziel]
-    df[ziel]
-    df.loc[start]
+    die messpunkte werden spaltenweise in listen angehängt
+    und pro paar (start, ziel) sowie pro (start, ziel, gattung) in einer laufenden FahrzeitStatistik zusammengefasst.
+    beides kostet pro messpunkt konstante zeit.
+    ausserdem wird pro paar von gleisgruppen (bahnhöfe und anschlüsse, siehe set_koordinaten)
+    eine gruppenstatistik geführt, so dass z.b. die fahrzeit zwischen zwei bahnhöfen direkt abgefragt werden kann.
+    die statistiken pro gattung können mit get_config ausgelesen und mit set_config
+    in einer späteren sitzung wieder eingelesen werden (siehe Auswertung.save_config).
+    die dataframes fahrten und zeiten werden erst bei bedarf daraus erstellt
+    und bis zum nächsten messpunkt zwischengespeichert.
+
+    zeiten enthält die minimale fahrzeit:
+
+    spalten: startgleise
+    zeilen: zielgleise
+    df.at[ziel, start]
     """
+
+    SPALTEN = ['zug', 'gattung', 'von', 'nach', 'zeit']
+
     def __init__(self):
-        self.fahrten = pd.DataFrame(columns=['zug', 'gattung', 'von', 'nach', 'zeit'])
-        self.zeiten: Optional[pd.DataFrame] = None
+        self._messpunkte: Dict[str, List[Any]] = {spalte: [] for spalte in self.SPALTEN}
+        self.statistik: Dict[Tuple[str, str], FahrzeitStatistik] = {}
+        self.gattungsstatistik: Dict[Tuple[str, str, str], FahrzeitStatistik] = {}
+        self.gruppenstatistik: Dict[Tuple[str, str], FahrzeitStatistik] = {}
         self.gruppen: Dict[str, str] = {}
+        self._fahrten: Optional[pd.DataFrame] = None
+        self._zeiten: Optional[pd.DataFrame] = None
 
     def set_koordinaten(self, koordinaten: Mapping[str, Iterable[str]]) -> None:
+        """
+        gleisgruppen festlegen und die gruppenstatistik neu aufbauen.
+
+        :param koordinaten: gleise pro gruppenname, z.b. bahnsteiggruppen und anschlussgruppen der Anlage.
+        :return: None
+        """
         self.gruppen = {}
         for gruppe, gleise in koordinaten.items():
             for gleis in gleise:
                 self.gruppen[gleis] = gruppe
 
-        # self.index = pd.MultiIndex.from_tuples(tuples, names=['Gleis', 'Gruppe'])
+        self.gruppenstatistik = {}
+        for (start, ziel), statistik in self.statistik.items():
+            self._gruppenstatistik_vereinigen(start, ziel, statistik)
+
+    def _gruppenstatistik_vereinigen(self, start: str, ziel: str, statistik: FahrzeitStatistik) -> None:
+        try:
+            schluessel = (self.gruppen[start], self.gruppen[ziel])
+        except KeyError:
+            return
+        self.gruppenstatistik.setdefault(schluessel, FahrzeitStatistik()).vereinigen(statistik)
 
     def add_fahrzeit(self, zug: ZugDetails, start: str, ziel: str, fahrzeit: float) -> None:
         """
@@ -50,14 +369,138 @@ class FahrzeitAuswertung:
         :return: None
         """
         logger.debug(f"add_fahrzeit({zug.name}, {start}, {ziel}, {fahrzeit})")
-        self.fahrten.loc[-1] = {'zug': zug.nummer, 'gattung': zug.gattung, 'von': start, 'nach': ziel, 'zeit': fahrzeit}
-        self.fahrten.index = pd.RangeIndex(self.fahrten.shape[0])
-        self.zeiten = pd.pivot_table(self.fahrten, columns='von', index='nach', values='zeit', aggfunc=np.min)
+        for spalte, wert in zip(self.SPALTEN, (zug.nummer, zug.gattung, start, ziel, fahrzeit)):
+            self._messpunkte[spalte].append(wert)
+
+        try:
+            statistik = self.statistik[(start, ziel)]
+        except KeyError:
+            statistik = self.statistik[(start, ziel)] = FahrzeitStatistik()
+        statistik.hinzufuegen(fahrzeit)
 
-        # tuples = [(gleis, self.gruppen[gleis]) for gleis in self.zeiten.columns]
-        # self.zeiten.columns = pd.MultiIndex.from_tuples(tuples, names=['Gleis', 'Gruppe'])
-        # tuples = [(gleis, self.gruppen[gleis]) for gleis in self.zeiten.index]
-        # self.zeiten.index = pd.MultiIndex.from_tuples(tuples, names=['Gleis', 'Gruppe'])
+        schluessel = (start, ziel, zug.gattung or "")
+        try:
+            statistik = self.gattungsstatistik[schluessel]
+        except KeyError:
+            statistik = self.gattungsstatistik[schluessel] = FahrzeitStatistik()
+        statistik.hinzufuegen(fahrzeit)
+
+        try:
+            schluessel = (self.gruppen[start], self.gruppen[ziel])
+        except KeyError:
+            pass
+        else:
+            try:
+                statistik = self.gruppenstatistik[schluessel]
+            except KeyError:
+                statistik = self.gruppenstatistik[schluessel] = FahrzeitStatistik()
+            statistik.hinzufuegen(fahrzeit)
+
+        self._fahrten = None
+        self._zeiten = None
+
+    def messpunkte(self, start: int = 0) -> List[Tuple]:
+        """
+        messpunkte ab einer position als tupel in der reihenfolge von SPALTEN.
+
+        :param start: index des ersten messpunkts. damit können neue messpunkte fortlaufend abgeholt werden.
+        :return: liste von tupeln
+        """
+        return list(zip(*(self._messpunkte[spalte][start:] for spalte in self.SPALTEN)))
+
+    @property
+    def fahrten(self) -> pd.DataFrame:
+        """
+        alle messpunkte als dataframe mit den spalten SPALTEN.
+        """
+        if self._fahrten is None:
+            self._fahrten = pd.DataFrame(self._messpunkte, columns=self.SPALTEN)
+        return self._fahrten
+
+    @property
+    def zeiten(self) -> Optional[pd.DataFrame]:
+        """
+        minimale fahrzeiten als dataframe mit zielgleisen als zeilen und startgleisen als spalten.
+
+        None, solange keine messpunkte vorhanden sind.
+        """
+        if self._zeiten is None and self.statistik:
+            minima = pd.Series({paar: statistik.minimum for paar, statistik in self.statistik.items()})
+            minima.index.names = ['von', 'nach']
+            self._zeiten = minima.unstack('von')
+        return self._zeiten
+
+    def get_gruppenfahrzeit(self, start: str, ziel: str) -> Union[int, float]:
+        """
+        minimale fahrzeit zwischen zwei gleisgruppen auslesen
+
+        :param start: name der startgruppe (bahnhof oder anschluss)
+        :param ziel: name der zielgruppe
+        :return: minimale fahrzeit in sekunden oder nan, wenn keine messpunkte vorhanden sind.
+        """
+        try:
+            return self.gruppenstatistik[(start, ziel)].minimum
+        except KeyError:
+            return np.nan
+
+    def schaetzen(self, start: str, ziel: str, gattung: Optional[str] = None, q: float = 0.5) -> float:
+        """
+        fahrzeit mit einem quantil der beobachteten fahrzeiten schätzen.
+
+        wenn für die gattung messpunkte vorhanden sind, wird deren statistik verwendet,
+        sonst die statistik aller gattungen.
+        ausreisser (z.b. einzelne schnelle oder langsame züge) beeinflussen den median kaum.
+
+        :param start: startgleis
+        :param ziel: zielgleis
+        :param gattung: zuggattung oder None
+        :param q: quantil, normalerweise 0.5 (median). die werte in P2_QUANTILE kosten konstante zeit.
+        :return: geschätzte fahrzeit in sekunden oder nan, wenn keine messpunkte vorhanden sind.
+        """
+        try:
+            return self.gattungsstatistik[(start, ziel, gattung or "")].quantil(q)
+        except KeyError:
+            pass
+        try:
+            return self.statistik[(start, ziel)].quantil(q)
+        except KeyError:
+            return np.nan
+
+    def get_config(self) -> Dict[str, Any]:
+        """
+        statistiken im dict-format auslesen
+
+        :return: dictionary mit dem schlüssel 'statistik': liste von
+            [von, nach, gattung, anzahl, summe, minimum, [[klasse, anzahl], ...], [P2Quantil-zustand, ...]]
+        """
+        return {'statistik': [[von, nach, gattung, st.anzahl, st.summe, st.minimum, sorted(st.histogramm.items()),
+                               [schaetzer.get_config() for schaetzer in st.p2.values()]]
+                              for (von, nach, gattung), st in self.gattungsstatistik.items()]}
+
+    def set_config(self, d: Dict[str, Any]) -> None:
+        """
+        gespeicherte statistiken übernehmen
+
+        dies ist das gegenstück zu get_config.
+        die gespeicherten statistiken werden zu den vorhandenen addiert,
+        neue messpunkte werden danach weiter in dieselben statistiken eingerechnet.
+        die messpunkt-liste (fahrten) wird nicht ergänzt.
+
+        :param d: dictionary im format von get_config
+        :return: None
+        """
+        for von, nach, gattung, anzahl, summe, minimum, histogramm, *p2 in d['statistik']:
+            gespeichert = FahrzeitStatistik(anzahl, summe, minimum, {klasse: n for klasse, n in histogramm})
+            for zustand in (p2[0] if p2 else []):
+                try:
+                    gespeichert.p2[zustand[0]].set_config(zustand)
+                except KeyError:
+                    pass
+            self.gattungsstatistik.setdefault((von, nach, gattung), FahrzeitStatistik()).vereinigen(gespeichert)
+            self.statistik.setdefault((von, nach), FahrzeitStatistik()).vereinigen(gespeichert)
+            self._gruppenstatistik_vereinigen(von, nach, gespeichert)
+
+        self._zeiten = None
 
     def report(self):
         if logger.isEnabledFor(logging.INFO):
@@ -73,33 +516,17 @@ class FahrzeitAuswertung:
 
     def get_fahrzeit(self, start: str, ziel: str) -> Union[int, float]:
         """
-        fahrzeit auslesen
+        minimale fahrzeit auslesen
 
-        bemerkungen:
+        der wert stammt direkt aus der laufenden statistik, der dataframe zeiten wird dafür nicht erstellt.
 
-        ~~~~~~{.py}
-        self.zeiten.at[ziel, start]
-        return self.zeiten[start][ziel]
-        ~~~~~~
-
-        fuer scalar index geben diese statements den gewuenschten wert oder ein KeyError.
-        fuer multiindex gibt das erste einen TypeError, das zweite einen KeyError.
-
-        ~~~~~~{.py}
-        self.zeiten[gleis]
-        ~~~~~~
-
-        dieses statement gibt einen frame mit der entsprechenden 'von'-spalte zurueck.
-        die gruppe kann so nicht angesprochen werden.
-
-
-        :param start:
-        :param ziel:
-        :return:
+        :param start: startgleis
+        :param ziel: zielgleis
+        :return: minimale fahrzeit in sekunden oder nan, wenn keine messpunkte vorhanden sind.
         """
         try:
-            return self.zeiten.at[ziel, start]
-        except (AttributeError, KeyError, TypeError, ValueError):
+            return self.statistik[(start, ziel)].minimum
+        except KeyError:
             return np.nan
 
 
@@ -123,9 +550,17 @@ class ZugAuswertung:
     bemerkungen:
     - züge, die den namen wechseln haben entweder keine einfahrt oder keine ausfahrt.
       der namenswechsel wird durch das "E"-flag angezeigt.
+
+    züge, die seit der aufbewahrungszeit (in sim-minuten) nicht mehr in den quelldaten erscheinen,
+    werden von zuege_archivieren aus der zugliste entfernt und im archiv abgelegt.
     """
     def __init__(self):
         self.zugliste: Dict[int, ZugDetails] = dict()
+        self.archiv: Dict[int, ArchivZug] = dict()
+        self.aufbewahrungszeit: Optional[int] = 60
+        # sim-zeit in minuten, zu der ein zug zum ersten mal nicht mehr in den quelldaten stand.
+        self.ausfahrzeiten: Dict[int, int] = dict()
+        self._aktuelle_zids: Set[int] = set()
 
     def zuege_uebernehmen(self, zuege: Iterable[ZugDetails]):
         """
@@ -138,7 +573,9 @@ class ZugAuswertung:
         :param zuege:
         :return:
         """
+        self._aktuelle_zids = set()
         for zug in zuege:
+            self._aktuelle_zids.add(zug.zid)
             try:
                 mein_zug = self.zugliste[zug.zid]
             except KeyError:
@@ -155,6 +592,32 @@ class ZugAuswertung:
             mein_zug.amgleis = zug.amgleis
             mein_zug.sichtbar = zug.sichtbar
 
+    def zuege_archivieren(self, simzeit_minuten: int) -> List[int]:
+        """
+        ausgefahrene züge nach ablauf der aufbewahrungszeit archivieren.
+
+        ein zug gilt als ausgefahren, wenn er beim letzten zuege_uebernehmen nicht mehr in den quelldaten stand.
+
+        :param simzeit_minuten: aktuelle sim-zeit in minuten seit mitternacht
+        :return: zids der archivierten züge
+        """
+        archiviert = []
+        for zid, zug in self.zugliste.items():
+            if zid in self._aktuelle_zids:
+                continue
+            ausfahrt = self.ausfahrzeiten.setdefault(zid, simzeit_minuten)
+            if aufbewahrung_abgelaufen(ausfahrt, simzeit_minuten, self.aufbewahrungszeit):
+                archiviert.append(zid)
+
+        for zid in archiviert:
+            zug = self.zugliste.pop(zid)
+            fahrplan = tuple(ArchivZeile(fpz.plan, fpz.gleis, fpz.an, fpz.ab, 0, 0, fpz.hinweistext)
+                             for fpz in zug.fahrplan)
+            self.archiv[zid] = ArchivZug(zid, zug.name, zug.von, zug.nach, zug.verspaetung,
+                                         self.ausfahrzeiten.pop(zid), fahrplan)
+
+        return archiviert
+
     def ereignis_uebernehmen(self, ereignis: Ereignis) -> None:
         """
         ereignis verarbeiten.
@@ -318,13 +781,237 @@ class ZugAuswertung:
             pass
 
 
+class EreignisLog:
+    """
+    spaltenweises protokoll aller ereignisse einer sitzung.
+
+    die ereignisse werden in einem numpy-array mit der struktur EREIGNIS_DTYPE abgelegt (16 bytes pro ereignis).
+    das array wird vorab angelegt und bei bedarf verdoppelt.
+    ereignisart und gleisnamen werden als ganzzahlige codes gespeichert (siehe arten und gleise).
+
+    die zeit ist in sekunden seit mitternacht des ersten ereignisses.
+    nach mitternacht läuft sie über 86400 hinaus weiter, so dass sie monoton bleibt.
+    zeitabschnitte werden mit binärer suche gefunden, die ereignisse eines zuges über einen index pro zid.
+
+    ~~~~~~{.py}
+    log.am_gleis("3", log.letzte_zeit - 20 * 60)
+    ~~~~~~
+    """
+
+    EREIGNIS_DTYPE = np.dtype([('zeit', np.int32), ('zid', np.int32), ('gleis', np.uint16), ('plangleis', np.uint16),
+                               ('verspaetung', np.int16), ('art', np.uint8), ('amgleis', np.bool_)])
+
+    def __init__(self, kapazitaet: int = 4096):
+        self._daten = np.zeros(kapazitaet, dtype=self.EREIGNIS_DTYPE)
+        self.anzahl: int = 0
+        self.arten: List[str] = []
+        self.gleise: List[str] = []
+        self._art_codes: Dict[str, int] = {}
+        self._gleis_codes: Dict[str, int] = {}
+        self._zug_index: Dict[int, List[int]] = {}
+        self._tagesversatz: int = 0
+        self._sortiert: bool = True
+
+    def __len__(self) -> int:
+        return self.anzahl
+
+    @property
+    def daten(self) -> np.ndarray:
+        """
+        alle ereignisse als strukturiertes array (view, nicht kopieren).
+        """
+        return self._daten[:self.anzahl]
+
+    @property
+    def letzte_zeit(self) -> int:
+        """
+        zeit des letzten ereignisses in sekunden, 0 wenn das protokoll leer ist.
+        """
+        return int(self._daten['zeit'][self.anzahl - 1]) if self.anzahl else 0
+
+    def _art_code(self, art: str) -> int:
+        try:
+            return self._art_codes[art]
+        except KeyError:
+            self._art_codes[art] = len(self.arten)
+            self.arten.append(art)
+            return self._art_codes[art]
+
+    def gleis_code(self, gleis: str) -> int:
+        """
+        code eines gleisnamens. unbekannte namen werden neu aufgenommen.
+        """
+        try:
+            return self._gleis_codes[gleis]
+        except KeyError:
+            self._gleis_codes[gleis] = len(self.gleise)
+            self.gleise.append(gleis)
+            return self._gleis_codes[gleis]
+
+    def hinzufuegen(self, ereignis: Ereignis) -> None:
+        """
+        ereignis anhängen.
+
+        :param ereignis: Ereignis vom PluginClient
+        :return: None
+        """
+        zeit = time_to_seconds(ereignis.zeit) + self._tagesversatz
+        if self.anzahl:
+            letzte = self.letzte_zeit
+            if zeit < letzte - 12 * 60 * 60:
+                self._tagesversatz += 24 * 60 * 60
+                zeit += 24 * 60 * 60
+            elif zeit < letzte:
+                self._sortiert = False
+        else:
+            self._tagesversatz = 0
+
+        if self.anzahl >= len(self._daten):
+            daten = np.zeros(2 * len(self._daten), dtype=self.EREIGNIS_DTYPE)
+            daten[:self.anzahl] = self._daten
+            self._daten = daten
+
+        self._daten[self.anzahl] = (zeit, ereignis.zid, self.gleis_code(ereignis.gleis),
+                                    self.gleis_code(ereignis.plangleis),
+                                    max(-32768, min(32767, ereignis.verspaetung)),
+                                    self._art_code(ereignis.art), ereignis.amgleis)
+        self._zug_index.setdefault(ereignis.zid, []).append(self.anzahl)
+        self.anzahl += 1
+
+    def _bereich(self, von: Optional[int], bis: Optional[int]) -> Union[slice, np.ndarray]:
+        zeiten = self._daten['zeit'][:self.anzahl]
+        if self._sortiert:
+            anfang = 0 if von is None else np.searchsorted(zeiten, von, side='left')
+            ende = self.anzahl if bis is None else np.searchsorted(zeiten, bis, side='right')
+            return slice(anfang, ende)
+        maske = np.ones(self.anzahl, dtype=bool)
+        if von is not None:
+            maske &= zeiten >= von
+        if bis is not None:
+            maske &= zeiten <= bis
+        return maske
+
+    def abschnitt(self, von: Optional[int] = None, bis: Optional[int] = None) -> np.ndarray:
+        """
+        ereignisse in einem zeitabschnitt.
+
+        :param von: anfangszeit in sekunden (inklusive). None = ab beginn.
+        :param bis: endzeit in sekunden (inklusive). None = bis zum ende.
+        :return: strukturiertes array
+        """
+        return self.daten[self._bereich(von, bis)]
+
+    def am_gleis(self, gleis: str, von: Optional[int] = None, bis: Optional[int] = None,
+                 art: Optional[str] = None) -> np.ndarray:
+        """
+        ereignisse an einem gleis in einem zeitabschnitt.
+
+        :param gleis: gleisname (aktuelles gleis des ereignisses)
+        :param von: anfangszeit in sekunden (inklusive)
+        :param bis: endzeit in sekunden (inklusive)
+        :param art: nur ereignisse dieser art
+        :return: strukturiertes array
+        """
+        try:
+            code = self._gleis_codes[gleis]
+        except KeyError:
+            return self.daten[:0]
+        daten = self.abschnitt(von, bis)
+        maske = daten['gleis'] == code
+        if art is not None:
+            maske &= daten['art'] == self._art_codes.get(art, -1)
+        return daten[maske]
+
+    def zug(self, zid: int) -> np.ndarray:
+        """
+        alle ereignisse eines zuges in der reihenfolge des eintreffens.
+
+        :param zid: zug-id
+        :return: strukturiertes array
+        """
+        return self.daten[self._zug_index.get(zid, [])]
+
+    def rothalt_dauern(self, von: Optional[int] = None, bis: Optional[int] = None) -> Dict[str, List[int]]:
+        """
+        dauer der rothalte pro gleis.
+
+        ein rothalt dauert vom rothalt-ereignis bis zum nächsten ereignis desselben zuges
+        (normalerweise wurdegruen). das gleis ist das nächste ziel des zuges, wie es das rothalt-ereignis meldet,
+        und steht damit für den signalbereich vor diesem ziel.
+        rothalte ohne folgendes ereignis werden nicht gezählt.
+
+        :param von: anfangszeit der rothalte in sekunden (inklusive)
+        :param bis: endzeit der rothalte in sekunden (inklusive)
+        :return: dict gleisname -> liste von dauern in sekunden
+        """
+        try:
+            rothalt = self._art_codes['rothalt']
+        except KeyError:
+            return {}
+
+        daten = self.daten
+        bereich = self._bereich(von, bis)
+        positionen = np.flatnonzero(daten['art'][bereich] == rothalt)
+        if isinstance(bereich, slice):
+            positionen += bereich.start
+        else:
+            positionen = np.flatnonzero(bereich)[positionen]
+
+        result = {}
+        for position in positionen:
+            zeile = daten[position]
+            index = self._zug_index[int(zeile['zid'])]
+            i = index.index(position)
+            if i + 1 < len(index):
+                dauer = int(daten['zeit'][index[i + 1]] - zeile['zeit'])
+                result.setdefault(self.gleise[zeile['gleis']], []).append(dauer)
+        return result
+
+
 class Auswertung:
     def __init__(self, config: Anlage):
         self.config: Anlage = config
         self.fahrzeiten: FahrzeitAuswertung = FahrzeitAuswertung()
         self.zuege: ZugAuswertung = ZugAuswertung()
+        self.verlaeufe: Dict[int, FahrtVerlauf] = {}
+        self.ereignisse: EreignisLog = EreignisLog()
         self._update_koordinaten()
 
+    def load_config(self, path: os.PathLike):
+        """
+        gespeicherte fahrzeitstatistik der anlage laden.
+
+        :param path: verzeichnis mit den konfigurationsdaten. der dateiname wird aus der anlagen-id gebildet.
+        :return: None
+        :raise: OSError, JSONDecodeError(ValueError)
+        """
+        p = Path(path) / f"{self.config.anlage.aid}fahrzeiten.json"
+        with open(p) as fp:
+            d = json.load(fp)
+
+        if d['_aid'] != self.config.anlage.aid or d['_version'] != 1:
+            raise ValueError(f"inkompatible fahrzeitstatistik {p}")
+        self.fahrzeiten.set_config(d)
+
+    def save_config(self, path: os.PathLike):
+        """
+        fahrzeitstatistik der anlage speichern.
+
+        die datei enthält die geladene und die in dieser sitzung gemessene statistik.
+
+        :param path: verzeichnis mit den konfigurationsdaten.
+        :return: None
+        :raise: OSError
+        """
+        d = self.fahrzeiten.get_config()
+        d['_aid'] = self.config.anlage.aid
+        d['_version'] = 1
+        p = Path(path) / f"{self.config.anlage.aid}fahrzeiten.json"
+        t = p.with_suffix(".tmp")
+        with open(t, "w") as fp:
+            json.dump(d, fp, separators=(',', ':'))
+        os.replace(t, p)
+
     def _update_koordinaten(self):
         wegpunkte = {**self.config.bahnsteiggruppen,
                      **self.config.anschlussgruppen}
@@ -342,6 +1029,21 @@ class Auswertung:
 
         self.zuege.zuege_uebernehmen(zuege)
 
+    def zuege_archivieren(self, simzeit_minuten: int) -> List[int]:
+        """
+        ausgefahrene züge nach ablauf der aufbewahrungszeit archivieren.
+
+        siehe ZugAuswertung.zuege_archivieren.
+
+        :param simzeit_minuten: aktuelle sim-zeit in minuten seit mitternacht
+        :return: zids der archivierten züge
+        """
+
+        archiviert = self.zuege.zuege_archivieren(simzeit_minuten)
+        for zid in archiviert:
+            self.verlaeufe.pop(zid, None)
+        return archiviert
+
     def ereignis_uebernehmen(self, ereignis: Ereignis):
         """
         daten von einem ereignis in die datenbank aufnehmen.
@@ -353,6 +1055,7 @@ class Auswertung:
         :return:
         """
 
+        self.ereignisse.hinzufuegen(ereignis)
         self.zuege.ereignis_uebernehmen(ereignis)
 
         if ereignis.art in {'ankunft', 'ausfahrt'}:
@@ -364,6 +1067,38 @@ class Auswertung:
                 self.fahrzeit_auswerten(zug)
                 self.rotzeit_auswerten(zug)
 
+    def verlauf_nachfuehren(self, zug: ZugDetails) -> FahrtVerlauf:
+        """
+        FahrtVerlauf eines zuges um die neuen fahrplanzeilen ergänzen.
+
+        die ZugAuswertung hängt fahrplanzeilen nur an
+        und ändert danach höchstens die abfahrtszeit der letzten zeile.
+        die kumulierte fahrzeit einer neuen zeile hängt nur von der abfahrt der vorhergehenden zeile ab,
+        die zu diesem zeitpunkt feststeht.
+        jede zeile wird deshalb genau einmal ausgewertet.
+
+        :param zug: zug aus der zugliste der ZugAuswertung
+        :return: nachgeführter FahrtVerlauf
+        """
+        try:
+            verlauf = self.verlaeufe[zug.zid]
+        except KeyError:
+            verlauf = self.verlaeufe[zug.zid] = FahrtVerlauf()
+
+        fahrplan = zug.fahrplan
+        for index in range(len(verlauf.stationen), len(fahrplan)):
+            fpz = fahrplan[index]
+            if index > 0:
+                vorher = fahrplan[index - 1]
+                strecke = time_to_seconds(fpz.an) - time_to_seconds(vorher.ab)
+                if strecke < 0:
+                    strecke += 24 * 60 * 60
+                verlauf.fahrzeit += strecke
+                verlauf.rotzeit += self._rothalt_dauer(vorher)
+            verlauf.stationen.append((fpz.gleis, verlauf.fahrzeit))
+
+        return verlauf
+
     def fahrzeit_auswerten(self, zug: ZugDetails):
         """
         fahrzeit zum letzten halt auswerten.
@@ -375,38 +1110,39 @@ class Auswertung:
         - ankunft 2 -> ankunft 3
 
         etwaige haltezeiten (auch ausserplanmässige) werden nicht eingerechnet.
+        die fahrzeiten sind differenzen der kumulierten fahrzeiten im FahrtVerlauf,
+        der fahrplan wird also nicht jedesmal neu durchlaufen.
 
         :param zug:
         :return:
         """
-        ziel = None
-        gesamt = 0
-        an = 0
-        for fpz in reversed(zug.fahrplan):
-            if ziel:
-                start = fpz.gleis
-                ab = time_to_seconds(fpz.ab)
-                strecke = an - ab
-                if strecke < 0:
-                    strecke += 24 * 60 * 60
-                gesamt = gesamt + strecke
-                if start and not zug.ist_rangierfahrt:
-                    self.fahrzeiten.add_fahrzeit(zug, start, ziel, gesamt)
-            else:
-                ziel = fpz.gleis
-            an = time_to_seconds(fpz.an)
-
-    def fahrzeit_schaetzen(self, zug: str, start: str, ziel: str) -> Optional[int]:
+        stationen = self.verlauf_nachfuehren(zug).stationen
+        index = len(stationen) - 1
+        while index > 0 and not stationen[index][0]:
+            index -= 1
+        if index <= 0 or zug.ist_rangierfahrt:
+            return
+
+        ziel, ende = stationen[index]
+        for start, fahrzeit in reversed(stationen[:index]):
+            if start:
+                self.fahrzeiten.add_fahrzeit(zug, start, ziel, ende - fahrzeit)
+
+    def fahrzeit_schaetzen(self, zug: ZugDetails, start: str, ziel: str) -> float:
         """
         fahrzeit eines zuges von start zu ziel abschätzen.
 
-        :param zug: zugname
+        die schätzung ist der median der beobachteten fahrzeiten der zuggattung,
+        oder aller züge, wenn für die gattung keine messpunkte vorhanden sind.
+        die gattung wird wie in FahrzeitAuswertung.add_fahrzeit aus zug.gattung bestimmt.
+
+        :param zug: zug
         :param start: name des startpunkts (einfahrt oder bahnsteig)
         :param ziel: name des zielpunkts (ausfahrt oder bahnsteig)
-        :return: geschätzte fahrzeit in sekunden, oder None, falls eine schätzung unmöglich ist.
+        :return: geschätzte fahrzeit in sekunden, oder nan, falls eine schätzung unmöglich ist.
         """
 
-        return self.fahrzeiten.get_fahrzeit(start, ziel)
+        return self.fahrzeiten.schaetzen(start, ziel, zug.gattung)
 
     def rotzeit_auswerten(self, zug: ZugDetails):
         """
@@ -420,13 +1156,21 @@ class Auswertung:
         :param zug:
         :return: rotzeit in sekunden
         """
-        gesamt = 0
-        for fpz in zug.fahrplan:
-            if fpz.hinweistext == "rothalt":
-                zeit = time_to_seconds(fpz.ab) - time_to_seconds(fpz.an)
-                if zeit < 0:
-                    zeit += 24 * 60 * 60
-                gesamt += zeit
+        verlauf = self.verlauf_nachfuehren(zug)
+        gesamt = verlauf.rotzeit
+        try:
+            gesamt += self._rothalt_dauer(zug.fahrplan[-1])
+        except IndexError:
+            pass
 
         setattr(zug, 'rotzeit', datetime.timedelta(seconds=gesamt))
         return gesamt
+
+    @staticmethod
+    def _rothalt_dauer(fpz: FahrplanZeile) -> int:
+        if fpz.hinweistext == "rothalt":
+            zeit = time_to_seconds(fpz.ab) - time_to_seconds(fpz.an)
+            if zeit < 0:
+                zeit += 24 * 60 * 60
+            return zeit
+        return 0
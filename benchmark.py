@@ -0,0 +1,796 @@
+#!/env/python
+
+"""
+laufzeitmessungen mit synthetischen daten
+
+dieses modul misst die laufzeit ausgewählter algorithmen von stskit anhand von synthetischen anlagen und zuglisten.
+die messungen dienen dazu, optimierungen zu überprüfen und laufzeit-regressionen zu erkennen.
+es wird keine verbindung zum simulator benötigt.
+
+aufruf (beispiel):
+
+~~~~~~{.sh}
+python benchmark.py gruppieren --knoten 2000
+python benchmark.py planung --zuege 1000
+python benchmark.py prognose --zuege 1000 --horizonte 1 5 15 30
+python benchmark.py prognose --aufzeichnung sitzungen.sqlite
+~~~~~~
+"""
+
+import argparse
+import bisect
+from dataclasses import dataclass, field
+import datetime
+import itertools
+import os
+import random
+import sqlite3
+import string
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import networkx as nx
+import numpy as np
+
+import anlage
+import auswertung
+import datenbank
+import planung
+from stsobj import AnlagenInfo, Ereignis, FahrplanZeile, Knoten, ZugDetails, minutes_to_time, time_to_minutes
+
+
+def kunstname(index: int) -> str:
+    """
+    eindeutigen alphabetischen namen aus einer laufnummer bilden.
+
+    die namen bestehen nur aus buchstaben, damit die namensfunktionen der anlage (alpha_prefix etc.)
+    den ganzen namen als bahnhof- bzw. anschlussnamen erkennen.
+
+    :param index: laufnummer ab 0
+    :return: name, z.b. "Ba", "Bb", ...
+    """
+    buchstaben = string.ascii_lowercase
+    name = ""
+    index += len(buchstaben)
+    while index:
+        index, rest = divmod(index, len(buchstaben))
+        name = buchstaben[rest] + name
+    return name.capitalize()
+
+
+def beispiel_anlage(knoten: int = 2000) -> anlage.Anlage:
+    """
+    synthetische anlage mit einer gegebenen anzahl knoten erstellen.
+
+    die anlage besteht aus einer linie von bahnhöfen mit je sechs bahnsteigen und vier signalen.
+    jeder bahnhof hat eine einfahrt und eine ausfahrt mit eigenem anschlussnamen.
+    die namen folgen den konventionen, die von den default-namensfunktionen erkannt werden.
+
+    :param knoten: ungefähre anzahl knoten im signalgraphen
+    :return: Anlage-objekt mit signal- und bahnsteig-graph. die anlageninfo fehlt.
+    """
+    bahnsteige_pro_bahnhof = 6
+    signale_pro_bahnhof = 4
+    anschluesse_pro_bahnhof = 2
+    bahnhoefe = max(1, knoten // (bahnsteige_pro_bahnhof + signale_pro_bahnhof + anschluesse_pro_bahnhof))
+
+    signal_graph = nx.DiGraph()
+    bahnsteig_graph = nx.DiGraph()
+    letztes_signal = None
+    for ib in range(bahnhoefe):
+        bf = kunstname(2 * ib)
+        an = kunstname(2 * ib + 1)
+        einfahrt = f"{an} {ib}"
+        ausfahrt = f"{an} {ib + 1}"
+        signal_graph.add_node(einfahrt, typ=Knoten.TYP_NUMMER["Einfahrt"])
+        signal_graph.add_node(ausfahrt, typ=Knoten.TYP_NUMMER["Ausfahrt"])
+
+        signale = [f"S{ib}-{i}" for i in range(signale_pro_bahnhof)]
+        for s in signale:
+            signal_graph.add_node(s, typ=Knoten.TYP_NUMMER["Signal"])
+        signal_graph.add_edge(einfahrt, signale[0], typ='gleis', distanz=1)
+        signal_graph.add_edge(signale[-1], ausfahrt, typ='gleis', distanz=1)
+        if letztes_signal:
+            signal_graph.add_edge(letztes_signal, signale[0], typ='gleis', distanz=1)
+        letztes_signal = signale[-1]
+
+        gleise = [f"{bf} {i + 1}" for i in range(bahnsteige_pro_bahnhof)]
+        for gl in gleise:
+            signal_graph.add_node(gl, typ=Knoten.TYP_NUMMER["Bahnsteig"])
+            signal_graph.add_edge(signale[1], gl, typ='gleis', distanz=1)
+            signal_graph.add_edge(gl, signale[2], typ='gleis', distanz=1)
+            bahnsteig_graph.add_node(gl)
+        for gl1, gl2 in itertools.permutations(gleise, 2):
+            bahnsteig_graph.add_edge(gl1, gl2, typ='bahnhof', distanz=0)
+
+    _anlage = anlage.Anlage(None)
+    _anlage.signal_graph = signal_graph
+    _anlage.bahnsteig_graph = bahnsteig_graph
+    return _anlage
+
+
+def anschlussgruppen_quadratisch(_anlage: anlage.Anlage, f_anschlussname: Callable[[str], str]) -> \
+        Dict[str, Set[str]]:
+    """
+    referenzimplementation der anschlussgruppierung vor der optimierung.
+
+    die namensfunktion wird für jeden gruppennamen mit jedem knoten aufgerufen.
+
+    :param _anlage: anlage mit signal-graph
+    :param f_anschlussname: namensfunktion
+    :return: anschlussgruppen
+    """
+    anschlusstypen = {Knoten.TYP_NUMMER["Einfahrt"], Knoten.TYP_NUMMER["Ausfahrt"]}
+    nodes = [n for n, t in _anlage.signal_graph.nodes(data='typ') if t in anschlusstypen]
+    nice_names = {k: f_anschlussname(k) for k in nodes}
+    unique_names = set(nice_names.values())
+    return {k: set([n for n in nodes if f_anschlussname(n) == k]) for k in unique_names}
+
+
+def namens_caches_leeren() -> None:
+    """
+    caches der namensfunktionen leeren, damit jede messung kalt beginnt.
+    """
+    anlage.alpha_prefix.cache_clear()
+    anlage.default_bahnhofname.cache_clear()
+    anlage.default_anschlussname.cache_clear()
+
+
+def benchmark_gleise_gruppieren(args: argparse.Namespace) -> None:
+    """
+    laufzeit von Anlage.gleise_gruppieren messen und mit der quadratischen referenz vergleichen.
+
+    die referenz verwendet die ungespeicherte namensfunktion, wie sie vor der optimierung verwendet wurde.
+    vor jeder messung werden die caches der namensfunktionen geleert.
+
+    :param args: parsed arguments (knoten, wiederholungen)
+    :return: None
+    """
+    _anlage = beispiel_anlage(args.knoten)
+    print(f"signal-graph: {_anlage.signal_graph.number_of_nodes()} knoten, "
+          f"{_anlage.signal_graph.number_of_edges()} kanten")
+
+    referenz = 0.
+    optimiert = 0.
+    for _ in range(args.wiederholungen):
+        namens_caches_leeren()
+        t0 = time.perf_counter()
+        anschlussgruppen_quadratisch(_anlage, anlage.default_anschlussname.__wrapped__)
+        t1 = time.perf_counter()
+        namens_caches_leeren()
+        t2 = time.perf_counter()
+        _anlage.gleise_gruppieren()
+        t3 = time.perf_counter()
+        referenz += (t1 - t0) / args.wiederholungen
+        optimiert += (t3 - t2) / args.wiederholungen
+    print(f"referenz (anschlüsse, quadratisch): {referenz * 1000:10.2f} ms")
+    print(f"gleise_gruppieren (alles, linear):  {optimiert * 1000:10.2f} ms")
+    print(f"{len(_anlage.bahnsteiggruppen)} bahnhöfe, {len(_anlage.anschlussgruppen)} anschlüsse")
+
+
+def beispiel_zuege(anzahl: int = 1000, seed: int = 0) -> List[ZugDetails]:
+    """
+    synthetische zugliste im format des PluginClient erstellen.
+
+    die züge fahren zwischen 6 und 20 uhr mit zwei bis acht halten.
+    etwa jeder fünfte zug endet im stellwerk mit einem nummernwechsel auf den nächsten zug.
+
+    :param anzahl: anzahl züge
+    :param seed: startwert des zufallsgenerators
+    :return: liste von ZugDetails. die züge sind noch nicht eingefahren.
+    """
+    rng = random.Random(seed)
+    zuege = []
+    stammzug = None
+
+    for zid in range(1, anzahl + 1):
+        zug = ZugDetails()
+        zug.zid = zid
+        zug.name = f"RB {1000 + zid}"
+        zug.verspaetung = rng.randint(0, 5)
+        zug.nach = "Ost"
+
+        if stammzug is None:
+            zug.von = "West"
+            zeit = rng.randrange(6 * 60, 20 * 60)
+        else:
+            letzte = stammzug.fahrplan[-1]
+            zug.von = stammzug.nach
+            zeile = FahrplanZeile(zug)
+            zeile.gleis = zeile.plan = letzte.gleis
+            zeit = planung.time_to_minutes(letzte.an) + rng.randint(2, 10)
+            zeile.an = minutes_to_time(zeit)
+            zeit += 1
+            zeile.ab = minutes_to_time(zeit)
+            zug.fahrplan.append(zeile)
+            letzte.ab = None
+            letzte.flags = f"E({zid})"
+
+        for halt in range(rng.randint(2, 8)):
+            zeile = FahrplanZeile(zug)
+            zeile.gleis = zeile.plan = f"{kunstname(halt)} {rng.randint(1, 6)}"
+            zeit += rng.randint(2, 6)
+            zeile.an = minutes_to_time(zeit)
+            zeit += rng.randint(0, 3)
+            zeile.ab = minutes_to_time(zeit)
+            zug.fahrplan.append(zeile)
+
+        zug.gleis = zug.plangleis = zug.fahrplan[0].gleis
+        zuege.append(zug)
+
+        if rng.random() < 0.2:
+            zug.nach = f"Gleis {zug.fahrplan[-1].gleis}"
+            stammzug = zug
+        else:
+            stammzug = None
+
+    return zuege
+
+
+def benchmark_planung(args: argparse.Namespace) -> None:
+    """
+    inkrementelle verspätungskorrektur mit der vollständigen neuberechnung vergleichen.
+
+    drei Planung-objekte verarbeiten dieselbe zugliste:
+    inkrementell, vollständig und vollständig ohne den vektorisierten durchgang für einfache züge.
+    in jedem zyklus ändert sich die verspätung eines teils der züge und die sim-zeit läuft eine minute weiter.
+    ausserdem kommen fahrzeit-messpunkte von der einfahrt zum ersten ziel dazu,
+    so dass einfahrten_korrigieren die einfahrtszeiten verschiebt.
+    gemessen wird die laufzeit von verspaetungen_korrigieren.
+    die resultate der verfahren werden verglichen.
+
+    :param args: parsed arguments (zuege, zyklen, anteil)
+    :return: None
+    """
+    rng = random.Random(1)
+    zuege = beispiel_zuege(args.zuege)
+    inkrementell = planung.Planung()
+    vollstaendig = planung.Planung()
+    objekte = planung.Planung()
+    objekte.vektorisiert = False
+    _auswertung = auswertung.Auswertung(anlage.Anlage(AnlagenInfo()))
+    zeiten = {"inkrementell": 0., "vollständig": 0., "ohne numpy": 0.}
+    simzeit = 6 * 60
+
+    for zyklus in range(args.zyklen + 1):
+        if zyklus:
+            for zug in rng.sample(zuege, int(len(zuege) * args.anteil)):
+                zug.verspaetung = max(0, zug.verspaetung + rng.randint(-2, 3))
+                if not zug.von.startswith("Gleis"):
+                    _auswertung.fahrzeiten.add_fahrzeit(zug, zug.von, zug.fahrplan[0].gleis, rng.randint(60, 900))
+            simzeit += 1
+
+        for plg in (inkrementell, vollstaendig, objekte):
+            plg.auswertung = _auswertung
+            plg.zuege_uebernehmen(zuege)
+            plg.einfahrten_korrigieren()
+
+        t0 = time.perf_counter()
+        inkrementell.verspaetungen_korrigieren(simzeit)
+        t1 = time.perf_counter()
+        vollstaendig.verspaetungen_korrigieren(simzeit, alle=True)
+        t2 = time.perf_counter()
+        objekte.verspaetungen_korrigieren(simzeit, alle=True)
+        t3 = time.perf_counter()
+
+        # der erste zyklus berechnet alle züge und wird nicht gezählt
+        if zyklus:
+            zeiten["inkrementell"] += t1 - t0
+            zeiten["vollständig"] += t2 - t1
+            zeiten["ohne numpy"] += t3 - t2
+
+    abweichungen = 0
+    for zid, zug in objekte.zugliste.items():
+        verspaetungen = [(z.verspaetung_an, z.verspaetung_ab) for z in zug.fahrplan]
+        for plg in (inkrementell, vollstaendig):
+            if verspaetungen != [(z.verspaetung_an, z.verspaetung_ab) for z in plg.zugliste[zid].fahrplan]:
+                abweichungen += 1
+                break
+
+    zeilen = sum(len(zug.fahrplan) for zug in vollstaendig.zugliste.values())
+    print(f"{len(zuege)} züge, {zeilen} fahrplanzeilen, {args.zyklen} zyklen, "
+          f"{args.anteil:.0%} geänderte züge pro zyklus")
+    for name, zeit in zeiten.items():
+        print(f"{name:14s} {zeit / args.zyklen * 1000:10.2f} ms pro zyklus")
+    print(f"abweichende züge: {abweichungen}")
+
+
+@dataclass
+class Aufzeichnung:
+    """
+    zugliste und ereignisse einer aufgezeichneten oder synthetischen sitzung.
+
+    die zuege entsprechen der zugliste des PluginClient vor der ersten einfahrt.
+    erscheinen enthält pro zid die minute, ab der der zug in der zugliste steht.
+    die ereignisse sind nach zeit geordnet.
+    alle minutenangaben zählen ab mitternacht des ersten tages und laufen über mitternacht weiter.
+    """
+    anlage: AnlagenInfo = field(default_factory=AnlagenInfo)
+    zuege: List[ZugDetails] = field(default_factory=list)
+    erscheinen: Dict[int, int] = field(default_factory=dict)
+    ereignisse: List[Ereignis] = field(default_factory=list)
+
+
+DATUM = datetime.datetime(2000, 1, 1)
+
+
+def ereignis_minute(ereignis: Ereignis) -> int:
+    """
+    zeit eines ereignisses in minuten seit mitternacht des ersten tages (DATUM)
+    """
+    return int((ereignis.zeit - DATUM).total_seconds()) // 60
+
+
+def beispiel_ereignis(zug: ZugDetails, art: str, minute: int, gleis: str, verspaetung: int,
+                      amgleis: bool = False, sichtbar: bool = True) -> Ereignis:
+    """
+    ereignis eines zuges erstellen.
+
+    gleis und plangleis sind gleich.
+    die zeit wird in minuten ab DATUM angegeben.
+    """
+    ereignis = Ereignis()
+    ereignis.art = art
+    ereignis.zeit = DATUM + datetime.timedelta(minutes=minute)
+    ereignis.zid = zug.zid
+    ereignis.name = zug.name
+    ereignis.von = zug.von
+    ereignis.nach = zug.nach
+    ereignis.gleis = ereignis.plangleis = gleis
+    ereignis.verspaetung = verspaetung
+    ereignis.amgleis = amgleis
+    ereignis.sichtbar = sichtbar
+    return ereignis
+
+
+def beispiel_sitzung(anzahl: int = 1000, seed: int = 0) -> Aufzeichnung:
+    """
+    synthetische sitzung mit den zügen von beispiel_zuege erstellen.
+
+    der tatsächliche fahrtverlauf wird mit einem einfachen zufallsmodell erzeugt:
+
+    - die einfahrt liegt drei minuten plus der anfangsverspätung (zug.verspaetung) vor der planankunft am ersten ziel.
+      die tatsächliche fahrzeit von der einfahrt hängt vom ersten gleis ab (2 bis 6 minuten).
+    - die fahrzeit zwischen zwei zielen weicht um -1 bis +2 minuten vom fahrplan ab,
+      in etwa jedem zehnten abschnitt kommt eine störung von bis zu 8 minuten dazu.
+    - die züge fahren frühestens zur planabfahrt ab, mit gelegentlich verlängertem aufenthalt.
+    - ein folgezug fährt frühestens eine minute nach der ankunft des stammzuges ab.
+    - die züge erscheinen eine stunde vor der einfahrt bzw. abfahrt in der zugliste.
+
+    :param anzahl: anzahl züge
+    :param seed: startwert des zufallsgenerators
+    :return: Aufzeichnung
+    """
+    rng = random.Random(seed)
+    sitzung = Aufzeichnung()
+    sitzung.anlage.aid = 0
+    sitzung.anlage.name = "Beispiel"
+    sitzung.zuege = beispiel_zuege(anzahl, seed)
+    stammankuenfte = {}
+
+    for zug in sitzung.zuege:
+        fahrplan = zug.fahrplan
+        zug.sichtbar = False
+        if zug.von.startswith("Gleis"):
+            plan_ab = time_to_minutes(fahrplan[0].ab)
+            ab = max(plan_ab, stammankuenfte.get(zug.zid, 0) + 1)
+            sitzung.erscheinen[zug.zid] = ab - 60
+            sitzung.ereignisse.append(beispiel_ereignis(zug, 'abfahrt', ab, fahrplan[1].plan, ab - plan_ab))
+            erstes = 1
+            an = None
+        else:
+            einfahrt = time_to_minutes(fahrplan[0].an) - 3 + zug.verspaetung
+            sitzung.erscheinen[zug.zid] = einfahrt - 60
+            sitzung.ereignisse.append(beispiel_ereignis(zug, 'einfahrt', einfahrt, fahrplan[0].plan,
+                                                        zug.verspaetung))
+            an = einfahrt + 2 + int(fahrplan[0].gleis.split()[-1]) // 2 + rng.choice([0, 0, 1])
+            erstes = 0
+
+        for index in range(erstes, len(fahrplan)):
+            zeile = fahrplan[index]
+            plan_an = time_to_minutes(zeile.an)
+            if an is None:
+                fahrzeit = plan_an - plan_ab + rng.choice([-1, 0, 0, 0, 1, 2])
+                if rng.random() < 0.1:
+                    fahrzeit += rng.randint(1, 8)
+                an = ab + max(1, fahrzeit)
+            sitzung.ereignisse.append(beispiel_ereignis(zug, 'ankunft', an, zeile.plan, an - plan_an, amgleis=True))
+            if zeile.ab is None:
+                # nummernwechsel auf den folgezug (flag E(zid))
+                stammankuenfte[int(zeile.flags[2:-1])] = an
+                break
+
+            plan_ab = time_to_minutes(zeile.ab)
+            ab = max(plan_ab, an)
+            if rng.random() < 0.05:
+                ab += rng.randint(1, 3)
+            try:
+                naechstes = fahrplan[index + 1].plan
+            except IndexError:
+                naechstes = zug.nach
+            sitzung.ereignisse.append(beispiel_ereignis(zug, 'abfahrt', ab, naechstes, ab - plan_ab))
+            an = None
+        else:
+            sitzung.ereignisse.append(beispiel_ereignis(zug, 'ausfahrt', ab + 2, zug.nach, ab - plan_ab,
+                                                        sichtbar=False))
+
+    sitzung.ereignisse.sort(key=lambda e: e.zeit)
+    return sitzung
+
+
+def aufzeichnung_laden(pfad: os.PathLike, sitzung: Optional[int] = None) -> Aufzeichnung:
+    """
+    sitzung aus einer sqlite-datenbank von SitzungsDatenbank laden.
+
+    die fahrpläne werden so zurückgebaut, wie sie der PluginClient liefert:
+    die ein- und ausfahrtszeilen der planung werden entfernt, wenn der zug ein- bzw. ausgefahren ist.
+    andernfalls beginnt bzw. endet der zug an einem gleis im stellwerk (von/nach "Gleis ...").
+    ein zug erscheint mit seiner ersten prognose in der zugliste, spätestens eine minute vor dem ersten ereignis.
+    bis zum ersten ereignis meldet er die verspätung aus diesem ereignis.
+
+    :param pfad: pfad der datenbank
+    :param sitzung: id der sitzung. standardmässig die letzte sitzung in der datenbank.
+    :return: Aufzeichnung
+    :raise: ValueError, wenn die sitzung nicht existiert. sqlite3.Error
+    """
+    verbindung = sqlite3.connect(pfad)
+    try:
+        if sitzung is None:
+            sitzung = verbindung.execute("select max(id) from sitzungen").fetchone()[0]
+        try:
+            aid, name = verbindung.execute("select aid, name from sitzungen where id = ?", (sitzung,)).fetchone()
+        except TypeError:
+            raise ValueError(f"sitzung {sitzung} nicht in {pfad}")
+        zuege = verbindung.execute("select zid, name, von, nach from zuege where sitzung = ? order by zid",
+                                   (sitzung,)).fetchall()
+        fahrplan = verbindung.execute("select zid, plan, gleis, an, ab, flags from fahrplan where sitzung = ? "
+                                      "order by zid, zeile", (sitzung,)).fetchall()
+        ereignisse = verbindung.execute("select zeit, zid, art, gleis, plangleis, verspaetung, amgleis "
+                                        "from ereignisse where sitzung = ? order by zeit, rowid",
+                                        (sitzung,)).fetchall()
+        prognosen = dict(verbindung.execute("select zid, min(simzeit) from prognosen where sitzung = ? group by zid",
+                                            (sitzung,)).fetchall())
+    finally:
+        verbindung.close()
+
+    aufzeichnung = Aufzeichnung()
+    aufzeichnung.anlage.aid = aid
+    aufzeichnung.anlage.name = name
+    zugliste = {}
+    for zid, zugname, von, nach in zuege:
+        zug = ZugDetails()
+        zug.zid = zid
+        zug.name = zugname
+        zug.von = von
+        zug.nach = nach
+        zugliste[zid] = zug
+
+    for zid, plan, gleis, an, ab, flags in fahrplan:
+        zug = zugliste[zid]
+        zeile = FahrplanZeile(zug)
+        zeile.plan = plan
+        zeile.gleis = gleis
+        zeile.an = minutes_to_time(an) if an is not None else None
+        zeile.ab = minutes_to_time(ab) if ab is not None else None
+        zeile.flags = flags
+        zug.fahrplan.append(zeile)
+
+    arten = {}
+    for zeit, zid, art, gleis, plangleis, verspaetung, amgleis in ereignisse:
+        try:
+            zug = zugliste[zid]
+        except KeyError:
+            continue
+        ereignis = Ereignis()
+        ereignis.art = art
+        ereignis.zeit = DATUM + datetime.timedelta(seconds=zeit)
+        ereignis.zid = zid
+        ereignis.name = zug.name
+        ereignis.von = zug.von
+        ereignis.nach = zug.nach
+        ereignis.gleis = gleis
+        ereignis.plangleis = plangleis
+        ereignis.verspaetung = verspaetung
+        ereignis.amgleis = bool(amgleis)
+        ereignis.sichtbar = art != 'ausfahrt'
+        aufzeichnung.ereignisse.append(ereignis)
+        if zid not in arten:
+            zug.verspaetung = verspaetung
+            aufzeichnung.erscheinen[zid] = ereignis_minute(ereignis) - 1
+        arten.setdefault(zid, set()).add(art)
+
+    for zid, zug in zugliste.items():
+        if not zug.fahrplan:
+            continue
+        zugarten = arten.get(zid, set())
+        if zug.fahrplan[0].plan == zug.von:
+            if 'einfahrt' in zugarten:
+                del zug.fahrplan[0]
+            else:
+                zug.von = "Gleis " + zug.von
+        if zug.fahrplan and zug.fahrplan[-1].plan == zug.nach:
+            if 'ausfahrt' in zugarten:
+                del zug.fahrplan[-1]
+            else:
+                zug.nach = "Gleis " + zug.nach
+        if not zug.fahrplan:
+            continue
+
+        zug.sichtbar = 'einfahrt' not in zugarten
+        zug.gleis = zug.plangleis = zug.fahrplan[0].plan
+        try:
+            aufzeichnung.erscheinen[zid] = min(aufzeichnung.erscheinen[zid], prognosen[zid])
+        except KeyError:
+            try:
+                aufzeichnung.erscheinen[zid] = prognosen[zid]
+            except KeyError:
+                continue
+        aufzeichnung.zuege.append(zug)
+
+    return aufzeichnung
+
+
+@dataclass
+class Prognosefehler:
+    """
+    fehler der vorhergesagten ankunftszeiten pro vorhersagehorizont.
+
+    fehler[h] enthält für jede ankunft die differenz prognose - tatsächliche ankunft in minuten,
+    wobei die prognose die letzte ist, die mindestens h minuten vor der ankunft berechnet wurde.
+    """
+    fehler: Dict[int, List[int]] = field(default_factory=dict)
+
+    def hinzufuegen(self, horizont: int, fehler: int):
+        """
+        prognosefehler in minuten für einen horizont notieren
+        """
+        self.fehler.setdefault(horizont, []).append(fehler)
+
+    def zeile(self, horizont: int) -> str:
+        """
+        tabellenzeile mit bias, mittlerem absolutem fehler, 90%-quantil und anteil höchstens 1 minute
+        """
+        try:
+            werte = np.abs(np.asarray(self.fehler[horizont]))
+            mittel = np.mean(self.fehler[horizont])
+        except KeyError:
+            return f"{'':>6s} {'':>6s} {'':>6s} {'':>6s}"
+        return f"{mittel:+6.2f} {np.mean(werte):6.2f} {np.percentile(werte, 90):6.1f} {np.mean(werte <= 1):6.0%}"
+
+
+def _minutendifferenz(a: int, b: int) -> int:
+    """
+    differenz von zwei minutenangaben über mitternacht hinweg
+    """
+    return (a - b + 720) % 1440 - 720
+
+
+def sitzung_abspielen(sitzung: Aufzeichnung, horizonte: List[int],
+                      export: Optional[datenbank.SitzungsDatenbank] = None) -> Dict[str, Any]:
+    """
+    sitzung mit maximaler geschwindigkeit durch Planung und Auswertung spielen.
+
+    die sim-zeit läuft in schritten von einer minute.
+    in jedem zyklus werden zuerst die ereignisse der minute an Planung.ereignis_auswerten
+    und Auswertung.ereignis_uebernehmen übergeben und die zugdaten nachgeführt.
+    danach folgt die aktualisierung wie in der hauptschleife von sts-charts:
+    zuege_uebernehmen, einfahrten_korrigieren, verspaetungen_korrigieren und zuege_archivieren.
+    am ende des zyklus werden die prognostizierten ankunftszeiten der noch nicht erreichten ziele notiert.
+
+    bei jedem einfahrts- und ankunftsereignis wird die tatsächliche zeit mit den notierten prognosen verglichen,
+    getrennt nach einfahrten (schätzung der einfahrtszeit) und halten (verspätungsprognose).
+    als referenz dient eine naive prognose, die die aktuelle verspätung des zuges unverändert fortschreibt
+    und die einfahrt zur planankunft am ersten ziel annimmt.
+
+    :param sitzung: abzuspielende sitzung
+    :param horizonte: vorhersagehorizonte in minuten (mindestens 1)
+    :param export: optional: datenbank, in die die sitzung geschrieben wird.
+    :return: dict mit den schlüsseln 'planung' und 'naiv' (je ein dict art -> Prognosefehler),
+        'laufzeiten' (dict teil -> liste der laufzeiten in sekunden pro zyklus) und 'zyklen'.
+    """
+    _planung = planung.Planung()
+    _auswertung = auswertung.Auswertung(anlage.Anlage(sitzung.anlage))
+    _planung.auswertung = _auswertung
+
+    erscheinen = sorted(sitzung.zuege, key=lambda z: sitzung.erscheinen[z.zid])
+    zuege: Dict[int, ZugDetails] = {}
+    prognosen: Dict[Tuple[int, str], List[Tuple[int, int, int]]] = {}
+    fehler = {"planung": {"einfahrt": Prognosefehler(), "halt": Prognosefehler()},
+              "naiv": {"einfahrt": Prognosefehler(), "halt": Prognosefehler()}}
+    laufzeiten = {"ereignisse": [], "planung": [], "auswertung": []}
+
+    def vergleichen(art: str, zid: int, plan: str, minute: int):
+        try:
+            liste = prognosen[(zid, plan)]
+        except KeyError:
+            return
+        for horizont in horizonte:
+            index = bisect.bisect_right(liste, (minute - horizont, np.inf)) - 1
+            if index >= 0:
+                fehler["planung"][art].hinzufuegen(horizont, _minutendifferenz(liste[index][1], minute))
+                fehler["naiv"][art].hinzufuegen(horizont, _minutendifferenz(liste[index][2], minute))
+
+    try:
+        minute = min(sitzung.erscheinen[zug.zid] for zug in sitzung.zuege)
+        ende = ereignis_minute(sitzung.ereignisse[-1])
+    except ValueError:
+        return {"planung": fehler["planung"], "naiv": fehler["naiv"], "laufzeiten": laufzeiten, "zyklen": 0}
+
+    i_zug = 0
+    i_ereignis = 0
+    zyklen = 0
+    while minute <= ende:
+        simzeit = minute % 1440
+        while i_zug < len(erscheinen) and sitzung.erscheinen[erscheinen[i_zug].zid] <= minute:
+            zuege[erscheinen[i_zug].zid] = erscheinen[i_zug]
+            i_zug += 1
+
+        t0 = time.perf_counter()
+        while i_ereignis < len(sitzung.ereignisse) and ereignis_minute(sitzung.ereignisse[i_ereignis]) <= minute:
+            ereignis = sitzung.ereignisse[i_ereignis]
+            i_ereignis += 1
+            try:
+                plan_zug = _planung.zugliste[ereignis.zid]
+                if ereignis.art == 'einfahrt':
+                    ziel = plan_zug.fahrplan[0]
+                else:
+                    ziel = plan_zug.fahrplan[plan_zug.ziel_index]
+            except (IndexError, KeyError):
+                ziel = None
+
+            try:
+                zug = zuege[ereignis.zid]
+            except KeyError:
+                pass
+            else:
+                zug.verspaetung = ereignis.verspaetung
+                zug.sichtbar = ereignis.sichtbar
+                zug.gleis = ereignis.gleis
+                zug.plangleis = ereignis.plangleis
+                zug.amgleis = ereignis.amgleis
+                # ausgefahrene und im stellwerk endende züge verschwinden aus der zugliste
+                if ereignis.art == 'ausfahrt' or (ereignis.art == 'ankunft' and zug.nach.startswith("Gleis") and
+                                                  ereignis.plangleis == zug.fahrplan[-1].plan):
+                    del zuege[ereignis.zid]
+
+            _planung.ereignis_auswerten(ereignis)
+            _auswertung.ereignis_uebernehmen(ereignis)
+
+            if ziel is not None and not ziel.ausfahrt:
+                if ereignis.art == 'einfahrt' and ziel.einfahrt:
+                    t = time.perf_counter()
+                    vergleichen('einfahrt', ereignis.zid, ziel.plan, ereignis_minute(ereignis))
+                    t0 += time.perf_counter() - t
+                elif ereignis.art == 'ankunft' and ziel.angekommen:
+                    t = time.perf_counter()
+                    vergleichen('halt', ereignis.zid, ziel.plan, ereignis_minute(ereignis))
+                    t0 += time.perf_counter() - t
+
+        t1 = time.perf_counter()
+        _planung.zuege_uebernehmen(zuege.values())
+        _planung.einfahrten_korrigieren()
+        _planung.verspaetungen_korrigieren(simzeit)
+        _planung.zuege_archivieren(simzeit)
+        t2 = time.perf_counter()
+        _auswertung.zuege_uebernehmen(zuege.values())
+        _auswertung.zuege_archivieren(simzeit)
+        t3 = time.perf_counter()
+        laufzeiten["ereignisse"].append(t1 - t0)
+        laufzeiten["planung"].append(t2 - t1)
+        laufzeiten["auswertung"].append(t3 - t2)
+
+        if export is not None:
+            export.aktualisieren(sitzung.anlage, _planung, _auswertung, simzeit)
+
+        for zid in zuege:
+            try:
+                plan_zug = _planung.zugliste[zid]
+            except KeyError:
+                continue
+            verspaetung = zuege[zid].verspaetung
+            for index, ziel in enumerate(plan_zug.fahrplan):
+                if ziel.angekommen or ziel.ausfahrt:
+                    continue
+                prognose = ziel.ankunft_minute
+                try:
+                    if ziel.einfahrt:
+                        naiv = plan_zug.fahrplan[index + 1].plan_an + verspaetung
+                    else:
+                        naiv = ziel.plan_an + verspaetung
+                except (IndexError, TypeError):
+                    continue
+                if prognose is None:
+                    continue
+                liste = prognosen.setdefault((zid, ziel.plan), [])
+                if not liste or liste[-1][1:] != (prognose, naiv):
+                    liste.append((minute, prognose, naiv))
+
+        minute += 1
+        zyklen += 1
+
+    return {"planung": fehler["planung"], "naiv": fehler["naiv"], "laufzeiten": laufzeiten, "zyklen": zyklen}
+
+
+def benchmark_prognose(args: argparse.Namespace) -> None:
+    """
+    treffsicherheit und laufzeit der verspätungsprognose und der einfahrtsschätzung messen.
+
+    eine synthetische oder mit `sts-charts --datenbank` aufgezeichnete sitzung
+    wird mit sitzung_abspielen durch Planung und Auswertung gespielt.
+    ausgegeben werden pro vorhersagehorizont der mittlere fehler (bias), der mittlere absolute fehler,
+    das 90%-quantil des absoluten fehlers und der anteil der prognosen mit höchstens einer minute abweichung,
+    jeweils für die planung und die naive referenz,
+    sowie die laufzeit pro zyklus (mittelwert, 95%-quantil und maximum).
+
+    :param args: parsed arguments (aufzeichnung, sitzung, zuege, seed, horizonte, export)
+    :return: None
+    """
+    if args.aufzeichnung:
+        sitzung = aufzeichnung_laden(args.aufzeichnung, args.sitzung)
+    else:
+        sitzung = beispiel_sitzung(args.zuege, args.seed)
+
+    export = datenbank.SitzungsDatenbank(args.export) if args.export else None
+    try:
+        resultat = sitzung_abspielen(sitzung, args.horizonte, export)
+    finally:
+        if export is not None:
+            export.schliessen()
+
+    print(f"{sitzung.anlage.name}: {len(sitzung.zuege)} züge, {len(sitzung.ereignisse)} ereignisse, "
+          f"{resultat['zyklen']} zyklen")
+    print()
+    print(f"{'':9s} {'horizont':>8s} {'anzahl':>7s} | {'planung':^27s} | {'naiv':^27s}")
+    print(f"{'':9s} {'min':>8s} {'':>7s} | {'bias':>6s} {'mae':>6s} {'p90':>6s} {'≤1min':>6s} "
+          f"| {'bias':>6s} {'mae':>6s} {'p90':>6s} {'≤1min':>6s}")
+    for art in ("einfahrt", "halt"):
+        for horizont in args.horizonte:
+            anzahl = len(resultat["planung"][art].fehler.get(horizont, []))
+            print(f"{art:9s} {horizont:8d} {anzahl:7d} | {resultat['planung'][art].zeile(horizont)} "
+                  f"| {resultat['naiv'][art].zeile(horizont)}")
+    print()
+    print(f"{'laufzeit':14s} {'mittel':>10s} {'p95':>10s} {'max':>10s}")
+    for teil, zeiten in resultat["laufzeiten"].items():
+        if zeiten:
+            zeiten = np.asarray(zeiten) * 1000
+            print(f"{teil:14s} {np.mean(zeiten):7.2f} ms {np.percentile(zeiten, 95):7.2f} ms "
+                  f"{np.max(zeiten):7.2f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="""
+        laufzeitmessungen von stskit-algorithmen mit synthetischen daten.
+        """
+    )
+    subparsers = parser.add_subparsers(dest="messung", required=True)
+
+    p = subparsers.add_parser("gruppieren", help="Anlage.gleise_gruppieren")
+    p.add_argument("--knoten", type=int, default=2000, help="anzahl knoten im signal-graph")
+    p.add_argument("--wiederholungen", type=int, default=3)
+    p.set_defaults(func=benchmark_gleise_gruppieren)
+
+    p = subparsers.add_parser("planung", help="Planung.verspaetungen_korrigieren")
+    p.add_argument("--zuege", type=int, default=1000, help="anzahl züge")
+    p.add_argument("--zyklen", type=int, default=20, help="anzahl aktualisierungszyklen")
+    p.add_argument("--anteil", type=float, default=0.02, help="anteil der züge mit geänderter verspätung")
+    p.set_defaults(func=benchmark_planung)
+
+    p = subparsers.add_parser("prognose", help="treffsicherheit und laufzeit von Planung und Auswertung")
+    p.add_argument("--aufzeichnung", help="sitzungsdatenbank von sts-charts --datenbank. "
+                                          "ohne angabe wird eine synthetische sitzung erzeugt.")
+    p.add_argument("--sitzung", type=int, help="id der sitzung in der datenbank (standard: letzte)")
+    p.add_argument("--zuege", type=int, default=1000, help="anzahl züge der synthetischen sitzung")
+    p.add_argument("--seed", type=int, default=0, help="startwert der synthetischen sitzung")
+    p.add_argument("--horizonte", type=int, nargs="+", default=[1, 5, 15, 30],
+                   help="vorhersagehorizonte in minuten")
+    p.add_argument("--export", help="abgespielte sitzung in diese datenbank schreiben")
+    p.set_defaults(func=benchmark_prognose)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    args.func(args)
@@ -1,7 +1,7 @@
 import math
 from dataclasses import dataclass, field
 import logging
-from typing import Any, Dict, Generator, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, Generator, Iterable, List, Mapping, Optional, Set, Tuple, Union
 
 import matplotlib as mpl
 from PyQt5.QtCore import pyqtSlot
@@ -355,21 +355,21 @@ class BildFahrplanWindow(QtWidgets.QMainWindow):
                     continue
 
             try:
-                ab = time_to_minutes(plan1.ab) + plan1.verspaetung_ab
-                an = time_to_minutes(plan2.an) + plan2.verspaetung_an
+                ab = plan1.plan_ab + plan1.verspaetung_ab
+                an = plan2.plan_an + plan2.verspaetung_an
                 trasse.koord = [(distanz[i_gruppe1], max(ab, an_vorher)),
                                 (distanz[i_gruppe2], an)]
                 an_vorher = an
-            except AttributeError:
+            except TypeError:
                 pass
             else:
                 zuglauf.append(trasse)
 
             # haltelinie
             try:
-                an = time_to_minutes(plan2.an) + plan2.verspaetung_an
-                ab = time_to_minutes(plan2.ab) + plan2.verspaetung_ab
-            except AttributeError:
+                an = plan2.plan_an + plan2.verspaetung_an
+                ab = plan2.plan_ab + plan2.verspaetung_ab
+            except TypeError:
                 pass
             else:
                 if ab > an:
@@ -555,9 +555,8 @@ class BildFahrplanWindow(QtWidgets.QMainWindow):
         except IndexError:
             pass
         else:
-            trasse.start.fdl_korrektur = None
-            self.planung.zugverspaetung_korrigieren(trasse.zug)
-            self.update_zuglauf(trasse.zug)
+            self.korrektur_anwenden(trasse.zug,
+                                    lambda szenario: self.planung.fdl_korrektur_setzen(None, trasse.start))
 
         self.grafik_update()
         self.update_actions()
@@ -582,28 +581,69 @@ class BildFahrplanWindow(QtWidgets.QMainWindow):
         self.grafik_update()
         self.update_actions()
 
-    def verspaetung_aendern(self, trasse: Trasse, verspaetung: int, relativ: bool = False):
-        korrektur = trasse.start.fdl_korrektur
-        neu = korrektur is None
-
-        if relativ and hasattr(korrektur, "wartezeit"):
-            korrektur.wartezeit += verspaetung
-        elif not isinstance(korrektur, planung.FesteVerspaetung):
-            korrektur = planung.FesteVerspaetung(self.planung)
-            korrektur.verspaetung = trasse.start.verspaetung_ab
-            neu = True
-
-        if hasattr(korrektur, "verspaetung"):
-            if relativ:
-                korrektur.verspaetung += verspaetung
+    def korrektur_anwenden(self, zug: ZugDetailsPlanung, aenderung: Callable[[planung.Szenario], None],
+                           zyklen_verwerfen: bool = False) -> bool:
+        """
+        fdl-korrektur in einem szenario der planung anwenden.
+
+        die änderung wird in einem Szenario ausgeführt und sofort inkrementell ausgewertet.
+        wenn zyklen_verwerfen gesetzt ist und der zug danach zyklisch von anderen zügen abhängt,
+        wird das szenario verworfen, andernfalls übernommen.
+        in beiden fällen werden die zugläufe der im szenario geänderten züge nachgeführt.
+
+        das szenario beginnt und endet innerhalb dieses aufrufs.
+        updates und ereignisse vom simulator können deshalb nicht dazwischen kommen.
+
+        :param zug: zug, dessen korrektur geändert wird
+        :param aenderung: funktion, die die korrektur setzt oder ändert.
+            sie erhält das szenario als argument, damit sie züge vor dem ändern einer bestehenden korrektur sichern kann.
+        :param zyklen_verwerfen: änderung verwerfen, wenn sie eine zyklische abhängigkeit erzeugt.
+        :return: True, wenn die änderung übernommen wurde.
+        """
+        with self.planung.szenario_beginnen() as szenario:
+            aenderung(szenario)
+            unterschiede = szenario.auswerten()
+            uebernommen = not (zyklen_verwerfen and
+                               any(zug.zid in komponente for komponente in self.planung.zyklen))
+            if uebernommen:
+                szenario.uebernehmen()
             else:
-                korrektur.verspaetung = verspaetung
+                logger.warning(f"korrektur von {zug.name} verworfen: zyklische abhängigkeit")
+                szenario.verwerfen()
 
-        if neu:
-            self.planung.fdl_korrektur_setzen(korrektur, trasse.start)
+        for zid in unterschiede:
+            try:
+                self.update_zuglauf(self.planung.zugliste[zid])
+            except KeyError:
+                pass
+        return uebernommen
+
+    def verspaetung_aendern(self, trasse: Trasse, verspaetung: int, relativ: bool = False):
+        def aenderung(szenario: planung.Szenario):
+            korrektur = trasse.start.fdl_korrektur
+            neu = korrektur is None
+            # die bestehende korrektur wird direkt verändert
+            szenario.sichern([trasse.zug.zid])
+
+            if relativ and hasattr(korrektur, "wartezeit"):
+                korrektur.wartezeit += verspaetung
+            elif not isinstance(korrektur, planung.FesteVerspaetung):
+                korrektur = planung.FesteVerspaetung(self.planung)
+                korrektur.verspaetung = trasse.start.verspaetung_ab
+                neu = True
+
+            if hasattr(korrektur, "verspaetung"):
+                if relativ:
+                    korrektur.verspaetung += verspaetung
+                else:
+                    korrektur.verspaetung = verspaetung
+
+            if neu:
+                self.planung.fdl_korrektur_setzen(korrektur, trasse.start)
+            else:
+                self.planung.neuberechnung_vormerken(trasse.zug)
 
-        self.planung.zugverspaetung_korrigieren(trasse.zug)
-        self.update_zuglauf(trasse.zug)
+        self.korrektur_anwenden(trasse.zug, aenderung)
 
     def abhaengigkeit_definieren(self, trasse: Trasse, referenz: ZugZielPlanung, wartezeit: int = 0,
                                  abfahrt: bool = False):
@@ -614,6 +654,6 @@ class BildFahrplanWindow(QtWidgets.QMainWindow):
         korrektur.ursprung = referenz
         korrektur.wartezeit = wartezeit
 
-        self.planung.fdl_korrektur_setzen(korrektur, trasse.start)
-        self.planung.zugverspaetung_korrigieren(trasse.zug)
-        self.update_zuglauf(trasse.zug)
+        self.korrektur_anwenden(trasse.zug,
+                                lambda szenario: self.planung.fdl_korrektur_setzen(korrektur, trasse.start),
+                                zyklen_verwerfen=True)
@@ -0,0 +1,176 @@
+"""
+export der sitzungsdaten in eine sqlite-datenbank
+
+die klasse SitzungsDatenbank schreibt züge, fahrpläne, ereignisse, gemessene fahrzeiten
+und die verspätungsprognosen der planung während des spiels in eine lokale sqlite-datei.
+mehrere sitzungen (auch verschiedener anlagen) können in derselben datei liegen
+und später mit sql ausgewertet werden, z.b. pünktlichkeit pro bahnhof oder treffsicherheit der prognosen.
+
+der export ist optional und wird in sts-charts mit der option `--datenbank` aktiviert.
+
+zeiteinheiten:
+- ereignisse.zeit: sekunden seit mitternacht des ersten ereignisses (siehe EreignisLog).
+- fahrplan.an/ab, prognosen.simzeit: minuten seit mitternacht.
+- fahrzeiten.zeit: sekunden.
+- verspätungen: minuten.
+
+beispiel:
+
+~~~~~~{.sql}
+select gleis, avg(verspaetung) from ereignisse where art = 'ankunft' group by gleis;
+~~~~~~
+"""
+
+import datetime
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from auswertung import Auswertung
+from planung import Planung
+from stsobj import AnlagenInfo, ZugDetails, time_to_minutes
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+SCHEMA = """
+create table if not exists sitzungen (id integer primary key, aid integer, name text, start text);
+create table if not exists zuege (sitzung integer, zid integer, name text, gattung text, nummer integer,
+    von text, nach text, primary key (sitzung, zid));
+create table if not exists fahrplan (sitzung integer, zid integer, zeile integer, plan text, gleis text,
+    an integer, ab integer, flags text);
+create table if not exists ereignisse (sitzung integer, zeit integer, zid integer, art text, gleis text,
+    plangleis text, verspaetung integer, amgleis integer);
+create table if not exists fahrzeiten (sitzung integer, zug integer, gattung text, von text, nach text, zeit real);
+create table if not exists prognosen (sitzung integer, simzeit integer, zid integer, plan text,
+    verspaetung_an integer, verspaetung_ab integer);
+create index if not exists fahrplan_zid on fahrplan (sitzung, zid);
+create index if not exists fahrplan_gleis on fahrplan (gleis);
+create index if not exists ereignisse_zid on ereignisse (sitzung, zid);
+create index if not exists ereignisse_gleis on ereignisse (gleis, zeit);
+create index if not exists ereignisse_zeit on ereignisse (sitzung, zeit);
+create index if not exists fahrzeiten_strecke on fahrzeiten (von, nach);
+create index if not exists prognosen_zid on prognosen (sitzung, zid, plan);
+"""
+
+
+class SitzungsDatenbank:
+    """
+    sitzungsdaten laufend in eine sqlite-datenbank schreiben.
+
+    aktualisieren wird nach jedem update der planung und auswertung aufgerufen.
+    die methode schreibt alle seit dem letzten aufruf neuen daten in einer einzigen transaktion:
+    neue züge mit ihrem fahrplan, neue ereignisse aus dem EreignisLog, neue fahrzeit-messpunkte
+    und die verspätungsprognosen der noch nicht erreichten fahrplanziele, soweit sie sich geändert haben.
+
+    die sitzung wird beim ersten aufruf in der tabelle sitzungen angelegt.
+    die zuletzt geschriebenen prognosen werden nur für züge in der zugliste der planung behalten,
+    archivierte züge werden vergessen.
+    am ende der sitzung muss schliessen aufgerufen werden.
+    """
+
+    def __init__(self, pfad: os.PathLike):
+        self.verbindung = sqlite3.connect(pfad)
+        self.verbindung.executescript(SCHEMA)
+        self.sitzung: Optional[int] = None
+        self._zuege: set = set()
+        self._ereignisse: int = 0
+        self._messpunkte: int = 0
+        # zid -> plan -> zuletzt geschriebene prognose (verspaetung_an, verspaetung_ab)
+        self._prognosen: Dict[int, Dict[str, Tuple[int, int]]] = {}
+
+    def schliessen(self) -> None:
+        """
+        datenbankverbindung schliessen.
+
+        :return: None
+        """
+        self.verbindung.close()
+
+    def sitzung_beginnen(self, anlage: AnlagenInfo) -> int:
+        """
+        neue sitzung anlegen.
+
+        :param anlage: anlageninfo des simulators
+        :return: id der sitzung
+        """
+        with self.verbindung:
+            cursor = self.verbindung.execute("insert into sitzungen (aid, name, start) values (?, ?, ?)",
+                                             (anlage.aid, anlage.name, datetime.datetime.now().isoformat()))
+        self.sitzung = cursor.lastrowid
+        return self.sitzung
+
+    def aktualisieren(self, anlage: AnlagenInfo, planung: Planung, auswertung: Auswertung, simzeit: int) -> None:
+        """
+        neue daten in einer transaktion schreiben.
+
+        :param anlage: anlageninfo des simulators
+        :param planung: Planung-objekt mit zugliste und prognosen
+        :param auswertung: Auswertung-objekt mit ereignislog und fahrzeiten
+        :param simzeit: aktuelle sim-zeit in minuten
+        :return: None
+        """
+        if self.sitzung is None:
+            self.sitzung_beginnen(anlage)
+
+        with self.verbindung:
+            self._zuege_schreiben(planung.zugliste.values())
+            self._ereignisse_schreiben(auswertung)
+            self._fahrzeiten_schreiben(auswertung)
+            self._prognosen_schreiben(planung.zugliste.values(), simzeit)
+
+    def _zuege_schreiben(self, zuege: Iterable[ZugDetails]) -> None:
+        zeilen = []
+        fahrplan = []
+        for zug in zuege:
+            if zug.zid in self._zuege:
+                continue
+            self._zuege.add(zug.zid)
+            zeilen.append((self.sitzung, zug.zid, zug.name, zug.gattung, zug.nummer, zug.von, zug.nach))
+            for index, ziel in enumerate(zug.fahrplan):
+                fahrplan.append((self.sitzung, zug.zid, index, ziel.plan, ziel.gleis,
+                                 _minuten(ziel.an), _minuten(ziel.ab), ziel.flags))
+
+        self.verbindung.executemany("insert or replace into zuege values (?, ?, ?, ?, ?, ?, ?)", zeilen)
+        self.verbindung.executemany("insert into fahrplan values (?, ?, ?, ?, ?, ?, ?, ?)", fahrplan)
+
+    def _ereignisse_schreiben(self, auswertung: Auswertung) -> None:
+        log = auswertung.ereignisse
+        neu = log.daten[self._ereignisse:]
+        self._ereignisse = len(log)
+        self.verbindung.executemany("insert into ereignisse values (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    ((self.sitzung, int(e['zeit']), int(e['zid']), log.arten[e['art']],
+                                      log.gleise[e['gleis']], log.gleise[e['plangleis']],
+                                      int(e['verspaetung']), bool(e['amgleis'])) for e in neu))
+
+    def _fahrzeiten_schreiben(self, auswertung: Auswertung) -> None:
+        neu = auswertung.fahrzeiten.messpunkte(self._messpunkte)
+        self._messpunkte += len(neu)
+        self.verbindung.executemany("insert into fahrzeiten values (?, ?, ?, ?, ?, ?)",
+                                    ((self.sitzung, *messpunkt) for messpunkt in neu))
+
+    def _prognosen_schreiben(self, zuege: Iterable[ZugDetails], simzeit: int) -> None:
+        zeilen = []
+        prognosen = {}
+        for zug in zuege:
+            alte = self._prognosen.get(zug.zid, {})
+            neue = prognosen[zug.zid] = {}
+            for ziel in zug.fahrplan:
+                if ziel.angekommen:
+                    continue
+                prognose = (ziel.verspaetung_an, ziel.verspaetung_ab)
+                neue[ziel.plan] = prognose
+                if alte.get(ziel.plan) != prognose:
+                    zeilen.append((self.sitzung, simzeit, zug.zid, ziel.plan, *prognose))
+
+        self._prognosen = prognosen
+        self.verbindung.executemany("insert into prognosen values (?, ?, ?, ?, ?, ?)", zeilen)
+
+
+def _minuten(zeit: Optional[datetime.time]) -> Optional[int]:
+    try:
+        return time_to_minutes(zeit)
+    except AttributeError:
+        return None
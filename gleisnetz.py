@@ -89,26 +89,13 @@ class GleisnetzWindow(QtWidgets.QMainWindow):
                     except KeyError:
                         zeit = np.nan
 
-                    # try:
-                    #     df = self.auswertung.fahrzeiten.zeiten
-                    #     assert df.columns.name == 'von'
-                    #     assert df.index.name == 'nach'
-                    #     sel_von = list(self.anlage.gleisgruppen[e1].intersection(set(df.columns)))
-                    #     sel_nach = list(self.anlage.gleisgruppen[e2].intersection(set(df.index)))
-                    #     # loc[zeile, spalte] !!!
-                    #     zeiten: pd.DataFrame = self.auswertung.fahrzeiten.zeiten.loc[sel_nach, sel_von]
-                    #     s = zeiten.sum().sum()
-                    #     n = zeiten.count().sum()
-                    #     if n > 0:
-                    #         zeit = s / n
-                    # except AttributeError:
-                    #     break
-                    # except KeyError:
-                    #     continue
-                    # except TypeError:
-                    #     break
-                    # except ZeroDivisionError:
-                    #     continue
+                    try:
+                        gemessen = self.auswertung.fahrzeiten.get_gruppenfahrzeit(e1, e2)
+                    except AttributeError:
+                        pass
+                    else:
+                        if not np.isnan(gemessen):
+                            zeit = gemessen
 
                     if not np.isnan(zeit):
                         edge_labels[(e1, e2)] = round(zeit / 60)
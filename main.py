@@ -9,6 +9,7 @@ ausserdem unterhält es die kommunikation mit dem simulator und leitet ereigniss
 
 import argparse
 import logging
+import sqlite3
 from pathlib import Path
 from typing import Any, Dict, Generator, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
 
@@ -21,6 +22,7 @@ from bildfahrplan import BildFahrplanWindow
 from stsplugin import PluginClient, TaskDone
 from anlage import Anlage
 from auswertung import Auswertung
+from datenbank import SitzungsDatenbank
 from planung import Planung
 from stsobj import Ereignis, time_to_minutes
 from gleisbelegung import GleisbelegungWindow
@@ -89,6 +91,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.anlage: Optional[Anlage] = None
         self.planung: Optional[Planung] = None
         self.auswertung: Optional[Auswertung] = None
+        self.datenbank: Optional[SitzungsDatenbank] = None
 
         self.config_path = Path.home() / r".stskit"
         self.config_path.mkdir(exist_ok=True)
@@ -141,6 +144,10 @@ class MainWindow(QtWidgets.QMainWindow):
         self.update_interval: int = 30  # seconds
         self.enable_update: bool = True
 
+        # ereignisse werden sofort eingeplant, die ansichten nach dieser verzögerung gesammelt aktualisiert.
+        self.ansicht_verzoegerung: float = 0.5  # seconds
+        self.planung_geaendert = trio.Event()
+
     def ticker_clicked(self):
         if not self.ticker_window:
             self.ticker_window = TickerWindow()
@@ -219,6 +226,16 @@ class MainWindow(QtWidgets.QMainWindow):
             except (AttributeError, OSError):
                 pass
 
+            try:
+                self.planung.zustand_speichern(self.config_path, self.client.anlageninfo.aid)
+            except (AttributeError, OSError):
+                pass
+
+            try:
+                self.auswertung.save_config(self.config_path)
+            except (AttributeError, OSError):
+                pass
+
             try:
                 self.auswertung.fahrzeiten.report()
             except (AttributeError, OSError):
@@ -238,24 +255,59 @@ class MainWindow(QtWidgets.QMainWindow):
             except trio.BusyResourceError:
                 pass
             else:
-                if self.einfahrten_window is not None:
-                    self.einfahrten_window.update()
-                if self.gleisbelegung_window is not None:
-                    self.gleisbelegung_window.update()
                 if self.netz_window is not None:
                     self.netz_window.update()
-                if self.fahrplan_window is not None:
-                    self.fahrplan_window.update()
-                if self.bildfahrplan_window is not None:
-                    self.bildfahrplan_window.update()
+                self.planungsansichten_aktualisieren()
 
             await trio.sleep(self.update_interval)
 
+    def planungsansichten_aktualisieren(self):
+        """
+        ansichten aktualisieren, die die daten der planung darstellen.
+
+        :return: None
+        """
+        if self.einfahrten_window is not None:
+            self.einfahrten_window.update()
+        if self.gleisbelegung_window is not None:
+            self.gleisbelegung_window.update()
+        if self.fahrplan_window is not None:
+            self.fahrplan_window.update()
+        if self.bildfahrplan_window is not None:
+            self.bildfahrplan_window.update()
+
+    def planung_beobachten(self, zids: Set[int]):
+        """
+        beobachter der planung nach einer sofortigen neuberechnung.
+
+        meldet die aktualisierung der planungsansichten bei planung_loop an.
+
+        :param zids: zids der neu berechneten züge
+        :return: None
+        """
+        self.planung_geaendert.set()
+
+    async def planung_loop(self):
+        """
+        planungsansichten nach ereignissen aktualisieren.
+
+        die ansichten werden nach der ersten änderung mit der verzögerung ansicht_verzoegerung aktualisiert,
+        so dass ereignisse, die kurz nacheinander eintreffen, nur eine aktualisierung auslösen.
+
+        :return: None
+        """
+        await self.client.registered.wait()
+        while self.enable_update:
+            await self.planung_geaendert.wait()
+            await trio.sleep(self.ansicht_verzoegerung)
+            self.planung_geaendert = trio.Event()
+            self.planungsansichten_aktualisieren()
+
     async def ereignis_loop(self):
         await self.client.registered.wait()
         async for ereignis in self.client._ereignis_channel_out:
             if self.planung:
-                self.planung.ereignis_uebernehmen(ereignis)
+                self.planung.ereignis_auswerten(ereignis)
             if self.auswertung:
                 self.auswertung.ereignis_uebernehmen(ereignis)
             if self.ticker_window is not None:
@@ -270,18 +322,40 @@ class MainWindow(QtWidgets.QMainWindow):
             self.anlage = Anlage(self.client.anlageninfo)
         self.anlage.update(self.client, self.config_path)
 
-        if not self.planung:
+        neue_planung = not self.planung
+        if neue_planung:
             self.planung = Planung()
+            self.planung.beobachter.append(self.planung_beobachten)
 
         if not self.auswertung:
             self.auswertung = Auswertung(self.anlage)
             self.planung.auswertung = self.auswertung
+            try:
+                self.auswertung.load_config(self.config_path)
+            except (OSError, ValueError):
+                logger.info("keine gespeicherte fahrzeitstatistik")
 
+        simzeit = time_to_minutes(self.client.calc_simzeit())
         self.planung.zuege_uebernehmen(self.client.zugliste.values())
+        if neue_planung:
+            self.planung.zustand_laden(self.config_path, self.client.anlageninfo.aid, simzeit)
         self.planung.einfahrten_korrigieren()
-        self.planung.verspaetungen_korrigieren(time_to_minutes(self.client.calc_simzeit()))
+        self.planung.verspaetungen_korrigieren(simzeit)
+        self.planung.zuege_archivieren(simzeit)
+        try:
+            self.planung.zustand_speichern(self.config_path, self.client.anlageninfo.aid)
+            self.auswertung.save_config(self.config_path)
+        except OSError:
+            logger.exception("fehler beim speichern der planung")
 
         self.auswertung.zuege_uebernehmen(self.client.zugliste.values())
+        self.auswertung.zuege_archivieren(simzeit)
+
+        if self.datenbank is not None:
+            try:
+                self.datenbank.aktualisieren(self.client.anlageninfo, self.planung, self.auswertung, simzeit)
+            except sqlite3.Error:
+                logger.exception("fehler beim schreiben der datenbank")
 
     async def get_sts_data(self, alles=False):
         if alles or not self.client.anlageninfo:
@@ -317,6 +391,8 @@ def parse_args(arguments: Sequence[str]) -> argparse.Namespace:
     parser.add_argument("--log-comm", action="store_true",
                         help="ganze kommunikation mit server protokollieren. "
                              "log-level DEBUG muss dafür ausgewählt sein.")
+    parser.add_argument("--datenbank",
+                        help="sitzungsdaten laufend in diese sqlite-datei schreiben (optional).")
 
     return parser.parse_args(arguments)
 
@@ -326,6 +402,8 @@ async def main():
     setup_logging(filename=arguments.log_file, level=arguments.log_level, log_comm=arguments.log_comm)
 
     window = MainWindow()
+    if arguments.datenbank:
+        window.datenbank = SitzungsDatenbank(arguments.datenbank)
 
     client = PluginClient(name='sts-charts', autor='bummler', version='0.6',
                           text='sts-charts: grafische fahrpläne und gleisbelegungen')
@@ -342,6 +420,7 @@ async def main():
                 await client.request_anlageninfo()
                 nursery.start_soon(window.update_loop)
                 nursery.start_soon(window.ereignis_loop)
+                nursery.start_soon(window.planung_loop)
                 window.show()
                 await window.closed.wait()
                 raise TaskDone()
@@ -350,6 +429,9 @@ async def main():
         pass
     except TaskDone:
         pass
+    finally:
+        if window.datenbank is not None:
+            window.datenbank.schliessen()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,17 @@
+import copy
 import datetime
+import heapq
+import json
 import logging
+import os
+from pathlib import Path
+import networkx as nx
 import numpy as np
 from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
 
 from stsobj import ZugDetails, FahrplanZeile, Ereignis
 from stsobj import time_to_minutes, time_to_seconds, minutes_to_time, seconds_to_time
-from auswertung import Auswertung
+from auswertung import Auswertung, ArchivZeile, ArchivZug, aufbewahrung_abgelaufen
 
 
 logger = logging.getLogger(__name__)
@@ -25,7 +31,18 @@ class VerspaetungsKorrektur:
 
     wenn ein fahrplanziel abgearbeitet wurde, wird statt `anwenden` die `weiterleiten`-methode aufgerufen,
     um die verspätungskorrektur von folgezügen durchzuführen.
+
+    die methoden `quellen` und `folgezuege` deklarieren die abhängigkeiten von anderen zügen.
+    die Planung leitet daraus den abhängigkeitsgraphen ab, den sie in topologischer reihenfolge auswertet.
+    das attribut `aendert_ankunft` zeigt an, dass die korrektur auch die ankunftsverspätung des ziels ändert.
+
+    korrekturen ohne parameter (Einfahrtszeit, PlanmaessigeAbfahrt, Ersatzzug, Kupplung, Fluegelung)
+    verwendet die Planung als gemeinsame objekte für alle fahrplanziele.
+    sie dürfen deshalb keine daten eines einzelnen ziels speichern.
     """
+
+    aendert_ankunft = False
+
     def __init__(self, planung: 'Planung'):
         super().__init__()
         self._planung = planung
@@ -51,6 +68,27 @@ class VerspaetungsKorrektur:
         """
         pass
 
+    def quellen(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List[Tuple['ZugZielPlanung', bool]]:
+        """
+        fahrplanziele anderer züge, deren verspätung die korrektur liest.
+
+        :param zug:
+        :param ziel:
+        :return: liste von tupeln (fahrplanziel, ankunft).
+            ankunft ist True, wenn die ankunftsverspätung gelesen wird, False bei der abfahrtsverspätung.
+        """
+        return []
+
+    def folgezuege(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List['ZugDetailsPlanung']:
+        """
+        folgezüge, deren anfangsverspätung die korrektur setzt.
+
+        :param zug:
+        :param ziel:
+        :return: liste von zügen
+        """
+        return []
+
 
 class FesteVerspaetung(VerspaetungsKorrektur):
     """
@@ -191,6 +229,9 @@ class AnkunftAbwarten(VerspaetungsKorrektur):
         abfahrt = max(ankunft + aufenthalt, anschluss_ab)
         ziel.verspaetung_ab = abfahrt - plan_ab
 
+    def quellen(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List[Tuple['ZugZielPlanung', bool]]:
+        return [(self.ursprung, True)] if self.ursprung is not None else []
+
 
 class AbfahrtAbwarten(VerspaetungsKorrektur):
     """
@@ -238,6 +279,9 @@ class AbfahrtAbwarten(VerspaetungsKorrektur):
         abfahrt = max(ankunft + aufenthalt, anschluss_ab)
         ziel.verspaetung_ab = abfahrt - plan_ab
 
+    def quellen(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List[Tuple['ZugZielPlanung', bool]]:
+        return [(self.ursprung, False)] if self.ursprung is not None else []
+
 
 class Ersatzzug(VerspaetungsKorrektur):
     """
@@ -273,11 +317,14 @@ class Ersatzzug(VerspaetungsKorrektur):
 
         if ziel.ersatzzug:
             ziel.ersatzzug.verspaetung = ziel.verspaetung_ab
-            self._planung.zugverspaetung_korrigieren(ziel.ersatzzug)
+            self._planung.folgezug_korrigieren(ziel.ersatzzug)
 
     def weiterleiten(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung'):
         if ziel.ersatzzug:
-            self._planung.zugverspaetung_korrigieren(ziel.ersatzzug)
+            self._planung.folgezug_korrigieren(ziel.ersatzzug)
+
+    def folgezuege(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List['ZugDetailsPlanung']:
+        return [ziel.ersatzzug] if ziel.ersatzzug else []
 
 
 class Kupplung(VerspaetungsKorrektur):
@@ -289,6 +336,8 @@ class Kupplung(VerspaetungsKorrektur):
     bemerkung: der zug mit dem kuppel-flag verschwindet. der verlinkte zug fährt weiter.
     """
 
+    aendert_ankunft = True
+
     def __str__(self):
         return f"Kupplung"
 
@@ -307,7 +356,7 @@ class Kupplung(VerspaetungsKorrektur):
 
         # zuerst die verspaetung des kuppelnden zuges berechnen
         try:
-            self._planung.zugverspaetung_korrigieren(ziel.kuppelzug)
+            self._planung.folgezug_korrigieren(ziel.kuppelzug)
             kuppel_index = ziel.kuppelzug.find_fahrplan_index(plan=ziel.plan)
             kuppel_ziel = ziel.kuppelzug.fahrplan[kuppel_index]
             kuppel_verspaetung = kuppel_ziel.verspaetung_an
@@ -324,11 +373,18 @@ class Kupplung(VerspaetungsKorrektur):
         ziel.verspaetung_ab = abfahrt - plan_ab
 
         if ziel.kuppelzug:
-            self._planung.zugverspaetung_korrigieren(ziel.kuppelzug)
+            self._planung.folgezug_korrigieren(ziel.kuppelzug)
 
     def weiterleiten(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung'):
         if ziel.kuppelzug:
-            self._planung.zugverspaetung_korrigieren(ziel.kuppelzug)
+            self._planung.folgezug_korrigieren(ziel.kuppelzug)
+
+    def quellen(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List[Tuple['ZugZielPlanung', bool]]:
+        try:
+            kuppel_ziel = ziel.kuppelzug.find_fahrplanzeile(plan=ziel.plan)
+        except AttributeError:
+            return []
+        return [(kuppel_ziel, True)] if kuppel_ziel is not None else []
 
 
 class Fluegelung(VerspaetungsKorrektur):
@@ -356,11 +412,24 @@ class Fluegelung(VerspaetungsKorrektur):
         if ziel.fluegelzug:
             ziel.fluegelzug.verspaetung = ziel.verspaetung_an
             ziel.fluegelzug.fahrplan[0].verspaetung_an = ziel.verspaetung_an
-            self._planung.zugverspaetung_korrigieren(ziel.fluegelzug)
+            self._planung.folgezug_korrigieren(ziel.fluegelzug)
 
     def weiterleiten(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung'):
         if ziel.fluegelzug:
-            self._planung.zugverspaetung_korrigieren(ziel.fluegelzug)
+            self._planung.folgezug_korrigieren(ziel.fluegelzug)
+
+    def folgezuege(self, zug: 'ZugDetailsPlanung', ziel: 'ZugZielPlanung') -> List['ZugDetailsPlanung']:
+        return [ziel.fluegelzug] if ziel.fluegelzug else []
+
+
+# korrekturen, die von Planung.einfache_zuege_auswerten vektorisiert berechnet werden.
+EINFACHE_KORREKTUREN = (PlanmaessigeAbfahrt, Einfahrtszeit)
+# fdl-korrekturen, die Planung.zustand_speichern ablegen kann, nach klassenname
+FDL_KORREKTUREN = {klasse.__name__: klasse for klasse in (FesteVerspaetung, Signalhalt, AnkunftAbwarten, AbfahrtAbwarten)}
+# untere schranke für zeilen ohne korrektur in Planung.einfache_zuege_auswerten
+KEINE_UNTERGRENZE = -10 ** 9
+# versatz zwischen den abschnitten des laufenden maximums in Planung.einfache_zuege_auswerten
+ABSCHNITT_VERSATZ = 2 ** 40
 
 
 class ZugDetailsPlanung(ZugDetails):
@@ -375,12 +444,24 @@ class ZugDetailsPlanung(ZugDetails):
 
     wenn der zug neu angelegt wird, übernimmt die assign_zug_details-methode die daten vom PluginClient.
     die update_zug_details-methode aktualisert die veränderlichen attribute, z.b. gleis, verspätung etc.
+
+    plan_index ordnet jedem plangleis den index der ersten fahrplanzeile mit diesem plangleis zu.
+    der index wird von assign_zug_details aufgebaut, da sich die plangleise im lauf der simulation nicht ändern.
+
+    fingerabdruck enthält die von update_zug_details ausgewerteten daten der letzten aktualisierung.
+    solange sich diese nicht ändern, wird die aktualisierung übersprungen.
+    None erzwingt die nächste aktualisierung.
+
+    kerndaten enthält die koeffizienten der korrekturen für Planung.einfache_zuege_auswerten.
     """
     def __init__(self):
         super().__init__()
         self.ausgefahren: bool = False
         self.folgezuege_aufgeloest: bool = False
         self.korrekturen_definiert: bool = False
+        self.plan_index: Dict[str, int] = {}
+        self.fingerabdruck: Optional[Tuple] = None
+        self.kerndaten: Optional[Tuple] = None
 
     @property
     def einfahrtszeit(self) -> datetime.time:
@@ -471,6 +552,11 @@ class ZugDetailsPlanung(ZugDetails):
             ziel.ausfahrt = True
             self.fahrplan.append(ziel)
 
+        self.plan_index = {}
+        for index, ziel in enumerate(self.fahrplan):
+            self.plan_index.setdefault(ziel.plan, index)
+        self.fingerabdruck = None
+
         # zug ist neu in liste und schon im stellwerk -> startaufstellung
         if zug.sichtbar:
             ziel_index = self.find_fahrplan_index(plan=zug.plangleis)
@@ -499,10 +585,22 @@ class ZugDetailsPlanung(ZugDetails):
         Ereignis-objekte entsprechen weitgehend den ZugDetails-objekten,
         enthalten jedoch keinen usertext und keinen fahrplan.
 
+        die aktualisierung wird übersprungen, wenn der fingerabdruck der zugdaten
+        seit der letzten aktualisierung gleich geblieben ist.
+        ein ereignis wird immer übernommen und setzt den fingerabdruck zurück.
+
         :param zug: ZugDetails- oder Ereignis-objekt vom PluginClient.
-        :return: None
+        :return: True, wenn die daten übernommen wurden, False, wenn sie unverändert sind.
         """
 
+        if isinstance(zug, Ereignis):
+            self.fingerabdruck = None
+        else:
+            fingerabdruck = self.zug_fingerabdruck(zug)
+            if fingerabdruck == self.fingerabdruck:
+                return False
+            self.fingerabdruck = fingerabdruck
+
         if zug.gleis:
             self.gleis = zug.gleis
             self.plangleis = zug.plangleis
@@ -518,20 +616,50 @@ class ZugDetailsPlanung(ZugDetails):
             self.usertextsender = zug.usertextsender
 
         for zeile in zug.fahrplan:
-            ziel = self.find_fahrplanzeile(plan=zeile.plan)
             try:
-                ziel.update_fahrplan_zeile(zeile)
-            except AttributeError:
+                ziel = self.fahrplan[self.plan_index[zeile.plan]]
+            except KeyError:
                 pass
+            else:
+                ziel.update_fahrplan_zeile(zeile)
 
-        route = list(self.route(plan=True))
         try:
-            self.ziel_index = route.index(zug.plangleis)
-        except ValueError:
+            self.ziel_index = self.plan_index[zug.plangleis]
+        except KeyError:
             # zug faehrt aus
             if not zug.plangleis:
                 self.ziel_index = -1
 
+        return True
+
+    @staticmethod
+    def zug_fingerabdruck(zug: ZugDetails) -> Tuple:
+        """
+        fingerabdruck der von update_zug_details ausgewerteten zugdaten.
+
+        der fingerabdruck ist ein tupel aus den veränderlichen attributen des zuges
+        und den plan- und effektiven gleisen des fahrplans.
+        er ist billiger zu berechnen als die aktualisierung selbst.
+
+        :param zug: ZugDetails-objekt vom PluginClient.
+        :return: tupel, das mit dem fingerabdruck der letzten aktualisierung verglichen werden kann.
+        """
+        return (zug.gleis, zug.plangleis, zug.verspaetung, zug.amgleis, zug.sichtbar,
+                zug.usertext, zug.usertextsender,
+                tuple((zeile.plan, zeile.gleis) for zeile in zug.fahrplan))
+
+    def planungszustand(self) -> Tuple:
+        """
+        veränderliche zugdaten, die von update_zug_details nachgeführt werden.
+
+        der rückgabewert dient nur dem vergleich vor und nach einer aktualisierung,
+        um festzustellen, ob die verspätungen des zuges neu berechnet werden müssen.
+
+        :return: tupel aus verspätung, gleisangaben, zielindex und den gleisen des fahrplans.
+        """
+        return (self.verspaetung, self.gleis, self.plangleis, self.amgleis, self.sichtbar, self.ziel_index,
+                tuple(ziel.gleis for ziel in self.fahrplan))
+
 
 class ZugZielPlanung(FahrplanZeile):
     """
@@ -542,10 +670,16 @@ class ZugZielPlanung(FahrplanZeile):
     - daten zur verspätungsanpassung.
     - status des fahrplanziels.
       nach ankunft/abfahrt sind die entsprechenden verspätungsangaben effektiv, vorher schätzwerte.
+    - planmässige ankunfts- und abfahrtszeit in minuten (plan_an, plan_ab).
+      sie werden beim setzen von an und ab umgerechnet, so dass grafiken und korrekturen ganzzahlen lesen.
 
     """
 
     def __init__(self, zug: ZugDetails):
+        self._an: Optional[datetime.time] = None
+        self._ab: Optional[datetime.time] = None
+        self.plan_an: Optional[int] = None
+        self.plan_ab: Optional[int] = None
         super().__init__(zug)
 
         self.einfahrt: bool = False
@@ -594,6 +728,40 @@ class ZugZielPlanung(FahrplanZeile):
         """
         self.gleis = zeile.gleis
 
+    @property
+    def an(self) -> Optional[datetime.time]:
+        """
+        planmässige ankunftszeit
+
+        beim setzen wird plan_an nachgeführt.
+        """
+        return self._an
+
+    @an.setter
+    def an(self, zeit: Optional[datetime.time]):
+        self._an = zeit
+        try:
+            self.plan_an = time_to_minutes(zeit)
+        except AttributeError:
+            self.plan_an = None
+
+    @property
+    def ab(self) -> Optional[datetime.time]:
+        """
+        planmässige abfahrtszeit
+
+        beim setzen wird plan_ab nachgeführt.
+        """
+        return self._ab
+
+    @ab.setter
+    def ab(self, zeit: Optional[datetime.time]):
+        self._ab = zeit
+        try:
+            self.plan_ab = time_to_minutes(zeit)
+        except AttributeError:
+            self.plan_ab = None
+
     @property
     def ankunft_minute(self) -> Optional[int]:
         """
@@ -602,8 +770,8 @@ class ZugZielPlanung(FahrplanZeile):
         :return: minuten seit mitternacht oder None, wenn die zeitangabe fehlt.
         """
         try:
-            return time_to_minutes(self.an) + self.verspaetung_an
-        except AttributeError:
+            return self.plan_an + self.verspaetung_an
+        except TypeError:
             return None
 
     @property
@@ -614,8 +782,8 @@ class ZugZielPlanung(FahrplanZeile):
         :return: minuten seit mitternacht oder None, wenn die zeitangabe fehlt.
         """
         try:
-            return time_to_minutes(self.ab) + self.verspaetung_ab
-        except AttributeError:
+            return self.plan_ab + self.verspaetung_ab
+        except TypeError:
             return None
 
     @property
@@ -643,11 +811,63 @@ class Planung:
     - bei folgenden quelldatenübernahmen, werden nur noch die zielattribute nachgeführt,
       der fahrplan bleibt jedoch bestehen (im PluginClient werden abgefahrene ziele entfernt).
     - die fahrpläne der züge haben auch einträge zur einfahrt und ausfahrt.
+
+    die verspätungen werden inkrementell nachgeführt:
+    die methoden, die zugdaten oder korrekturen ändern, merken die betroffenen züge in geaenderte_zuege vor.
+    verspaetungen_korrigieren berechnet dann nur diese züge und die davon abhängigen neu.
+    wer zugdaten oder korrekturen direkt ändert, muss den zug mit neuberechnung_vormerken anmelden.
+
+    die abhängigkeiten zwischen den fahrplanzielen werden in einem gerichteten graphen geführt
+    und in topologischer reihenfolge ausgewertet, so dass jedes ziel pro aufruf genau einmal berechnet wird.
+
+    ausgefahrene züge werden nach der aufbewahrungszeit (in sim-minuten) von zuege_archivieren
+    aus der zugliste entfernt und in kompakter form im archiv abgelegt.
+
+    ereignisse können mit ereignis_auswerten sofort eingeplant werden.
+    die funktionen in beobachter werden danach mit den zids der neu berechneten züge aufgerufen.
+
+    mit szenario_beginnen können fdl-korrekturen versuchsweise gesetzt und wieder verworfen werden (siehe Szenario).
+
+    zustand_speichern und zustand_laden sichern die fdl-korrekturen und den fahrtverlauf der züge,
+    damit sie einen neustart des programms während einer sitzung überstehen.
     """
     def __init__(self):
         self.zugliste: Dict[int, ZugDetailsPlanung] = dict()
         self.auswertung: Optional[Auswertung] = None
         self.simzeit_minuten: int = 0
+        # zids der züge, deren verspätungen beim nächsten verspaetungen_korrigieren neu berechnet werden.
+        self.geaenderte_zuege: Set[int] = set()
+        # zids der züge, deren knoten im abhängigkeitsgraphen neu aufgebaut werden müssen.
+        self._graph_veraltet: Set[int] = set()
+        # abhängigkeitsgraph der verspätungsberechnung. siehe knoten_aktualisieren.
+        self.abhaengigkeitsgraph = nx.DiGraph()
+        # zyklische abhängigkeiten, die bei der letzten verspätungskorrektur gefunden wurden (zids pro zyklus).
+        self.zyklen: List[Set[int]] = []
+        self._knotenauswertung: bool = False
+        # zids der neuen züge, deren folgezüge noch nicht gesucht wurden.
+        self._folgezuege_neu: Set[int] = set()
+        # fahrplanziele, die auf einen noch unbekannten folgezug warten, nach zid des folgezugs.
+        self._folgezuege_erwartet: Dict[int, List[ZugZielPlanung]] = {}
+        self.archiv: Dict[int, ArchivZug] = dict()
+        self.aufbewahrungszeit: Optional[int] = 60
+        # sim-zeit in minuten, zu der ein ausgefahrener zug zum ersten mal bei zuege_archivieren auftrat.
+        self.ausfahrzeiten: Dict[int, int] = dict()
+        # funktionen, die nach einer sofortigen neuberechnung mit den betroffenen zids aufgerufen werden.
+        self.beobachter: List[Callable[[Set[int]], None]] = []
+        # zids nach zugname und zugnummer, in der reihenfolge der aufnahme. siehe zug_finden.
+        self._zuege_nach_name: Dict[str, List[int]] = {}
+        self._zuege_nach_nummer: Dict[int, List[int]] = {}
+        # einfache züge mit numpy berechnen (siehe einfache_zuege_auswerten).
+        self.vektorisiert: bool = True
+        self._szenario: Optional['Szenario'] = None
+        # während eines szenarios eingetroffene ereignisse. siehe ereignis_auswerten.
+        self._zurueckgestellte_ereignisse: List[Ereignis] = []
+        # gemeinsame objekte der parameterlosen korrekturen. siehe ziel_korrekturen_definieren.
+        self._einfahrtszeit = Einfahrtszeit(self)
+        self._planmaessige_abfahrt = PlanmaessigeAbfahrt(self)
+        self._ersatzzug = Ersatzzug(self)
+        self._kupplung = Kupplung(self)
+        self._fluegelung = Fluegelung(self)
 
     def zuege_uebernehmen(self, zuege: Iterable[ZugDetails]):
         """
@@ -668,16 +888,33 @@ class Planung:
             try:
                 zug_planung = self.zugliste[zug.zid]
             except KeyError:
+                if zug.zid in self.archiv:
+                    continue
                 # neuer zug
                 zug_planung = ZugDetailsPlanung()
                 zug_planung.assign_zug_details(zug)
                 zug_planung.update_zug_details(zug)
                 self.zugliste[zug_planung.zid] = zug_planung
+                self._zug_indizieren(zug_planung)
                 ausgefahrene_zuege.discard(zug.zid)
+                self._folgezuege_neu.add(zug.zid)
+                self.geaenderte_zuege.add(zug.zid)
+                self._graph_veraltet.add(zug.zid)
             else:
                 # bekannter zug
-                zug_planung.update_zug_details(zug)
                 ausgefahrene_zuege.discard(zug.zid)
+                if zug.name != zug_planung.name:
+                    self._zug_deindizieren(zug_planung)
+                    zug_planung.name = zug.name
+                    self._zug_indizieren(zug_planung)
+                zustand = zug_planung.planungszustand()
+                if not zug_planung.update_zug_details(zug):
+                    continue
+                neuer_zustand = zug_planung.planungszustand()
+                if neuer_zustand != zustand:
+                    # die verspätung von folgezügen wird vom stammzug gesetzt
+                    if neuer_zustand[1:] != zustand[1:] or not self.start_fremdbestimmt(zug_planung):
+                        self.geaenderte_zuege.add(zug.zid)
 
         for zid in ausgefahrene_zuege:
             zug = self.zugliste[zid]
@@ -685,71 +922,196 @@ class Planung:
                 zug.sichtbar = zug.amgleis = False
                 zug.gleis = zug.plangleis = ""
                 zug.ausgefahren = True
+                zug.fingerabdruck = None
                 for zeile in zug.fahrplan:
                     zeile.abgefahren = True
+                self.geaenderte_zuege.add(zid)
 
         self.folgezuege_aufloesen()
         self.korrekturen_definieren()
 
+    def zuege_archivieren(self, simzeit_minuten: int) -> List[int]:
+        """
+        ausgefahrene züge nach ablauf der aufbewahrungszeit archivieren.
+
+        die züge werden aus der zugliste und dem abhängigkeitsgraphen entfernt
+        und als ArchivZug im archiv abgelegt.
+        züge, die mit einem nicht archivierbaren zug verknüpft sind (siehe verknuepfte_zuege), bleiben in der liste.
+
+        :param simzeit_minuten: aktuelle sim-zeit in minuten seit mitternacht
+        :return: zids der archivierten züge
+        """
+
+        kandidaten = set()
+        for zid, zug in self.zugliste.items():
+            if zug.ausgefahren:
+                ausfahrt = self.ausfahrzeiten.setdefault(zid, simzeit_minuten)
+                if aufbewahrung_abgelaufen(ausfahrt, simzeit_minuten, self.aufbewahrungszeit):
+                    kandidaten.add(zid)
+        if not kandidaten:
+            return []
+
+        # die kanten von zügen mit geänderten korrekturen sind noch nicht im graphen
+        for zid in self._graph_veraltet:
+            try:
+                self.knoten_aktualisieren(self.zugliste[zid])
+            except KeyError:
+                pass
+
+        verknuepft = {zid: self.verknuepfte_zuege(self.zugliste[zid]) for zid in kandidaten}
+        while True:
+            behalten = {zid for zid in kandidaten if not verknuepft[zid] <= kandidaten}
+            if not behalten:
+                break
+            kandidaten -= behalten
+
+        for zid in kandidaten:
+            self._zug_archivieren(zid)
+
+        return sorted(kandidaten)
+
+    def verknuepfte_zuege(self, zug: ZugDetailsPlanung) -> Set[int]:
+        """
+        züge, die mit einem zug verknüpft sind.
+
+        verknüpft sind der stammzug, die folgezüge
+        und die züge, mit denen der zug im abhängigkeitsgraphen über eine kante verbunden ist.
+
+        :param zug: zug aus der zugliste
+        :return: zids der verknüpften züge ohne den zug selbst
+        """
+
+        zids = set()
+        graph = self.abhaengigkeitsgraph
+        for index in range(-1, len(zug.fahrplan)):
+            k = (zug.zid, index)
+            if k in graph:
+                zids.update(n[0] for n in graph.predecessors(k))
+                zids.update(n[0] for n in graph.successors(k))
+
+        if zug.stammzug is not None:
+            zids.add(zug.stammzug.zid)
+        for ziel in zug.fahrplan:
+            for folgezug in (ziel.ersatzzug, ziel.fluegelzug, ziel.kuppelzug):
+                if folgezug is not None:
+                    zids.add(folgezug.zid)
+
+        zids.discard(zug.zid)
+        return zids
+
+    def _zug_archivieren(self, zid: int):
+        """
+        zug aus der zugliste und allen internen verzeichnissen entfernen und ins archiv verschieben.
+
+        :param zid: zid eines zuges in der zugliste
+        :return: None
+        """
+
+        zug = self.zugliste.pop(zid)
+        self._zug_deindizieren(zug)
+        self.abhaengigkeitsgraph.remove_nodes_from((zid, index) for index in range(-1, len(zug.fahrplan)))
+        self.geaenderte_zuege.discard(zid)
+        self._graph_veraltet.discard(zid)
+        self._folgezuege_neu.discard(zid)
+
+        for ziel in zug.fahrplan:
+            for zid2 in (ziel.ersatz_zid(), ziel.fluegel_zid(), ziel.kuppel_zid()):
+                try:
+                    wartend = self._folgezuege_erwartet[zid2]
+                except KeyError:
+                    continue
+                wartend[:] = [z for z in wartend if z is not ziel]
+                if not wartend:
+                    del self._folgezuege_erwartet[zid2]
+
+        fahrplan = tuple(ArchivZeile(ziel.plan, ziel.gleis, ziel.an, ziel.ab, ziel.verspaetung_an,
+                                     ziel.verspaetung_ab, ziel.hinweistext)
+                         for ziel in zug.fahrplan)
+        self.archiv[zid] = ArchivZug(zid, zug.name, zug.von, zug.nach, zug.verspaetung,
+                                     self.ausfahrzeiten.pop(zid), fahrplan)
+
     def folgezuege_aufloesen(self):
         """
         folgezüge aus den zugflags auflösen.
 
         folgezüge werden im stammzug referenziert.
-        die funktion arbeitet iterativ, bis alle folgezüge aufgelöst sind.
+
+        die funktion arbeitet inkrementell:
+        die flags werden nur bei neuen zügen gelesen.
+        fahrplanziele, deren folgezug noch nicht in der zugliste steht, werden in _folgezuege_erwartet
+        unter der zid des folgezugs vorgemerkt und erst wieder bearbeitet, wenn dieser zug eintrifft.
+        der aufwand ist daher proportional zur anzahl neuer züge.
 
         :return: None
         """
 
-        zids = list(self.zugliste.keys())
+        neue_zids = self._folgezuege_neu
+        self._folgezuege_neu = set()
+        stammzuege = set()
+        zeilen = []
 
-        while zids:
-            zid = zids.pop(0)
+        for zid in neue_zids:
             try:
                 zug = self.zugliste[zid]
             except KeyError:
                 continue
+            stammzuege.add(zug)
+            zeilen.extend(zeile for zeile in zug.fahrplan if zeile.ersatz_zid() or zeile.fluegel_zid() or
+                          zeile.kuppel_zid())
+            zeilen.extend(self._folgezuege_erwartet.pop(zid, []))
+
+        for zeile in zeilen:
+            stammzuege.add(zeile.zug)
+            for zid2 in self._folgezug_verknuepfen(zeile):
+                self._folgezuege_erwartet.setdefault(zid2, []).append(zeile)
 
-            if zug.folgezuege_aufgeloest:
+        for zug in stammzuege:
+            zug.folgezuege_aufgeloest = all(self._folgezuege_verknuepft(zeile) for zeile in zug.fahrplan)
+
+    def _folgezug_verknuepfen(self, zeile: ZugZielPlanung) -> List[int]:
+        """
+        folgezüge eines fahrplanziels mit dem ziel verknüpfen.
+
+        ersatz-, flügel- und kuppelzug werden gemäss den flags in der zugliste gesucht.
+        wenn sich eine verknüpfung ändert, werden beide züge zur neuberechnung vorgemerkt.
+
+        :param zeile: fahrplanziel eines stammzuges
+        :return: zids der folgezüge, die noch nicht in der zugliste stehen.
+        """
+
+        fehlend = []
+        zug = zeile.zug
+        for attr, zid2 in (('ersatzzug', zeile.ersatz_zid()),
+                           ('fluegelzug', zeile.fluegel_zid()),
+                           ('kuppelzug', zeile.kuppel_zid())):
+            if not zid2:
                 continue
-            folgezuege_aufgeloest = True
+            try:
+                zug2 = self.zugliste[zid2]
+            except KeyError:
+                setattr(zeile, attr, None)
+                fehlend.append(zid2)
+            else:
+                if getattr(zeile, attr) is not zug2:
+                    self.geaenderte_zuege.update((zug.zid, zid2))
+                    self._graph_veraltet.update((zug.zid, zid2))
+                setattr(zeile, attr, zug2)
+                zug2.stammzug = zug
 
-            for planzeile in zug.fahrplan:
-                if set(planzeile.flags).intersection({'E', 'F', 'K'}):
-                    if zid2 := planzeile.ersatz_zid():
-                        try:
-                            zug2 = self.zugliste[zid2]
-                        except KeyError:
-                            planzeile.ersatzzug = None
-                            folgezuege_aufgeloest = False
-                        else:
-                            planzeile.ersatzzug = zug2
-                            zug2.stammzug = zug
-                            zids.append(zid2)
+        return fehlend
 
-                    if zid2 := planzeile.fluegel_zid():
-                        try:
-                            zug2 = self.zugliste[zid2]
-                        except KeyError:
-                            planzeile.fluegelzug = None
-                            folgezuege_aufgeloest = False
-                        else:
-                            planzeile.fluegelzug = zug2
-                            zug2.stammzug = zug
-                            zids.append(zid2)
+    @staticmethod
+    def _folgezuege_verknuepft(zeile: ZugZielPlanung) -> bool:
+        """
+        prüfen, ob alle folgezüge eines fahrplanziels verknüpft sind.
 
-                    if zid2 := planzeile.kuppel_zid():
-                        try:
-                            zug2 = self.zugliste[zid2]
-                        except KeyError:
-                            planzeile.kuppelzug = None
-                            folgezuege_aufgeloest = False
-                        else:
-                            planzeile.kuppelzug = zug2
-                            zug2.stammzug = zug
-                            zids.append(zid2)
+        :param zeile: fahrplanziel
+        :return: False, wenn ein flag einen folgezug verlangt, der noch nicht verknüpft ist.
+        """
 
-            zug.folgezuege_aufgeloest = folgezuege_aufgeloest
+        return not ((zeile.ersatzzug is None and zeile.ersatz_zid()) or
+                    (zeile.fluegelzug is None and zeile.fluegel_zid()) or
+                    (zeile.kuppelzug is None and zeile.kuppel_zid()))
 
     def einfahrten_korrigieren(self):
         """
@@ -757,7 +1119,8 @@ class Planung:
 
         die ein- und ausfahrtszeiten werden vom sim nicht vorgegeben.
         wir schätzen sie die einfahrtszeit aus der ankunftszeit des anschliessenden wegpunkts
-        und er kürzesten beobachteten fahrzeit zwischen der einfahrt und dem wegpunkt ab.
+        und der typischen (median) beobachteten fahrzeit der zuggattung zwischen der einfahrt und dem wegpunkt ab
+        (siehe Auswertung.fahrzeit_schaetzen).
         die einfahrtszeit wird im ersten fahrplaneintrag eingetragen (an und ab).
 
         analog wird die ausfahrtszeit im letzten fahrplaneintrag abgeschätzt.
@@ -772,13 +1135,17 @@ class Planung:
                 pass
             else:
                 if einfahrt.einfahrt and einfahrt.gleis and ziel1.gleis:
-                    fahrzeit = self.auswertung.fahrzeit_schaetzen(zug.name, einfahrt.gleis, ziel1.gleis)
+                    fahrzeit = self.auswertung.fahrzeit_schaetzen(zug, einfahrt.gleis, ziel1.gleis)
                     if not np.isnan(fahrzeit):
                         try:
-                            einfahrt.an = einfahrt.ab = seconds_to_time(time_to_seconds(ziel1.an) - fahrzeit)
-                            logger.debug(f"einfahrt {einfahrt.gleis} - {ziel1.gleis} korrigiert: {einfahrt.ab}")
+                            zeit = seconds_to_time(time_to_seconds(ziel1.an) - fahrzeit)
                         except (AttributeError, ValueError):
                             pass
+                        else:
+                            if einfahrt.an != zeit or einfahrt.ab != zeit:
+                                einfahrt.an = einfahrt.ab = zeit
+                                self.geaenderte_zuege.add(zug.zid)
+                                logger.debug(f"einfahrt {einfahrt.gleis} - {ziel1.gleis} korrigiert: {einfahrt.ab}")
 
             try:
                 ziel2 = zug.fahrplan[-2]
@@ -787,35 +1154,618 @@ class Planung:
                 pass
             else:
                 if ausfahrt.ausfahrt:
-                    fahrzeit = self.auswertung.fahrzeit_schaetzen(zug.name, ziel2.gleis, ausfahrt.gleis)
+                    fahrzeit = self.auswertung.fahrzeit_schaetzen(zug, ziel2.gleis, ausfahrt.gleis)
                     if not np.isnan(fahrzeit):
                         try:
-                            ausfahrt.an = ausfahrt.ab = seconds_to_time(time_to_seconds(ziel2.ab) + fahrzeit)
-                            logger.debug(f"ausfahrt {ziel2.gleis} - {ausfahrt.gleis} korrigiert: {ausfahrt.an}")
+                            zeit = seconds_to_time(time_to_seconds(ziel2.ab) + fahrzeit)
                         except (AttributeError, ValueError):
                             pass
+                        else:
+                            if ausfahrt.an != zeit or ausfahrt.ab != zeit:
+                                ausfahrt.an = ausfahrt.ab = zeit
+                                self.geaenderte_zuege.add(zug.zid)
+                                logger.debug(f"ausfahrt {ziel2.gleis} - {ausfahrt.gleis} korrigiert: {ausfahrt.an}")
 
-    def verspaetungen_korrigieren(self, simzeit_minuten: int):
+    def verspaetungen_korrigieren(self, simzeit_minuten: int, alle: bool = False):
         """
-        verspätungsangaben aller züge nachführen
+        verspätungsangaben der geänderten züge nachführen
 
-        die methode ruft die zugverspaetung_korrigieren methode für jeden stammzug (zug ohne vorgänger) auf.
-        folgezüge werden rekursiv durch die autokorrektur behandelt.
+        die methode aktualisiert den abhängigkeitsgraphen der vorgemerkten züge
+        und wertet die betroffenen züge in topologischer reihenfolge der fahrplanziele aus (siehe zuege_auswerten).
+        betroffen sind die vorgemerkten züge und alle züge, die von diesen abhängen.
+        die übrigen züge behalten ihre werte, das resultat ist dasselbe wie bei einer vollständigen neuberechnung.
 
-        :return:
+        :param simzeit_minuten: aktuelle sim-zeit in minuten seit mitternacht.
+            wenn sie sich geändert hat, werden die züge mit Einfahrtszeit-korrektur vorgemerkt.
+        :param alle: alle züge neu berechnen (zum vergleich und zur fehlersuche).
+        :return: None
+        """
+
+        if simzeit_minuten != self.simzeit_minuten:
+            alte_simzeit = self.simzeit_minuten
+            self.simzeit_minuten = simzeit_minuten
+            self.einfahrten_vormerken(max(alte_simzeit, simzeit_minuten))
+
+        if alle:
+            self.geaenderte_zuege.update(self.zugliste.keys())
+        self.aenderungen_auswerten()
+
+    def aenderungen_auswerten(self) -> Set[int]:
         """
+        vorgemerkte züge und die davon abhängigen züge neu berechnen.
+
+        die methode aktualisiert den abhängigkeitsgraphen der vorgemerkten züge
+        und wertet die betroffenen züge aus, ohne die sim-zeit nachzuführen.
 
-        self.simzeit_minuten = simzeit_minuten
+        :return: zids der neu berechneten züge
+        """
 
-        zids = list(filter(lambda z: self.zugliste[z].stammzug is None, self.zugliste.keys()))
-        while zids:
-            zid = zids.pop(0)
+        for zid in self._graph_veraltet:
             try:
-                zug = self.zugliste[zid]
+                self.knoten_aktualisieren(self.zugliste[zid])
             except KeyError:
+                pass
+        zids = self.geaenderte_zuege | self._graph_veraltet
+
+        betroffen = self.betroffene_zuege(zids)
+        if self._szenario is not None:
+            self._szenario.sichern(betroffen, self._graph_veraltet)
+        self.geaenderte_zuege = set()
+        self._graph_veraltet = set()
+        self.zuege_auswerten(betroffen)
+        return betroffen
+
+    def szenario_beginnen(self) -> 'Szenario':
+        """
+        was-wäre-wenn-szenario eröffnen.
+
+        siehe Szenario.
+
+        :return: aktives Szenario-objekt
+        :raise RuntimeError, wenn bereits ein szenario aktiv ist.
+        """
+
+        if self._szenario is not None:
+            raise RuntimeError("es ist bereits ein szenario aktiv")
+        self._szenario = Szenario(self)
+        return self._szenario
+
+    @property
+    def szenario_aktiv(self) -> bool:
+        """
+        ist ein szenario aktiv?
+
+        solange ein szenario aktiv ist, dürfen keine simulatordaten übernommen werden (zuege_uebernehmen etc.).
+
+        :return: True, wenn ein szenario aktiv ist.
+        """
+        return self._szenario is not None
+
+    def zurueckgestellte_ereignisse_auswerten(self) -> Set[int]:
+        """
+        die während eines szenarios zurückgestellten ereignisse auswerten.
+
+        wird beim ende des szenarios aufgerufen.
+
+        :return: zids der neu berechneten züge
+        """
+        betroffen = set()
+        ereignisse = self._zurueckgestellte_ereignisse
+        self._zurueckgestellte_ereignisse = []
+        for ereignis in ereignisse:
+            betroffen.update(self.ereignis_auswerten(ereignis))
+        return betroffen
+
+    def ereignis_auswerten(self, ereignis: Ereignis) -> Set[int]:
+        """
+        ereignis übernehmen und die betroffenen züge sofort neu berechnen.
+
+        im unterschied zu ereignis_uebernehmen werden die verspätungen des zuges und der davon abhängigen züge
+        nicht erst bei der nächsten verspaetungen_korrigieren neu berechnet.
+        wenn züge neu berechnet wurden, werden die beobachter benachrichtigt.
+
+        während ein szenario aktiv ist, wird das ereignis zurückgestellt
+        und nach dem ende des szenarios ausgewertet.
+
+        :param ereignis: Ereignis-objekt vom PluginClient
+        :return: zids der neu berechneten züge
+        """
+
+        if self._szenario is not None:
+            self._zurueckgestellte_ereignisse.append(ereignis)
+            return set()
+
+        self.ereignis_uebernehmen(ereignis)
+        betroffen = self.aenderungen_auswerten()
+        if betroffen:
+            for beobachter in self.beobachter:
+                beobachter(betroffen)
+        return betroffen
+
+    def neuberechnung_vormerken(self, zug: ZugDetailsPlanung):
+        """
+        zug für die nächste verspätungskorrektur vormerken.
+
+        diese methode muss aufgerufen werden, wenn zugdaten oder korrekturen ausserhalb dieser klasse geändert werden,
+        z.b. die parameter einer bestehenden fdl-korrektur.
+
+        :param zug: zug aus der zugliste
+        :return: None
+        """
+        self.geaenderte_zuege.add(zug.zid)
+        self._graph_veraltet.add(zug.zid)
+
+    def einfahrten_vormerken(self, simzeit_minuten: int):
+        """
+        züge mit Einfahrtszeit-korrektur vormerken, deren einfahrt von der sim-zeit abhängt.
+
+        die Einfahrtszeit-korrektur wird nur auf der ersten fahrplanzeile (einfahrt) verwendet.
+        ihr resultat hängt von der sim-zeit ab, sobald diese die geschätzte ankunftszeit überschreitet.
+        züge, deren verspätung sich seither geändert hat, sind ohnehin vorgemerkt.
+
+        :param simzeit_minuten: die grössere der alten und neuen sim-zeit
+        :return: None
+        """
+        for zid, zug in self.zugliste.items():
+            try:
+                ziel = zug.fahrplan[0]
+            except IndexError:
                 continue
+            if not ziel.abgefahren and ziel.fdl_korrektur is None and isinstance(ziel.auto_korrektur, Einfahrtszeit):
+                ankunft = ziel.ankunft_minute
+                if ankunft is not None and ankunft < simzeit_minuten:
+                    self.geaenderte_zuege.add(zid)
+
+    def knoten_aktualisieren(self, zug: ZugDetailsPlanung):
+        """
+        abhängigkeiten eines zuges im abhängigkeitsgraphen aktualisieren.
+
+        die knoten des graphen sind fahrplanziele (zid, index).
+        der knoten (zid, -1) steht für den start des zuges, d.h. die übernahme von zug.verspaetung.
+        eine kante von knoten a nach b bedeutet, dass a vor b ausgewertet werden muss.
+        der graph enthält nur kanten zwischen verschiedenen zügen.
+        die abhängigkeit jeder zeile von der vorhergehenden zeile desselben zuges ist implizit.
+
+        - von der zeile, die eine quelle einer korrektur bestimmt, zur zeile mit der korrektur.
+          die ankunftsverspätung eines ziels wird von der vorhergehenden zeile bestimmt,
+          ausser die korrektur des ziels ändert sie selbst (aendert_ankunft).
+          die abfahrtsverspätung wird vom ziel selbst bestimmt.
+        - von einer zeile zum start der folgezüge, deren verspätung die korrektur setzt.
+
+        die eingehenden kanten der zeilen und die kanten zum start anderer züge werden von diesem zug definiert
+        und hier neu aufgebaut. die übrigen kanten gehören zu anderen zügen.
+        knoten ohne kanten werden entfernt.
+        die kerndaten des zuges für einfache_zuege_auswerten werden verworfen.
+
+        :param zug: zug aus der zugliste
+        :return: None
+        """
+
+        graph = self.abhaengigkeitsgraph
+        zid = zug.zid
+        zug.kerndaten = None
+
+        for index in range(-1, len(zug.fahrplan)):
+            k = (zid, index)
+            if k in graph:
+                if index >= 0:
+                    graph.remove_edges_from(list(graph.in_edges(k)))
+                graph.remove_edges_from([(k, f) for f in graph.successors(k) if f[1] < 0])
+
+        for index, ziel in enumerate(zug.fahrplan):
+            for korrektur in (ziel.auto_korrektur, ziel.fdl_korrektur):
+                if korrektur is None:
+                    continue
+                for quelle, ankunft in korrektur.quellen(zug, ziel):
+                    try:
+                        k = self.quellknoten(quelle, ankunft)
+                    except (AttributeError, KeyError, ValueError):
+                        logger.warning(f"quelle {quelle} der korrektur {korrektur} von {zug.name} nicht gefunden")
+                    else:
+                        if k[0] != zid:
+                            graph.add_edge(k, (zid, index))
+                for folgezug in korrektur.folgezuege(zug, ziel):
+                    if folgezug.zid != zid:
+                        graph.add_edge((zid, index), (folgezug.zid, -1))
+
+        for index in range(-1, len(zug.fahrplan)):
+            k = (zid, index)
+            if k in graph and graph.degree(k) == 0:
+                graph.remove_node(k)
+
+    def start_fremdbestimmt(self, zug: ZugDetailsPlanung) -> bool:
+        """
+        prüfen, ob die anfangsverspätung eines zuges von einem anderen zug gesetzt wird.
+
+        das ist bei ersatz- und flügelzügen der fall, solange das entsprechende ziel des stammzuges nicht abgefahren ist.
+        eine änderung von zug.verspaetung hat dann keine wirkung.
+
+        :param zug: zug aus der zugliste
+        :return: True, wenn ein noch nicht abgefahrenes ziel eines anderen zuges die anfangsverspätung setzt.
+        """
+        graph = self.abhaengigkeitsgraph
+        try:
+            quellen = list(graph.predecessors((zug.zid, -1)))
+        except nx.NetworkXError:
+            return False
+
+        for zid, index in quellen:
+            try:
+                if not self.zugliste[zid].fahrplan[index].abgefahren:
+                    return True
+            except (IndexError, KeyError):
+                pass
+        return False
+
+    def quellknoten(self, ziel: ZugZielPlanung, ankunft: bool) -> Tuple[int, int]:
+        """
+        knoten, der die ankunfts- oder abfahrtsverspätung eines fahrplanziels bestimmt.
+
+        :param ziel: fahrplanziel eines zuges in der zugliste
+        :param ankunft: True für die ankunfts-, False für die abfahrtsverspätung
+        :return: knoten (zid, index)
+        :raise KeyError, wenn der zug nicht in der zugliste steht.
+        :raise ValueError, wenn das ziel nicht im fahrplan des zuges steht.
+        """
+        zug = self.zugliste[ziel.zug.zid]
+        for index, z in enumerate(zug.fahrplan):
+            if z is ziel:
+                break
+        else:
+            raise ValueError(f"{ziel} nicht im fahrplan von {zug.name}")
+
+        if ankunft and not any(k is not None and k.aendert_ankunft for k in (ziel.auto_korrektur, ziel.fdl_korrektur)):
+            index -= 1
+        return zug.zid, index
+
+    def betroffene_zuege(self, zids: Iterable[int]) -> Set[int]:
+        """
+        von änderungen betroffene züge ermitteln.
+
+        betroffen sind die geänderten züge und alle züge, die im abhängigkeitsgraphen davon abhängen.
+
+        die anfangsverspätung von folgezügen wird vom stammzug gesetzt,
+        aber von update_zug_details mit dem wert aus dem simulator überschrieben.
+        deshalb sind bei jedem betroffenen zug auch die züge betroffen, die seinen start bestimmen,
+        und zwar entlang der ganzen kette von ersatz- und flügelzügen bis zum ersten zug.
+
+        :param zids: zids der geänderten züge
+        :return: menge von zids
+        """
+
+        graph = self.abhaengigkeitsgraph
+        folgezuege = {}
+        for k, f in graph.edges():
+            folgezuege.setdefault(k[0], set()).add(f[0])
+
+        betroffen = set()
+        stapel = list(zids)
+        while stapel:
+            zid = stapel.pop()
+            if zid in betroffen or zid not in self.zugliste:
+                continue
+            betroffen.add(zid)
+            stapel.extend(folgezuege.get(zid, ()))
+            if (zid, -1) in graph:
+                stapel.extend(k[0] for k in graph.predecessors((zid, -1)))
+
+        return betroffen
+
+    def zuege_auswerten(self, zids: Set[int]):
+        """
+        verspätungen der gegebenen züge in topologischer reihenfolge der fahrplanziele berechnen.
+
+        jedes fahrplanziel wird genau einmal ausgewertet.
+        die berechnung eines ziels entspricht einem schritt von zugverspaetung_korrigieren,
+        folgezüge werden jedoch nicht rekursiv berechnet.
+
+        züge ohne kanten im abhängigkeitsgraphen, die nur einfache korrekturen haben,
+        werden vorab gesammelt von einfache_zuege_auswerten berechnet (wenn vektorisiert gesetzt ist).
+
+        die übrigen züge werden nach zid sortiert der reihe nach berechnet.
+        ein zug wird an einem ziel unterbrochen, das von einem noch nicht ausgewerteten ziel eines anderen zuges abhängt,
+        und fortgesetzt, sobald alle quellen ausgewertet sind.
+        kanten von zügen ausserhalb der menge werden ignoriert, weil deren werte feststehen.
+
+        züge, die am schluss nicht fertig berechnet sind, hängen zyklisch voneinander ab.
+        die zyklen werden protokolliert und im attribut zyklen gemeldet.
+        die restlichen ziele werden ohne rücksicht auf die abhängigkeiten nach zid sortiert berechnet.
+
+        :param zids: zids der zu berechnenden züge. alle abhängigen züge müssen enthalten sein.
+        :return: None
+        """
+
+        graph = self.abhaengigkeitsgraph
+        if self.vektorisiert:
+            mit_kanten = {k[0] for k in graph}
+            einfach = [self.zugliste[zid] for zid in zids
+                       if zid not in mit_kanten and zid in self.zugliste and self.einfacher_zug(self.zugliste[zid])]
+            if einfach:
+                self.einfache_zuege_auswerten(einfach)
+                zids = zids.difference(zug.zid for zug in einfach)
+
+        offen = {}
+        nachfolger = {}
+        marken = {}
+        for k, f in graph.edges():
+            if k[0] in zids and f[0] in zids:
+                offen[f] = offen.get(f, 0) + 1
+                nachfolger.setdefault(k, []).append(f)
+                marken.setdefault(k[0], set()).add(k[1])
+                marken.setdefault(f[0], set()).add(f[1])
+
+        position = {}
+        verspaetung = {}
+        bereit = sorted(zids)
+        self._knotenauswertung = True
+        try:
+            while bereit:
+                zid = heapq.heappop(bereit)
+                try:
+                    zug = self.zugliste[zid]
+                except KeyError:
+                    continue
+                index = position.get(zid, -1)
+                if index >= len(zug.fahrplan):
+                    continue
+                index, verspaetung[zid] = self._zug_auswerten(zug, index, verspaetung.get(zid),
+                                                              marken.get(zid, ()), offen, nachfolger, bereit, position)
+                position[zid] = index
+
+            self.zyklen = []
+            rest = sorted(zid for zid in zids if zid in self.zugliste and
+                          position.get(zid, -1) < len(self.zugliste[zid].fahrplan))
+            if rest:
+                zuggraph = nx.DiGraph()
+                zuggraph.add_edges_from((k[0], f[0]) for k, fs in nachfolger.items() for f in fs
+                                        if offen[f] > 0 and k[0] in rest and f[0] in rest)
+                for komponente in nx.strongly_connected_components(zuggraph):
+                    if len(komponente) > 1:
+                        self.zyklen.append(komponente)
+                        namen = ", ".join(sorted(self.zugliste[zid].name for zid in komponente))
+                        logger.warning(f"zyklische abhängigkeit zwischen {namen}")
+                for zid in rest:
+                    self._zug_auswerten(self.zugliste[zid], position.get(zid, -1), verspaetung.get(zid), (), {}, {},
+                                        [], position)
+        finally:
+            self._knotenauswertung = False
+
+    @staticmethod
+    def einfacher_zug(zug: ZugDetailsPlanung) -> bool:
+        """
+        prüfen, ob ein zug nur einfache korrekturen hat.
+
+        einfach sind fahrplanziele ohne fdl-korrektur,
+        deren auto-korrektur fehlt oder genau vom typ PlanmaessigeAbfahrt oder Einfahrtszeit ist.
+        abgeleitete klassen gelten nicht als einfach.
+
+        die methode legt die von den korrekturen abhängigen koeffizienten für einfache_zuege_auswerten
+        im attribut kerndaten des zuges ab.
+        sie werden neu berechnet, wenn eine korrektur ersetzt, eine planzeit oder mindestaufenthaltsdauer geändert
+        (z.b. von einfahrten_korrigieren) oder der zug zur neuberechnung vorgemerkt wird.
+
+        :param zug: zug
+        :return: True, wenn alle fahrplanziele einfach sind.
+        """
+
+        korrekturen = [ziel.auto_korrektur for ziel in zug.fahrplan]
+        schluessel = korrekturen + [(ziel.fdl_korrektur, ziel.plan_an, ziel.plan_ab, ziel.mindestaufenthalt)
+                                    for ziel in zug.fahrplan]
+        try:
+            if zug.kerndaten[0] == schluessel:
+                return zug.kerndaten[1]
+        except TypeError:
+            pass
+
+        schlupf = []
+        grenzen = []
+        einfahrten = []
+        einfach = all(ziel.fdl_korrektur is None for ziel in zug.fahrplan)
+        for ziel, korrektur in zip(zug.fahrplan, korrekturen):
+            if not einfach:
+                break
+            if korrektur is not None and type(korrektur) not in EINFACHE_KORREKTUREN:
+                einfach = False
+                break
+            if korrektur is None or ziel.an is None:
+                schlupf.append(0)
+                grenzen.append(KEINE_UNTERGRENZE)
+                einfahrten.append(False)
+                continue
+
+            plan_an = time_to_minutes(ziel.an)
+            if type(korrektur) is PlanmaessigeAbfahrt:
+                if ziel.ab is None:
+                    plan_ab = plan_an + ziel.mindestaufenthalt
+                else:
+                    plan_ab = time_to_minutes(ziel.ab)
+                schlupf.append(plan_ab - plan_an - ziel.mindestaufenthalt)
+                grenzen.append(0)
+                einfahrten.append(False)
             else:
-                self.zugverspaetung_korrigieren(zug)
+                if ziel.ab is None:
+                    plan_ab = plan_an
+                else:
+                    plan_ab = time_to_minutes(ziel.ab)
+                schlupf.append(plan_ab - plan_an)
+                grenzen.append(-plan_ab)
+                einfahrten.append(True)
+
+        zug.kerndaten = (schluessel, einfach, schlupf, grenzen, einfahrten)
+        return einfach
+
+    def einfache_zuege_auswerten(self, zuege: List[ZugDetailsPlanung]):
+        """
+        verspätungen von zügen mit einfachen korrekturen in einem vektorisierten durchgang berechnen.
+
+        die züge dürfen nur einfache korrekturen (siehe einfacher_zug) und keine kanten im abhängigkeitsgraphen haben.
+        das resultat ist identisch mit _zug_auswerten.
+
+        jede zeile bildet die weitergegebene verspätung v auf max(v - s, u) ab:
+
+        - PlanmaessigeAbfahrt: s = plan_ab - plan_an - mindestaufenthalt, u = 0
+        - Einfahrtszeit: s = plan_ab - plan_an, u = simzeit - plan_ab
+        - ohne korrektur, ohne ankunftszeit oder abgefahren: s = 0, u = -unendlich
+
+        der start eines zuges (zug.verspaetung) und angekommene, nicht abgefahrene ziele (verspaetung_an)
+        setzen die weitergegebene verspätung neu.
+        mit der kumulierten summe S der s gilt innerhalb eines solchen abschnitts ab der zeile r
+        v_i = max(v_r + S_(r-1), max_(r<=j<=i)(u_j + S_j)) - S_i.
+        das laufende maximum wird für alle abschnitte in einem np.maximum.accumulate berechnet,
+        indem jeder abschnitt um ein vielfaches von ABSCHNITT_VERSATZ angehoben wird.
+        die rechnung ist ganzzahlig und daher exakt.
+
+        die koeffizienten s und u stammen aus den von einfacher_zug abgelegten kerndaten.
+
+        :param zuege: züge, für die einfacher_zug True ergeben hat.
+        :return: None
+        """
+
+        # 1 = angekommen, 2 oder 3 = abgefahren, -1 = start des zuges
+        zustaende = []
+        werte = []
+        schlupf = []
+        grenzen = []
+        einfahrten = []
+
+        for zug in zuege:
+            fahrplan = zug.fahrplan
+            kerndaten = zug.kerndaten
+            zustaende.append(-1)
+            zustaende.extend([ziel.angekommen + 2 * ziel.abgefahren for ziel in fahrplan])
+            werte.append(zug.verspaetung)
+            werte.extend([ziel.verspaetung_an for ziel in fahrplan])
+            schlupf.append(0)
+            schlupf.extend(kerndaten[2])
+            grenzen.append(KEINE_UNTERGRENZE)
+            grenzen.extend(kerndaten[3])
+            einfahrten.append(False)
+            einfahrten.extend(kerndaten[4])
+
+        zustand = np.array(zustaende, dtype=np.int8)
+        start = zustand <= 1
+        start[zustand == 0] = False
+        fertig = zustand >= 2
+        s = np.where(fertig, 0, np.array(schlupf, dtype=np.int64))
+        u = np.array(grenzen, dtype=np.int64)
+        u = np.where(np.array(einfahrten, dtype=bool), u + self.simzeit_minuten, u)
+        u[fertig] = KEINE_UNTERGRENZE
+
+        summe = np.cumsum(s)
+        t = u + summe
+        t = np.where(start, np.maximum(np.array(werte, dtype=np.int64) + summe - s, t), t)
+        versatz = np.cumsum(start, dtype=np.int64) * ABSCHNITT_VERSATZ
+        verspaetungen = (np.maximum.accumulate(t + versatz) - versatz - summe).tolist()
+
+        pos = 0
+        for zug in zuege:
+            fahrplan = zug.fahrplan
+            ende = pos + len(fahrplan) + 1
+            zugverspaetungen = verspaetungen[pos:ende]
+            for ziel, vorher, verspaetung in zip(fahrplan, zugverspaetungen, zugverspaetungen[1:]):
+                if not ziel.angekommen:
+                    ziel.verspaetung_an = vorher
+                if not ziel.abgefahren:
+                    ziel.verspaetung_ab = verspaetung
+            pos = ende
+
+    def _zug_auswerten(self, zug: ZugDetailsPlanung, index: int, verspaetung: Optional[int], marken: Iterable[int],
+                       offen: Dict[Tuple[int, int], int], nachfolger: Dict[Tuple[int, int], List],
+                       bereit: List[int], position: Dict[int, int]) -> Tuple[int, Optional[int]]:
+        """
+        fahrplanziele eines zuges ab einem index auswerten, bis ein ziel auf einen anderen zug warten muss.
+
+        der index -1 steht für den start des zuges: die verspätung des zuges wird übernommen.
+        bei jedem ziel wird die abfahrtsverspätung nach fdl- oder auto-korrektur berechnet,
+        wenn es noch nicht abgefahren ist.
+        die resultierende verspätung wird als ankunftsverspätung an die nächste zeile weitergegeben,
+        wenn diese noch nicht erreicht ist.
+
+        nach jedem ziel werden die offenen abhängigkeiten der nachfolger im abhängigkeitsgraphen reduziert.
+        züge, deren nächstes ziel dadurch bereit wird, kommen in die bereit-liste.
+
+        :param zug: zug
+        :param index: index des ersten auszuwertenden ziels
+        :param verspaetung: von der vorhergehenden zeile weitergegebene verspätung. None beim start.
+        :param marken: indizes der ziele dieses zuges, die im abhängigkeitsgraphen kanten haben.
+            leer, um die abhängigkeiten zu ignorieren.
+        :param offen: anzahl offener abhängigkeiten pro knoten.
+        :param nachfolger: nachfolger der knoten im abhängigkeitsgraphen, soweit sie berechnet werden.
+        :param bereit: heap der zids, die fortgesetzt werden können.
+        :param position: nächster auszuwertender index pro zid. wird für die bereit-liste benötigt.
+        :return: tupel aus dem nächsten auszuwertenden index und der weiterzugebenden verspätung.
+        """
+
+        zid = zug.zid
+        fahrplan = zug.fahrplan
+        anzahl = len(fahrplan)
+
+        while index < anzahl:
+            markiert = index in marken
+            if markiert and offen.get((zid, index)):
+                break
+
+            if index < 0:
+                verspaetung = zug.verspaetung
+            else:
+                ziel = fahrplan[index]
+                if not ziel.abgefahren:
+                    if ziel.fdl_korrektur is not None:
+                        ziel.fdl_korrektur.anwenden(zug, ziel)
+                    elif ziel.auto_korrektur is not None:
+                        ziel.auto_korrektur.anwenden(zug, ziel)
+                    else:
+                        ziel.verspaetung_ab = ziel.verspaetung_an
+                    verspaetung = ziel.verspaetung_ab
+
+            if index + 1 < anzahl:
+                naechstes = fahrplan[index + 1]
+                if not naechstes.angekommen:
+                    naechstes.verspaetung_an = verspaetung
+
+            if markiert:
+                for f in nachfolger.get((zid, index), ()):
+                    offen[f] -= 1
+                    if offen[f] == 0 and position.get(f[0], -1) == f[1]:
+                        heapq.heappush(bereit, f[0])
+
+            index += 1
+
+        return index, verspaetung
+
+    def folgezug_korrigieren(self, zug: ZugDetailsPlanung):
+        """
+        verspätung eines folgezuges nachführen.
+
+        diese methode wird von den korrekturen aufgerufen, die folgezüge beeinflussen.
+        während der auswertung des abhängigkeitsgraphen werden die folgezüge in topologischer reihenfolge berechnet,
+        der aufruf hat dann keine wirkung.
+        sonst wird zugverspaetung_korrigieren aufgerufen.
+
+        :param zug: folgezug
+        :return: None
+        """
+        if not self._knotenauswertung:
+            self.zugverspaetung_korrigieren(zug)
+
+    @staticmethod
+    def zugverband(zug: ZugDetailsPlanung) -> Iterable[ZugDetailsPlanung]:
+        """
+        zug und alle seine (direkten und indirekten) folgezüge
+
+        :param zug: stammzug
+        :return: generator von ZugDetailsPlanung. jeder zug wird einmal geliefert, der stammzug zuerst.
+        """
+        gesehen = {zug.zid}
+        stapel = [zug]
+        while stapel:
+            zug = stapel.pop()
+            yield zug
+            for ziel in zug.fahrplan:
+                for folgezug in (ziel.ersatzzug, ziel.fluegelzug, ziel.kuppelzug):
+                    if folgezug is not None and folgezug.zid not in gesehen:
+                        gesehen.add(folgezug.zid)
+                        stapel.append(folgezug)
 
     def zugverspaetung_korrigieren(self, zug: ZugDetailsPlanung):
         """
@@ -857,6 +1807,10 @@ class Planung:
         for zug in self.zugliste.values():
             if not zug.korrekturen_definiert:
                 result = self.zug_korrekturen_definieren(zug)
+                # die korrekturen der ersten zeile von folgezügen werden vom stammzug definiert
+                verband = [z.zid for z in self.zugverband(zug)]
+                self.geaenderte_zuege.update(verband)
+                self._graph_veraltet.update(verband)
                 zug.korrekturen_definiert = zug.folgezuege_aufgeloest and result
 
     def zug_korrekturen_definieren(self, zug: ZugDetailsPlanung) -> bool:
@@ -877,13 +1831,13 @@ class Planung:
             ziel.mindestaufenthalt = 5
 
         if ziel.einfahrt:
-            ziel.auto_korrektur = Einfahrtszeit(self)
+            ziel.auto_korrektur = self._einfahrtszeit
         elif ziel.ausfahrt:
             pass
         elif ziel.durchfahrt():
             pass
         elif ziel.ersatz_zid():
-            ziel.auto_korrektur = Ersatzzug(self)
+            ziel.auto_korrektur = self._ersatzzug
             anschluss = AnkunftAbwarten(self)
             anschluss.ursprung = ziel
             try:
@@ -891,7 +1845,7 @@ class Planung:
             except (AttributeError, IndexError):
                 result = False
         elif ziel.kuppel_zid():
-            ziel.auto_korrektur = Kupplung(self)
+            ziel.auto_korrektur = self._kupplung
             anschluss = AnkunftAbwarten(self)
             anschluss.ursprung = ziel
             try:
@@ -900,7 +1854,7 @@ class Planung:
             except (AttributeError, IndexError):
                 result = False
         elif ziel.fluegel_zid():
-            ziel.auto_korrektur = Fluegelung(self)
+            ziel.auto_korrektur = self._fluegelung
             ziel.mindestaufenthalt = 1
             anschluss = AbfahrtAbwarten(self)
             anschluss.ursprung = ziel
@@ -910,7 +1864,7 @@ class Planung:
             except (AttributeError, IndexError):
                 result = False
         elif ziel.auto_korrektur is None:
-            ziel.auto_korrektur = PlanmaessigeAbfahrt(self)
+            ziel.auto_korrektur = self._planmaessige_abfahrt
 
         return result
 
@@ -918,26 +1872,61 @@ class Planung:
         """
         zug nach name oder nummer in zugliste suchen
 
+        namen und nummern werden in verzeichnissen nachgeschlagen, die beim aufnehmen, umbenennen und archivieren
+        der züge nachgeführt werden.
+        wenn mehrere züge dieselbe nummer (oder denselben namen) tragen, wird der zuerst aufgenommene geliefert.
+
         :param zug: nummer oder name des zuges oder ein beliebiges objekt mit einem zid attribut,
             z.b. ein ZugDetails vom PluginClient oder ein Ereignis.
         :return: entsprechendes ZugDetailsPlanung aus der zugliste dieser klasse.
             None, wenn kein passendes objekt gefunden wurde.
         """
 
-        zid = None
         try:
             zid = zug.zid
         except AttributeError:
-            for z in self.zugliste.values():
-                if z.nummer == zug or z.name == zug:
-                    zid = z.zid
-                    break
+            if isinstance(zug, str):
+                zids = self._zuege_nach_name.get(zug)
+            else:
+                zids = self._zuege_nach_nummer.get(zug)
+            try:
+                zid = zids[0]
+            except TypeError:
+                return None
 
         try:
             return self.zugliste[zid]
         except KeyError:
             return None
 
+    def _zug_indizieren(self, zug: ZugDetailsPlanung):
+        """
+        zug in die namens- und nummernverzeichnisse von zug_finden aufnehmen.
+
+        :param zug: zug aus der zugliste
+        :return: None
+        """
+
+        self._zuege_nach_name.setdefault(zug.name, []).append(zug.zid)
+        self._zuege_nach_nummer.setdefault(zug.nummer, []).append(zug.zid)
+
+    def _zug_deindizieren(self, zug: ZugDetailsPlanung):
+        """
+        zug aus den namens- und nummernverzeichnissen von zug_finden entfernen.
+
+        :param zug: zug aus der zugliste
+        :return: None
+        """
+
+        for verzeichnis, schluessel in ((self._zuege_nach_name, zug.name), (self._zuege_nach_nummer, zug.nummer)):
+            try:
+                zids = verzeichnis[schluessel]
+                zids.remove(zug.zid)
+            except (KeyError, ValueError):
+                continue
+            if not zids:
+                del verzeichnis[schluessel]
+
     def fdl_korrektur_setzen(self, korrektur: Optional[VerspaetungsKorrektur], ziel: Union[int, str, ZugZielPlanung]):
         """
         fahrdienstleiter-korrektur setzen
@@ -960,12 +1949,17 @@ class Planung:
 
         zug = ziel.zug
         ziel_index = zug.find_fahrplan_index(plan=ziel.plan)
+        if self._szenario is not None:
+            self._szenario.sichern([zug.zid])
 
         ziel.fdl_korrektur = korrektur
         if korrektur:
             for z in zug.fahrplan[ziel_index + 1:]:
                 z.fdl_korrektur = None
 
+        self.geaenderte_zuege.add(zug.zid)
+        self._graph_veraltet.add(zug.zid)
+
     def ereignis_uebernehmen(self, ereignis: Ereignis):
         """
         daten von einem ereignis uebernehmen.
@@ -999,6 +1993,11 @@ class Planung:
         else:
             neues_ziel = zug.fahrplan[neuer_index]
 
+        self.geaenderte_zuege.add(zug.zid)
+        self._graph_veraltet.add(zug.zid)
+        # die nächste aktualisierung vom simulator darf nicht übersprungen werden
+        zug.fingerabdruck = None
+
         if ereignis.art == 'einfahrt':
             try:
                 einfahrt = zug.fahrplan[0]
@@ -1044,3 +2043,306 @@ class Planung:
         elif ereignis.art == 'rothalt' or ereignis.art == 'wurdegruen':
             zug.verspaetung = ereignis.verspaetung
             neues_ziel.verspaetung_an = ereignis.verspaetung
+
+    def get_zustand(self) -> Dict[str, Any]:
+        """
+        zustand der planung im dict-format auslesen
+
+        pro zug werden die fahrplanziele abgelegt, die schon angekommen sind oder eine fdl-korrektur haben,
+        und zwar als liste [plan, angekommen, abgefahren, verspaetung_an, verspaetung_ab, korrektur].
+        die korrektur ist None oder ein dict mit dem klassennamen (typ) und den parametern.
+        das ursprungsziel von abwarte-korrekturen wird als [zid, plan] angegeben.
+        korrekturen, die nicht in FDL_KORREKTUREN stehen, werden nicht abgelegt.
+
+        :return: dictionary mit den schlüsseln 'zuege' (nach zid als string) und 'simzeit'.
+        """
+
+        zuege = {}
+        for zid, zug in self.zugliste.items():
+            zeilen = []
+            for ziel in zug.fahrplan:
+                korrektur = self._korrektur_kodieren(ziel.fdl_korrektur)
+                if ziel.angekommen or korrektur is not None:
+                    zeilen.append([ziel.plan, ziel.angekommen, ziel.abgefahren,
+                                   ziel.verspaetung_an, ziel.verspaetung_ab, korrektur])
+            if zeilen:
+                zuege[str(zid)] = zeilen
+
+        return {'simzeit': self.simzeit_minuten, 'zuege': zuege}
+
+    def set_zustand(self, d: Dict[str, Any]) -> int:
+        """
+        zustand im dict-format übernehmen
+
+        dies ist das gegenstück zu get_zustand.
+        die daten werden auf die züge in der zugliste angewendet, d.h. zuege_uebernehmen muss vorher aufgerufen werden.
+        unbekannte züge und fahrplanziele werden übersprungen,
+        ebenso korrekturen, deren ursprungsziel nicht gefunden wird.
+        die geänderten züge werden zur neuberechnung vorgemerkt.
+
+        :param d: dictionary im format von get_zustand.
+        :return: anzahl übernommener züge
+        """
+
+        anzahl = 0
+        for zid, zeilen in d['zuege'].items():
+            try:
+                zug = self.zugliste[int(zid)]
+            except KeyError:
+                continue
+
+            for plan, angekommen, abgefahren, verspaetung_an, verspaetung_ab, korrektur in zeilen:
+                try:
+                    ziel = zug.fahrplan[zug.plan_index[plan]]
+                except KeyError:
+                    continue
+                if angekommen:
+                    ziel.angekommen = True
+                    ziel.verspaetung_an = verspaetung_an
+                if abgefahren:
+                    ziel.abgefahren = True
+                    ziel.verspaetung_ab = verspaetung_ab
+                if korrektur is not None:
+                    ziel.fdl_korrektur = self._korrektur_dekodieren(korrektur)
+
+            self.neuberechnung_vormerken(zug)
+            anzahl += 1
+
+        return anzahl
+
+    def _korrektur_kodieren(self, korrektur: Optional[VerspaetungsKorrektur]) -> Optional[Dict[str, Any]]:
+        if korrektur is None:
+            return None
+        typ = type(korrektur).__name__
+        if typ not in FDL_KORREKTUREN:
+            logger.debug(f"korrektur {korrektur} kann nicht gespeichert werden")
+            return None
+
+        d = {'typ': typ}
+        try:
+            d['verspaetung'] = korrektur.verspaetung
+        except AttributeError:
+            pass
+        try:
+            d['wartezeit'] = korrektur.wartezeit
+            d['ursprung'] = [korrektur.ursprung.zug.zid, korrektur.ursprung.plan]
+        except AttributeError:
+            pass
+        return d
+
+    def _korrektur_dekodieren(self, d: Dict[str, Any]) -> Optional[VerspaetungsKorrektur]:
+        try:
+            korrektur = FDL_KORREKTUREN[d['typ']](self)
+        except KeyError:
+            return None
+        try:
+            korrektur.verspaetung = d['verspaetung']
+        except KeyError:
+            pass
+        if 'ursprung' in d:
+            zid, plan = d['ursprung']
+            try:
+                zug = self.zugliste[zid]
+                korrektur.ursprung = zug.fahrplan[zug.plan_index[plan]]
+            except KeyError:
+                return None
+            korrektur.wartezeit = d['wartezeit']
+        return korrektur
+
+    def zustand_speichern(self, path: os.PathLike, aid: int):
+        """
+        zustand der planung in eine datei schreiben.
+
+        die datei heisst `{aid}planung.json` und liegt im angegebenen verzeichnis.
+        sie wird zuerst unter einem temporären namen geschrieben und dann ersetzt,
+        damit ein abbruch keine unvollständige datei hinterlässt.
+
+        :param path: verzeichnis, normalerweise das konfigurationsverzeichnis.
+        :param aid: anlagen-id
+        :return: None
+        :raise: OSError
+        """
+
+        d = self.get_zustand()
+        d['_aid'] = aid
+        d['_version'] = 1
+        p = Path(path) / f"{aid}planung.json"
+        t = p.with_suffix(".tmp")
+        with open(t, "w") as fp:
+            json.dump(d, fp, separators=(',', ':'))
+        os.replace(t, p)
+
+    def zustand_laden(self, path: os.PathLike, aid: int, simzeit: int, max_alter: int = 30) -> int:
+        """
+        gespeicherten zustand der planung laden, wenn er zur laufenden sitzung passt.
+
+        die datei wird nur übernommen, wenn sie von derselben anlage stammt
+        und die sim-zeit seit dem speichern um höchstens max_alter minuten vorgerückt ist.
+        ältere dateien stammen von einer früheren sitzung.
+
+        siehe set_zustand für die voraussetzungen.
+
+        :param path: verzeichnis, aus dem die datei `{aid}planung.json` gelesen wird.
+        :param aid: anlagen-id
+        :param simzeit: aktuelle sim-zeit in minuten
+        :param max_alter: maximale differenz der sim-zeiten in minuten.
+        :return: anzahl übernommener züge. 0, wenn die datei fehlt oder nicht passt.
+        """
+
+        p = Path(path) / f"{aid}planung.json"
+        try:
+            with open(p) as fp:
+                d = json.load(fp)
+        except (OSError, ValueError):
+            return 0
+
+        if d.get('_aid') != aid or d.get('_version') != 1:
+            return 0
+        if (simzeit - d['simzeit']) % 1440 > max_alter:
+            logger.info(f"gespeicherte planung von {d['simzeit']} gehört nicht zur laufenden sitzung")
+            return 0
+
+        return self.set_zustand(d)
+
+
+class Szenario:
+    """
+    was-wäre-wenn-auswertung von fdl-korrekturen
+
+    ein szenario wird mit Planung.szenario_beginnen eröffnet.
+    solange es aktiv ist, sichert die planung jeden zug, bevor fdl_korrektur_setzen
+    oder die neuberechnung (aenderungen_auswerten) ihn zum ersten mal verändert (copy-on-write auf zugebene).
+    gesichert werden die verspätungen und fdl-korrekturen der fahrplanziele und die verspätung des zuges.
+    die übrigen züge werden nicht kopiert.
+
+    im szenario werden korrekturen mit Planung.fdl_korrektur_setzen gesetzt
+    und mit auswerten inkrementell neu berechnet.
+    unterschiede liefert die geänderten verspätungen gegenüber dem stand vor dem szenario.
+    verwerfen stellt den alten zustand wieder her, uebernehmen behält den neuen.
+    als context manager verwendet, wird das szenario am ende verworfen, wenn es nicht übernommen wurde.
+
+    während ein szenario aktiv ist, dürfen keine simulatordaten übernommen werden.
+    ereignisse, die mit ereignis_auswerten eintreffen, werden zurückgestellt und am ende des szenarios ausgewertet.
+    die parameter einer bestehenden korrektur dürfen nur verändert werden, nachdem der zug mit sichern gesichert wurde.
+    sichern kopiert die fdl-korrekturen, so dass verwerfen auch solche änderungen rückgängig macht.
+
+    ~~~~~~{.py}
+    with planung.szenario_beginnen() as szenario:
+        planung.fdl_korrektur_setzen(korrektur, ziel)
+        unterschiede = szenario.auswerten()
+    ~~~~~~
+    """
+
+    def __init__(self, planung: Planung):
+        self._planung = planung
+        self.aktiv: bool = True
+        # gesicherter zustand pro zid: verspätung des zuges und
+        # (verspaetung_an, verspaetung_ab, ab, kopie der fdl_korrektur) pro fahrplanziel.
+        self.gesichert: Dict[int, Tuple[int, List[Tuple]]] = {}
+        self._umgebaut: Set[int] = set()
+        self._geaenderte_zuege = set(planung.geaenderte_zuege)
+        self._graph_veraltet = set(planung._graph_veraltet)
+        self._zyklen = list(planung.zyklen)
+
+    def __enter__(self) -> 'Szenario':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.aktiv:
+            self.verwerfen()
+
+    def sichern(self, zids: Iterable[int], umgebaut: Iterable[int] = ()):
+        """
+        züge vor der ersten änderung sichern.
+
+        wird von der planung aufgerufen,
+        und muss vom aufrufer aufgerufen werden, bevor er die parameter einer bestehenden korrektur verändert.
+
+        :param zids: zids der züge, die als nächstes verändert werden. bereits gesicherte züge werden übersprungen.
+        :param umgebaut: zids der züge, deren knoten im abhängigkeitsgraphen neu aufgebaut wurden.
+        :return: None
+        """
+
+        self._umgebaut.update(umgebaut)
+        for zid in zids:
+            if zid in self.gesichert:
+                continue
+            try:
+                zug = self._planung.zugliste[zid]
+            except KeyError:
+                continue
+            self.gesichert[zid] = (zug.verspaetung,
+                                   [(ziel.verspaetung_an, ziel.verspaetung_ab, ziel.ab,
+                                     copy.copy(ziel.fdl_korrektur))
+                                    for ziel in zug.fahrplan])
+
+    def auswerten(self) -> Dict[int, List[Tuple[int, int, int]]]:
+        """
+        die im szenario gesetzten korrekturen inkrementell auswerten.
+
+        :return: unterschiede gegenüber dem zustand vor dem szenario, siehe unterschiede.
+        """
+
+        self._planung.aenderungen_auswerten()
+        return self.unterschiede()
+
+    def unterschiede(self) -> Dict[int, List[Tuple[int, int, int]]]:
+        """
+        geänderte verspätungen gegenüber dem zustand vor dem szenario.
+
+        :return: dict zid -> liste von (fahrplan-index, änderung verspaetung_an, änderung verspaetung_ab).
+            züge und ziele ohne änderung sind nicht enthalten.
+        """
+
+        result = {}
+        for zid, (_, zeilen) in self.gesichert.items():
+            zug = self._planung.zugliste[zid]
+            aenderungen = [(index, ziel.verspaetung_an - zeile[0], ziel.verspaetung_ab - zeile[1])
+                           for index, (ziel, zeile) in enumerate(zip(zug.fahrplan, zeilen))
+                           if ziel.verspaetung_an != zeile[0] or ziel.verspaetung_ab != zeile[1]]
+            if aenderungen:
+                result[zid] = aenderungen
+        return result
+
+    def verwerfen(self):
+        """
+        szenario beenden und den zustand vor dem szenario wiederherstellen.
+
+        die gesicherten züge werden zurückgesetzt
+        und ihre knoten im abhängigkeitsgraphen aus den wiederhergestellten korrekturen neu aufgebaut.
+
+        :return: None
+        """
+
+        planung = self._planung
+        for zid, (verspaetung, zeilen) in self.gesichert.items():
+            zug = planung.zugliste[zid]
+            zug.verspaetung = verspaetung
+            for ziel, zeile in zip(zug.fahrplan, zeilen):
+                ziel.verspaetung_an, ziel.verspaetung_ab, ziel.ab, ziel.fdl_korrektur = zeile
+
+        for zid in self._umgebaut | self.gesichert.keys():
+            try:
+                planung.knoten_aktualisieren(planung.zugliste[zid])
+            except KeyError:
+                pass
+
+        planung.geaenderte_zuege = self._geaenderte_zuege
+        planung._graph_veraltet = self._graph_veraltet
+        planung.zyklen = self._zyklen
+        self._beenden()
+
+    def uebernehmen(self):
+        """
+        szenario beenden und den neuen zustand behalten.
+
+        :return: None
+        """
+
+        self._beenden()
+
+    def _beenden(self):
+        self.aktiv = False
+        self.gesichert = {}
+        self._planung._szenario = None
+        self._planung.zurueckgestellte_ereignisse_auswerten()
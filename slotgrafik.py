@@ -396,13 +396,11 @@ class Gleisbelegung:
 
         for zug in zugliste:
             for planzeile in zug.fahrplan:
-                try:
-                    plan_an = time_to_minutes(planzeile.an) + planzeile.verspaetung_an
-                except AttributeError:
+                plan_an = planzeile.ankunft_minute
+                if plan_an is None:
                     break
-                try:
-                    plan_ab = time_to_minutes(planzeile.ab) + planzeile.verspaetung_ab
-                except AttributeError:
+                plan_ab = planzeile.abfahrt_minute
+                if plan_ab is None:
                     plan_ab = plan_an + 1
 
                 if planzeile.gleis in self.gleise:
@@ -514,7 +512,7 @@ class Gleisbelegung:
         s2.verbindungsart = s1.verbindungsart
         try:
             s2_zeile = s2.zug.find_fahrplanzeile(gleis=s1.gleis)
-            s2_an = time_to_minutes(s2_zeile.an) + s2_zeile.verspaetung_an
+            s2_an = s2_zeile.plan_an + s2_zeile.verspaetung_an
             if s2_an > s1.zeit:
                 s1.dauer = s2_an - s1.zeit
             elif s1.zeit > s2_an:
@@ -527,5 +525,5 @@ class Gleisbelegung:
             self.konflikte.append(k)
             s1.konflikte.append(k)
             s2.konflikte.append(k)
-        except AttributeError:
+        except (AttributeError, TypeError):
             pass
@@ -1,6 +1,8 @@
+import datetime
 import unittest
 import networkx as nx
 import anlage
+from stsobj import AnlagenInfo, ZugDetails, FahrplanZeile
 
 
 class TestAnlage(unittest.TestCase):
@@ -84,6 +86,142 @@ class TestAnlage(unittest.TestCase):
         self.assertDictEqual(_anlage.gleiszuordnung, gz)
         self.assertDictEqual(_anlage.gleisgruppen, gg)
 
+    def test_namensfunktionen_waehlen(self):
+        aufrufe = []
+
+        def regionsname(gleis):
+            aufrufe.append(gleis)
+            return gleis[:1]
+
+        info = AnlagenInfo()
+        info.region = "Testregion"
+        anlage.anschluss_name_funktionen[info.region] = regionsname
+        try:
+            for _ in range(2):
+                _anlage = anlage.Anlage(info)
+                _anlage.namensfunktionen_waehlen()
+                self.assertEqual(_anlage.f_anschlussname("A1"), "A")
+                self.assertEqual(_anlage.f_anschlussname("A1"), "A")
+        finally:
+            del anlage.anschluss_name_funktionen[info.region]
+        self.assertEqual(aufrufe, ["A1"])
+        self.assertIs(_anlage.f_bahnhofname, anlage.default_bahnhofname)
+
+    def test_bahnhof_graph_zugupdate(self):
+        _anlage = anlage.Anlage(None)
+        _anlage.gleiszuordnung = {'E1': 'E1', 'H1': 'H1', 'B1': 'B', 'A2': 'A2'}
+        _anlage.gleis_graph = nx.Graph([('E1', 'H1'), ('H1', 'B'), ('B', 'A2')])
+        _anlage.bahnhof_graph_erstellen()
+
+        zug = ZugDetails()
+        zug.zid = 1
+        zug.name = "Zug 1"
+        for gleis, an, ab in [('H1', 10, 11), ('B1', 15, 16)]:
+            fpz = FahrplanZeile(zug)
+            fpz.gleis = fpz.plan = gleis
+            fpz.an = datetime.time(hour=9, minute=an)
+            fpz.ab = datetime.time(hour=9, minute=ab)
+            zug.fahrplan.append(fpz)
+
+        _anlage.bahnhof_graph_zugupdate([zug])
+        _anlage.bahnhof_graph_zugupdate([zug])
+
+        d = _anlage.bahnhof_graph['H1']['B']
+        self.assertEqual(d['fahrzeit_count'], 1)
+        self.assertEqual(d['fahrzeit_sum'], 240)
+        self.assertEqual(_anlage.bahnhof_graph.nodes['H1']['zug_count'], 1)
+        self.assertEqual(_anlage.bahnhof_graph.nodes['B']['zug_count'], 1)
+        self.assertEqual(_anlage.bahnhof_graph['E1']['H1']['fahrzeit_count'], 0)
+
+        # später hinzugekommene zeile wird nachgezählt, die bekannten nicht nochmals
+        fpz = FahrplanZeile(zug)
+        fpz.gleis = fpz.plan = 'A2'
+        zug.fahrplan.append(fpz)
+        _anlage.bahnhof_graph_zugupdate([zug])
+        self.assertEqual(_anlage.bahnhof_graph.nodes['A2']['zug_count'], 0)
+        fpz.an = datetime.time(hour=9, minute=20)
+        _anlage.bahnhof_graph_zugupdate([zug])
+        self.assertEqual(_anlage.bahnhof_graph.nodes['A2']['zug_count'], 1)
+        self.assertEqual(_anlage.bahnhof_graph['B']['A2']['fahrzeit_sum'], 240)
+        self.assertEqual(_anlage.bahnhof_graph['H1']['B']['fahrzeit_count'], 1)
+        self.assertEqual(_anlage.bahnhof_graph.nodes['H1']['zug_count'], 1)
+
+        # abgefahrene zeilen verschwinden aus dem fahrplan, der zug ist fertig gezählt
+        del zug.fahrplan[0]
+        _anlage.bahnhof_graph_zugupdate([zug])
+        self.assertEqual(_anlage.bahnhof_graph.nodes['B']['zug_count'], 1)
+        self.assertEqual(_anlage._bahnhof_graph_zaehlung, {1: ('A2', datetime.time(hour=9, minute=20))})
+
+        # ausgefahrene züge werden vergessen
+        _anlage.bahnhof_graph_zugupdate([])
+        self.assertEqual(_anlage._bahnhof_graph_zaehlung, {})
+
+        _anlage.bahnhof_graph_erstellen()
+        _anlage.bahnhof_graph_zugupdate([zug])
+        self.assertEqual(_anlage.bahnhof_graph['B']['A2']['fahrzeit_count'], 1)
+
+    def test_gleis_graph_abgleichen(self):
+        _anlage = anlage.Anlage(None)
+        _anlage.gleiszuordnung = {n: n for n in ['E', 'A', 'B', 'C', 'F']}
+        _anlage.gleis_graph = nx.Graph([('E', 'A'), ('A', 'B'), ('B', 'C'), ('A', 'C'), ('C', 'F')])
+        _anlage._gleis_graph_version += 1
+        _anlage.gleis_graph_probleme = _anlage.mehrdeutige_strecken()
+        self.assertEqual(len(_anlage.gleis_graph_probleme), 1)
+
+        zug1 = ZugDetails()
+        zug1.zid = 1
+        zug1.von = 'E'
+        zug1.nach = 'X'
+        self.assertFalse(_anlage.gleis_graph_abgleichen([zug1]))
+        self.assertEqual(len(_anlage.gleis_graph_probleme), 1)
+
+        zug2 = ZugDetails()
+        zug2.zid = 2
+        zug2.von = 'E'
+        zug2.nach = 'F'
+        for gleis in ['A', 'B', 'C']:
+            fpz = FahrplanZeile(zug2)
+            fpz.gleis = fpz.plan = gleis
+            zug2.fahrplan.append(fpz)
+        # route noch nicht zuordenbar: der zug wird beim nächsten aufruf nochmals abgeglichen
+        del _anlage.gleiszuordnung['F']
+        self.assertFalse(_anlage.gleis_graph_abgleichen([zug1, zug2]))
+        _anlage.gleiszuordnung['F'] = 'F'
+        self.assertTrue(_anlage.gleis_graph_abgleichen([zug1, zug2]))
+        self.assertEqual(_anlage.gleis_graph_probleme, [])
+        self.assertFalse(_anlage.gleis_graph.has_edge('A', 'C'))
+        self.assertFalse(_anlage.gleis_graph_abgleichen([zug1, zug2]))
+
+
+class TestSektoren(unittest.TestCase):
+    def test_auto_config(self):
+        sektoren = anlage.Sektoren()
+        sektoren.auto_config(['1', '2A', '2B', 'X 3a', 'X 3b', 'X 4'])
+        self.assertDictEqual(sektoren.get_config(), {'2': {'2A', '2B'}, 'X 3': {'X 3a', 'X 3b'}})
+        self.assertEqual(sektoren.hauptgleis('2B'), '2')
+        self.assertEqual(sektoren.hauptgleis('5'), '5')
+        self.assertSetEqual(sektoren.sektoren('X 4'), {'X 4'})
+
+    def test_set_config(self):
+        sektoren = anlage.Sektoren()
+        sektoren.auto_config(['1', '2A', '2B', '3A', '3B'])
+        sektoren.set_config({'2': {'2A', '3A'}, '4': {'3B'}})
+        self.assertDictEqual(sektoren.get_config(), {'2': {'2A', '3A'}})
+        self.assertDictEqual(sektoren.get_config(knapp=False),
+                             {'1': {'1'}, '2': {'2A', '3A'}, '4': {'3B'}})
+        self.assertEqual(sektoren.hauptgleis('2B'), '2B')
+        self.assertEqual(sektoren.hauptgleis('3A'), '2')
+        self.assertEqual(sektoren.hauptgleis('3B'), '4')
+
+    def test_zuordnen(self):
+        sektoren = anlage.Sektoren()
+        sektoren.set_config({'1': {'1A', '1B'}})
+        sektoren.zuordnen('1B', '2')
+        self.assertDictEqual(sektoren.get_config(knapp=False), {'1': {'1A'}, '2': {'1B'}})
+        sektoren.zuordnen('1A', '2')
+        self.assertDictEqual(sektoren.get_config(knapp=False), {'2': {'1A', '1B'}})
+        self.assertEqual(sektoren.hauptgleis('1A'), '2')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,12 @@
 import datetime
+import tempfile
 import unittest
 
+import numpy as np
+
+import anlage
 import auswertung
-from stsobj import ZugDetails, FahrplanZeile
+from stsobj import AnlagenInfo, Ereignis, ZugDetails, FahrplanZeile
 
 
 class TestFahrzeitAuswertung(unittest.TestCase):
@@ -16,17 +20,257 @@ class TestFahrzeitAuswertung(unittest.TestCase):
     def test_add_fahrzeit(self):
         fa = auswertung.FahrzeitAuswertung()
         fa.set_koordinaten(self.test_anlage)
-        fa.add_fahrzeit("A1", "B1", 25)
+        zug = ZugDetails()
+        zug.name = "RB 1"
+        fa.add_fahrzeit(zug, "A1", "B1", 25)
+
+        self.assertEqual(list(fa.statistik), [("A1", "B1")])
+        self.assertEqual(fa.statistik[("A1", "B1")].anzahl, 1)
+        self.assertAlmostEqual(fa.statistik[("A1", "B1")].summe, 25)
+        self.assertEqual(list(fa.gattungsstatistik), [("A1", "B1", "RB")])
+        self.assertEqual(list(fa.gruppenstatistik), [("Bahnhof A", "Bahnhof B")])
+        self.assertEqual(fa.messpunkte(), [(1, "RB", "A1", "B1", 25)])
+
+        zug.name = "1234"
+        fa.add_fahrzeit(zug, "A1", "B2", 30)
+        self.assertEqual(fa.gattungsstatistik[("A1", "B2", "")].anzahl, 1)
+        self.assertEqual(fa.gruppenstatistik[("Bahnhof A", "Bahnhof B")].anzahl, 2)
+        self.assertAlmostEqual(fa.gruppenstatistik[("Bahnhof A", "Bahnhof B")].summe, 55)
+        self.assertEqual(fa.messpunkte(1), [(1234, None, "A1", "B2", 30)])
+
+    def test_statistik(self):
+        fa = auswertung.FahrzeitAuswertung()
+        fa.set_koordinaten(self.test_anlage)
+        zug = ZugDetails()
+        zug.name = "RE 1234"
+        for von, nach, zeit in zip(self.test_daten['von'], self.test_daten['nach'], self.test_daten['zeit']):
+            fa.add_fahrzeit(zug, von, nach, zeit)
+        fa.add_fahrzeit(zug, "A1", "B1", 9)
+
+        statistik = fa.statistik[("A1", "B1")]
+        self.assertEqual(statistik.anzahl, 2)
+        self.assertEqual(statistik.minimum, 9)
+        self.assertAlmostEqual(statistik.mittel, 10)
+        self.assertEqual(fa.get_fahrzeit("A1", "B1"), 9)
+        self.assertTrue(np.isnan(fa.get_fahrzeit("B1", "B2")))
+
+        self.assertEqual(fa.fahrten.shape, (4, 5))
+        self.assertEqual(list(fa.fahrten['gattung'].unique()), ["RE"])
+        self.assertEqual(fa.zeiten.at["B1", "A1"], 9)
+        self.assertEqual(fa.zeiten.at["A1", "B1"], 12)
+        self.assertTrue(np.isnan(fa.zeiten.at["B2", "B1"]))
+
+
+    def test_gruppenstatistik(self):
+        fa = auswertung.FahrzeitAuswertung()
+        zug = ZugDetails()
+        zug.name = "RE 1234"
+        fa.add_fahrzeit(zug, "A1", "B1", 50)
+        fa.set_koordinaten(self.test_anlage)
+        for von, nach, zeit in zip(self.test_daten['von'], self.test_daten['nach'], self.test_daten['zeit']):
+            fa.add_fahrzeit(zug, von, nach, zeit)
+        fa.add_fahrzeit(zug, "A2", "X", 5)
+
+        self.assertEqual(fa.get_gruppenfahrzeit("Bahnhof A", "Bahnhof B"), 11)
+        self.assertEqual(fa.gruppenstatistik[("Bahnhof A", "Bahnhof B")].anzahl, 3)
+        self.assertEqual(fa.get_gruppenfahrzeit("Bahnhof B", "Bahnhof A"), 12)
+        self.assertTrue(np.isnan(fa.get_gruppenfahrzeit("Bahnhof A", "Bahnhof A")))
+        self.assertEqual(len(fa.gruppenstatistik), 2)
+
+    def test_p2_quantil(self):
+        rng = np.random.default_rng(1)
+        werte = rng.normal(300, 30, 2000)
+        werte[::50] = 30
+        for p in auswertung.P2_QUANTILE:
+            schaetzer = auswertung.P2Quantil(p)
+            for x in werte:
+                schaetzer.hinzufuegen(x)
+            self.assertAlmostEqual(schaetzer.wert, np.quantile(werte, p), delta=5)
+            self.assertEqual(len(schaetzer.hoehen), 5)
+
+    def test_p2_vereinigen(self):
+        rng = np.random.default_rng(2)
+        for p in (0.1, 0.5, 0.9):
+            for n1, n2 in ((5, 5), (5, 6), (7, 30), (100, 3)):
+                schaetzer = auswertung.P2Quantil(p)
+                andere = auswertung.P2Quantil(p)
+                gesehen = np.concatenate([rng.normal(300, 30, n1), rng.normal(300, 30, n2)])
+                for x in gesehen[:n1]:
+                    schaetzer.hinzufuegen(x)
+                for x in gesehen[n1:]:
+                    andere.hinzufuegen(x)
+                schaetzer.vereinigen(andere)
+                self.assertEqual(schaetzer.anzahl, n1 + n2)
+                n = schaetzer.positionen
+                self.assertTrue(all(a < b for a, b in zip(n, n[1:])), msg=f"{p} {n1} {n2} {n}")
+                q = schaetzer.hoehen
+                self.assertEqual(q[0], gesehen.min())
+                self.assertEqual(q[4], gesehen.max())
+                self.assertTrue(all(a <= b for a, b in zip(q, q[1:])), msg=f"{p} {n1} {n2} {q}")
+
+                werte = rng.normal(300, 30, 200)
+                for x in werte:
+                    schaetzer.hinzufuegen(x)
+                self.assertEqual(schaetzer.anzahl, n1 + n2 + 200)
+                self.assertAlmostEqual(schaetzer.wert, np.quantile(werte, p), delta=30)
+
+
+class TestZugAuswertung(unittest.TestCase):
+    def test_archivieren(self):
+        zuege = []
+        for zid in range(1, 4):
+            zug = ZugDetails()
+            zug.zid = zid
+            zug.name = f"RB {zid}"
+            zug.von = "A"
+            zug.nach = "B"
+            zuege.append(zug)
+
+        za = auswertung.ZugAuswertung()
+        za.zuege_uebernehmen(zuege)
+        fpz = FahrplanZeile(za.zugliste[1])
+        fpz.gleis = fpz.plan = "A"
+        fpz.an = fpz.ab = datetime.time(hour=23, minute=50)
+        fpz.hinweistext = "einfahrt"
+        za.zugliste[1].fahrplan.append(fpz)
+
+        za.zuege_uebernehmen(zuege[1:])
+        self.assertEqual(za.zuege_archivieren(23 * 60 + 50), [])
+        self.assertEqual(za.zuege_archivieren(23 * 60 + 59), [])
+        za.aufbewahrungszeit = 10
+        self.assertEqual(za.zuege_archivieren(1), [1])
+
+        self.assertEqual(set(za.zugliste), {2, 3})
+        archiv = za.archiv[1]
+        self.assertEqual(archiv.ausfahrt, 23 * 60 + 50)
+        self.assertEqual(archiv.fahrplan[0].an, datetime.time(hour=23, minute=50))
+        self.assertEqual(archiv.fahrplan[0].hinweistext, "einfahrt")
+
+
+
+class TestAuswertung(unittest.TestCase):
+    def test_fahrzeit_auswerten(self):
+        aw = auswertung.Auswertung(anlage.Anlage(AnlagenInfo()))
+        zug = ZugDetails()
+        zug.zid = 1
+        zug.name = "RB 1"
+        zug.von = "A"
+        zug.nach = "D"
+        zug.gleis = "B"
+        aw.zuege_uebernehmen([zug])
+
+        ereignisse = [('einfahrt', 8, 0, "B"), ('ankunft', 8, 5, "B"), ('abfahrt', 8, 7, "C"),
+                      ('rothalt', 8, 9, "C"), ('wurdegruen', 8, 11, "C"), ('ankunft', 8, 15, "C"),
+                      ('abfahrt', 8, 16, "D"), ('ausfahrt', 8, 20, "")]
+        for art, stunde, minute, gleis in ereignisse:
+            ereignis = Ereignis()
+            ereignis.art = art
+            ereignis.zid = 1
+            ereignis.name = "RB 1"
+            ereignis.gleis = ereignis.plangleis = gleis
+            ereignis.zeit = datetime.datetime(2000, 1, 1, stunde, minute)
+            aw.ereignis_uebernehmen(ereignis)
+
+        fahrten = aw.fahrzeiten.fahrten
+        self.assertEqual(list(zip(fahrten['von'], fahrten['nach'], fahrten['zeit'])),
+                         [("A", "B", 300), ("B", "C", 360), ("A", "C", 660),
+                          ("C", "D", 240), ("B", "D", 600), ("A", "D", 900)])
+        self.assertEqual(aw.rotzeit_auswerten(aw.zuege.zugliste[1]), 120)
+        self.assertEqual(len(aw.verlaeufe[1].stationen), 5)
+
+
+    def test_statistik_speichern(self):
+        info = AnlagenInfo()
+        info.aid = 7
+        aw = auswertung.Auswertung(anlage.Anlage(info))
+        zug = ZugDetails()
+        zug.name = "ICE 512"
+        for zeit in [100, 130, 170, 400]:
+            aw.fahrzeiten.add_fahrzeit(zug, "A", "B", zeit)
+        statistik = aw.fahrzeiten.gattungsstatistik[("A", "B", "ICE")]
+        self.assertEqual(statistik.quantil(0.5), 150)
+        self.assertEqual(statistik.quantil(0.25), 105)
+
+        with tempfile.TemporaryDirectory() as path:
+            aw.save_config(path)
+            neu = auswertung.Auswertung(anlage.Anlage(info))
+            neu.load_config(path)
+            andere = AnlagenInfo()
+            andere.aid = 8
+            self.assertRaises(OSError, auswertung.Auswertung(anlage.Anlage(andere)).load_config, path)
+
+        self.assertEqual(neu.fahrzeit_schaetzen(zug, "A", "B"), 150)
+        zug.name = "RB 1"
+        neu.fahrzeiten.add_fahrzeit(zug, "A", "B", 90)
+        self.assertEqual(neu.fahrzeit_schaetzen(zug, "A", "B"), 90)
+        self.assertEqual(neu.fahrzeiten.statistik[("A", "B")].anzahl, 5)
+        self.assertEqual(neu.fahrzeiten.gattungsstatistik[("A", "B", "ICE")], statistik)
+
+    def test_statistik_warmstart(self):
+        """
+        die gespeicherten statistiken mehrerer gattungen werden beim laden vereinigt
+        und müssen danach weitere messpunkte aufnehmen können.
+        """
+        info = AnlagenInfo()
+        info.aid = 7
+        aw = auswertung.Auswertung(anlage.Anlage(info))
+        aw.fahrzeiten.set_koordinaten(TestFahrzeitAuswertung.test_anlage)
+        rng = np.random.default_rng(3)
+        zug = ZugDetails()
+        for gattung, anzahl in (("ICE", 5), ("RE", 5), ("RB", 6)):
+            zug.name = f"{gattung} 1"
+            for zeit in rng.normal(300, 30, anzahl):
+                aw.fahrzeiten.add_fahrzeit(zug, "A1", "B1", zeit)
+
+        with tempfile.TemporaryDirectory() as path:
+            aw.save_config(path)
+            neu = auswertung.Auswertung(anlage.Anlage(info))
+            neu.fahrzeiten.set_koordinaten(TestFahrzeitAuswertung.test_anlage)
+            neu.load_config(path)
+
+        self.assertEqual(neu.fahrzeiten.statistik[("A1", "B1")].anzahl, 16)
+        for zeit in rng.normal(300, 30, 50):
+            neu.fahrzeiten.add_fahrzeit(zug, "A1", "B1", zeit)
+        self.assertEqual(neu.fahrzeiten.statistik[("A1", "B1")].anzahl, 66)
+        self.assertLess(neu.fahrzeiten.get_gruppenfahrzeit("Bahnhof A", "Bahnhof B"), 300)
+        zug.name = "IC 1"
+        self.assertAlmostEqual(neu.fahrzeit_schaetzen(zug, "A1", "B1"), 300, delta=60)
+
+
+
+class TestEreignisLog(unittest.TestCase):
+    def ereignis(self, art, zid, gleis, stunde, minute, verspaetung=0):
+        ereignis = Ereignis()
+        ereignis.art = art
+        ereignis.zid = zid
+        ereignis.gleis = ereignis.plangleis = gleis
+        ereignis.verspaetung = verspaetung
+        ereignis.zeit = datetime.datetime(2000, 1, 1, stunde, minute)
+        return ereignis
+
+    def test_abfragen(self):
+        log = auswertung.EreignisLog(kapazitaet=2)
+        for ereignis in [self.ereignis('einfahrt', 1, "3", 23, 40),
+                         self.ereignis('rothalt', 1, "3", 23, 45),
+                         self.ereignis('ankunft', 2, "3", 23, 46, 2),
+                         self.ereignis('wurdegruen', 1, "3", 23, 48),
+                         self.ereignis('ankunft', 1, "3", 23, 55, 5),
+                         self.ereignis('rothalt', 2, "4", 0, 5),
+                         self.ereignis('wurdegruen', 2, "4", 0, 6)]:
+            log.hinzufuegen(ereignis)
 
-        self.assertEqual(fa.fahrten.at["A1", "B1"], 1)
-        self.assertEqual(fa.fahrten.at["A1", "B2"], 0)
-        self.assertEqual(fa.fahrten.at["A2", "B1"], 0)
-        self.assertEqual(fa.fahrten.at["A2", "B2"], 0)
+        self.assertEqual(len(log), 7)
+        self.assertEqual(log.letzte_zeit, 24 * 3600 + 6 * 60)
+        self.assertTrue(np.all(np.diff(log.daten['zeit']) >= 0))
 
-        self.assertAlmostEqual(fa.summe.at["A1", "B1"], 25)
-        self.assertAlmostEqual(fa.summe.at["A1", "B2"], 0)
-        self.assertAlmostEqual(fa.summe.at["A2", "B1"], 0)
-        self.assertAlmostEqual(fa.summe.at["A2", "B2"], 0)
+        ankuenfte = log.am_gleis("3", log.letzte_zeit - 15 * 60, art="ankunft")
+        self.assertEqual(list(ankuenfte['zid']), [1])
+        self.assertEqual(list(ankuenfte['verspaetung']), [5])
+        self.assertEqual(len(log.am_gleis("3", log.letzte_zeit - 30 * 60)), 5)
+        self.assertEqual(len(log.am_gleis("9")), 0)
+        self.assertEqual([log.arten[a] for a in log.zug(2)['art']], ['ankunft', 'rothalt', 'wurdegruen'])
+        self.assertEqual(log.rothalt_dauern(), {"3": [180], "4": [60]})
+        self.assertEqual(log.rothalt_dauern(von=24 * 3600), {"4": [60]})
 
 
 if __name__ == '__main__':
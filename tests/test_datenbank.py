@@ -0,0 +1,78 @@
+import datetime
+import unittest
+
+import anlage
+import auswertung
+import datenbank
+import planung
+from stsobj import AnlagenInfo, Ereignis, FahrplanZeile, ZugDetails
+
+
+class TestSitzungsDatenbank(unittest.TestCase):
+    def setUp(self) -> None:
+        self.info = AnlagenInfo()
+        self.info.aid = 5
+        self.info.name = "Testanlage"
+
+        zug = ZugDetails()
+        zug.zid = 1
+        zug.name = "RB 1001"
+        zug.von = "A"
+        zug.nach = "B"
+        zug.gleis = zug.plangleis = "1"
+        zeile = FahrplanZeile(zug)
+        zeile.gleis = zeile.plan = "1"
+        zeile.an = datetime.time(hour=8, minute=10)
+        zeile.ab = datetime.time(hour=8, minute=12)
+        zug.fahrplan.append(zeile)
+        self.zuege = [zug]
+
+        self.planung = planung.Planung()
+        self.auswertung = auswertung.Auswertung(anlage.Anlage(self.info))
+        self.planung.zuege_uebernehmen(self.zuege)
+        self.auswertung.zuege_uebernehmen(self.zuege)
+        self.db = datenbank.SitzungsDatenbank(":memory:")
+
+    def tearDown(self) -> None:
+        self.db.schliessen()
+
+    def test_aktualisieren(self):
+        self.planung.verspaetungen_korrigieren(8 * 60)
+        self.db.aktualisieren(self.info, self.planung, self.auswertung, 8 * 60)
+
+        ereignis = Ereignis()
+        ereignis.art = 'ankunft'
+        ereignis.zid = 1
+        ereignis.gleis = ereignis.plangleis = "1"
+        ereignis.verspaetung = 3
+        ereignis.zeit = datetime.datetime(2000, 1, 1, 8, 13)
+        self.auswertung.ereignis_uebernehmen(ereignis)
+        self.auswertung.fahrzeiten.add_fahrzeit(self.auswertung.zuege.zugliste[1], "A", "1", 120)
+        self.zuege[0].verspaetung = 3
+        self.planung.zuege_uebernehmen(self.zuege)
+        self.planung.verspaetungen_korrigieren(8 * 60 + 5)
+        self.db.aktualisieren(self.info, self.planung, self.auswertung, 8 * 60 + 5)
+        self.db.aktualisieren(self.info, self.planung, self.auswertung, 8 * 60 + 6)
+
+        abfrage = self.db.verbindung.execute
+        self.assertEqual(abfrage("select aid, name from sitzungen").fetchall(), [(5, "Testanlage")])
+        self.assertEqual(abfrage("select zid, gattung, nummer from zuege").fetchall(), [(1, "RB", 1001)])
+        self.assertEqual(abfrage("select plan, an, ab from fahrplan where plan = '1'").fetchall(),
+                         [("1", 490, 492)])
+        self.assertEqual(abfrage("select zeit, art, gleis, verspaetung from ereignisse").fetchall(),
+                         [(8 * 3600 + 13 * 60, "ankunft", "1", 3)])
+        self.assertEqual(abfrage("select von, nach, zeit from fahrzeiten").fetchall(), [("A", "1", 120.)])
+        prognosen = abfrage("select simzeit, verspaetung_an from prognosen where plan = '1' order by simzeit")
+        self.assertEqual(prognosen.fetchall(), [(8 * 60, 0), (8 * 60 + 5, 3)])
+
+        # archivierte züge werden vergessen
+        self.assertEqual(set(self.db._prognosen), {1})
+        self.planung.zugliste[1].ausgefahren = True
+        self.planung.zuege_archivieren(8 * 60 + 6)
+        self.assertEqual(self.planung.zuege_archivieren(10 * 60), [1])
+        self.db.aktualisieren(self.info, self.planung, self.auswertung, 10 * 60)
+        self.assertEqual(self.db._prognosen, {})
+
+
+if __name__ == '__main__':
+    unittest.main()